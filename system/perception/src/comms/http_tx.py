@@ -53,6 +53,16 @@ class HTTPSender:
                 "vector": {"x": float(px), "y": float(py)},
             },
         }
+        if "pred_px" in data:
+            # Same vectors extrapolated to the expected actuation time.
+            payload["predicted"] = {
+                "horizon_s": float(data.get("horizon_s", 0.0)),
+                "target": {
+                    "x": float(data.get("pred_target_px", 0.0)),
+                    "y": float(data.get("pred_target_py", 0.0)),
+                },
+                line_key: {"x": float(data["pred_px"]), "y": float(data.get("pred_py", 0.0))},
+            }
         body = json.dumps(payload).encode("utf-8")
         print(f"[perception] send: {body.decode('utf-8')}", file=sys.stderr)
         t = threading.Thread(
@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 import json
+from typing import Any
 
 
 ZONE_TO_INT = {
@@ -13,8 +14,11 @@ ZONE_TO_INT = {
     "TARGET": 3,
 }
 
+# json.dumps builds a new encoder per call when given options; reuse one.
+_ENCODER = json.JSONEncoder(separators=(",", ":"))
 
-@dataclass
+
+@dataclass(slots=True)
 class PerceptionPacket:
     px: float
     py: float
@@ -26,12 +30,46 @@ class PerceptionPacket:
     target_detected: bool = False
     target_px: float = 0.0
     target_py: float = 0.0
+    # Latency-compensated vectors (prediction enabled only); omitted when None.
+    pred_px: float | None = None
+    pred_py: float | None = None
+    pred_target_px: float | None = None
+    pred_target_py: float | None = None
+    horizon_s: float | None = None
+    # Fork branches (heading.branches), robot frame, best first; omitted when None.
+    branches: list[dict[str, float]] | None = None
+    # Near-to-far lookahead headings (heading.estimator "weighted"), robot frame; omitted when None.
+    lookahead: list[tuple[float, float] | None] | None = None
 
-    def to_dict(self, zone_encoding: str = "string") -> dict[str, float | int | str | bool]:
-        data = asdict(self)
-        if zone_encoding == "int":
-            data["zone"] = ZONE_TO_INT.get(self.zone, -1)
+    def to_dict(self, zone_encoding: str = "string") -> dict[str, Any]:
+        # Built directly in field order (asdict deep-copies through every field).
+        data: dict[str, Any] = {
+            "px": self.px,
+            "py": self.py,
+            "zone": ZONE_TO_INT.get(self.zone, -1) if zone_encoding == "int" else self.zone,
+            "gamma": self.gamma,
+            "t": self.t,
+            "path_detected": self.path_detected,
+            "path_mask_key": self.path_mask_key,
+            "target_detected": self.target_detected,
+            "target_px": self.target_px,
+            "target_py": self.target_py,
+        }
+        if self.pred_px is not None:
+            data["pred_px"] = self.pred_px
+        if self.pred_py is not None:
+            data["pred_py"] = self.pred_py
+        if self.pred_target_px is not None:
+            data["pred_target_px"] = self.pred_target_px
+        if self.pred_target_py is not None:
+            data["pred_target_py"] = self.pred_target_py
+        if self.horizon_s is not None:
+            data["horizon_s"] = self.horizon_s
+        if self.branches is not None:
+            data["branches"] = self.branches
+        if self.lookahead is not None:
+            data["lookahead"] = self.lookahead
         return data
 
     def to_json(self, zone_encoding: str = "string") -> str:
-        return json.dumps(self.to_dict(zone_encoding=zone_encoding), separators=(",", ":"))
+        return _ENCODER.encode(self.to_dict(zone_encoding=zone_encoding))
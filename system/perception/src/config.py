@@ -30,16 +30,98 @@ class MorphConfig:
     kernel_size: int = 5
     open_iters: int = 1
     close_iters: int = 1
+    shape: str = "ellipse"  # ellipse | rect | cross
+    method: str = "morph"  # morph (open then close) | median | none
+    median_ksize: int = 5  # median: odd aperture
+    # Per-mask overrides of the fields above, e.g. {"danger": {"method": "none"}}.
+    masks: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+
+@dataclass
+class ClassifierConfig:
+    mode: str = "lut"  # lut | bgr_lut | inrange
+    # Bits per channel for the bgr_lut table, 1..7 (6 -> 1012 KiB table, 256 KiB read).
+    bgr_bits: int = 6
+    # lut: one compiled pass (numba) for HSV + labels + per-class boxes, which
+    # also bound morphology; falls back to cvtColor + LUT without numba.
+    fused: bool = False
+
+
+@dataclass
+class ScaleConfig:
+    mode: str = "fixed"  # fixed | auto
+    value: float = 1.0  # fixed processing scale; starting scale in auto mode
+    min_scale: float = 0.25
+    max_scale: float = 1.0
+    step: float = 0.1
+    budget_frac: float = 0.8  # auto: target share of the 1/fps frame period
+
+
+@dataclass
+class RowBandsConfig:
+    enabled: bool = False
+    # Band borders as fractions of the height from the top; one scale per band,
+    # top (far) to bottom (near).
+    edges: list[float] = field(default_factory=lambda: [0.33, 0.67])
+    scales: list[float] = field(default_factory=lambda: [0.25, 0.5, 1.0])
+
+
+@dataclass
+class ReuseConfig:
+    enabled: bool = False
+    thumb_width: int = 32  # change detection on a grayscale thumbnail this wide
+    threshold: float = 2.0  # mean abs thumbnail difference (gray levels) still counted as unchanged
+    max_age_s: float = 0.5  # force a full run at least this often
+    max_frames: int = 15  # ... and after this many reused frames
+
+
+@dataclass
+class ThreadsConfig:
+    # Threads building per-color masks concurrently (1 = inline). OpenCV's own
+    # pool is shrunk so mask_workers x cv2 threads stays within the core count.
+    mask_workers: int = 1
+    cv_threads: int = 0  # cv2.setNumThreads cap at startup; 0 = OpenCV default
+    # CPU ids each main.py thread is pinned to; empty = unpinned. Mask workers
+    # inherit the worker's set; cv2's shared pool is not moved by pinning.
+    capture_cpus: list[int] = field(default_factory=list)
+    worker_cpus: list[int] = field(default_factory=list)
+    output_cpus: list[int] = field(default_factory=list)
+    worker_nice: int = 0  # e.g. -5 to favour the worker thread (needs CAP_SYS_NICE); 0 = unchanged
+
+
+@dataclass
+class RectifyConfig:
+    enabled: bool = False
+    calibration: str = ""  # YAML: image_size, camera_matrix, dist_coeffs[, homography]
+    cache_dir: str = ".cache/remap"  # maps (.npz), relative to system/perception; empty disables
 
 
 @dataclass
 class HeadingConfig:
     min_area: float = 150.0
     use_centerline: bool = True
+    estimator: str = "fitline"  # fitline | scanline | moments | weighted
+    scanlines: int = 16  # scanline: rows sampled across the ROI
+    scanline_min_run: int = 3  # scanline: narrower runs are treated as noise
+    # weighted: row weight exp(-d / decay), d = height fraction from the bottom
+    # (<= 0 weighs rows uniformly); lookahead gives the near/mid/far fits.
+    row_weight_decay: float = 0.5
+    lookahead: list[float] = field(default_factory=lambda: [0.25, 0.5, 1.0])
+    branches: bool = False  # split the path at forks and fit each branch separately
+    branch_min_rows: int = 3  # consecutive multi-run rows that count as a fork
+
+
+@dataclass
+class TrackingConfig:
+    enabled: bool = False
+    margin_px: int = 40  # window padding around the last accepted line, in ROI pixels
+    min_gamma: float = 0.3  # below this confidence the next frame searches the full ROI
 
 
 @dataclass
 class ZoneConfig:
+    # target/danger areas are 8-connected pixel counts: holes are not counted,
+    # and a solid blob reads ~half its perimeter above its polygon area.
     target_min_area: float = 300.0
     target_min_circularity: float = 0.6
     danger_mode: str = "either"  # ratio | area | either
@@ -51,6 +133,17 @@ class ZoneConfig:
     green_ratio_thresh: float = 0.02
 
 
+@dataclass
+class PredictionConfig:
+    enabled: bool = False
+    latency_s: float = 0.05  # downstream delay (transport + actuation) added to the horizon
+    measure_latency: bool = True  # also add the frame's age (capture -> output) to the horizon
+    max_horizon_s: float = 0.3
+    alpha: float = 0.5  # alpha-beta position gain
+    beta: float = 0.1  # alpha-beta velocity gain
+    max_gap_s: float = 0.5  # trackers restart after this long without a measurement
+
+
 @dataclass
 class ConfidenceConfig:
     expected_area: float = 6000.0
@@ -83,6 +176,8 @@ class AppConfig:
     roi_y_start: int = 240
     alpha: float = 0.9
     show_masks: bool = True
+    # none | summary | full; auto = full, except entry points pick what they draw.
+    debug_level: str = "auto"
     red1: HSVRange = field(
         default_factory=lambda: HSVRange(lo=(0, 120, 80), hi=(10, 255, 255))
     )
@@ -101,10 +196,18 @@ class AppConfig:
     danger: HSVRange = field(
         default_factory=lambda: HSVRange(lo=(0, 0, 0), hi=(179, 60, 90))
     )
+    classifier: ClassifierConfig = field(default_factory=ClassifierConfig)
+    scale: ScaleConfig = field(default_factory=ScaleConfig)
+    row_bands: RowBandsConfig = field(default_factory=RowBandsConfig)
+    rectify: RectifyConfig = field(default_factory=RectifyConfig)
+    threads: ThreadsConfig = field(default_factory=ThreadsConfig)
+    reuse: ReuseConfig = field(default_factory=ReuseConfig)
     morph: MorphConfig = field(default_factory=MorphConfig)
     heading: HeadingConfig = field(default_factory=HeadingConfig)
+    tracking: TrackingConfig = field(default_factory=TrackingConfig)
     zones: ZoneConfig = field(default_factory=ZoneConfig)
     confidence: ConfidenceConfig = field(default_factory=ConfidenceConfig)
+    prediction: PredictionConfig = field(default_factory=PredictionConfig)
     comms: CommsConfig = field(default_factory=CommsConfig)
     camera: CameraConfig = field(default_factory=CameraConfig)
 
@@ -119,6 +222,8 @@ class AppConfig:
             cfg.alpha = float(data["alpha"])
         if "show_masks" in data:
             cfg.show_masks = bool(data["show_masks"])
+        if "debug_level" in data:
+            cfg.debug_level = str(data["debug_level"])
         if "red1" in data:
             cfg.red1 = HSVRange.from_dict(data["red1"])
         if "red2" in data:
@@ -131,14 +236,30 @@ class AppConfig:
             cfg.black = HSVRange.from_dict(data["black"])
         if "danger" in data:
             cfg.danger = HSVRange.from_dict(data["danger"])
+        if "classifier" in data:
+            cfg.classifier = ClassifierConfig(**data["classifier"])
+        if "scale" in data:
+            cfg.scale = ScaleConfig(**data["scale"])
+        if "row_bands" in data:
+            cfg.row_bands = RowBandsConfig(**data["row_bands"])
+        if "rectify" in data:
+            cfg.rectify = RectifyConfig(**data["rectify"])
+        if "threads" in data:
+            cfg.threads = ThreadsConfig(**data["threads"])
+        if "reuse" in data:
+            cfg.reuse = ReuseConfig(**data["reuse"])
         if "morph" in data:
             cfg.morph = MorphConfig(**data["morph"])
         if "heading" in data:
             cfg.heading = HeadingConfig(**data["heading"])
+        if "tracking" in data:
+            cfg.tracking = TrackingConfig(**data["tracking"])
         if "zones" in data:
             cfg.zones = ZoneConfig(**data["zones"])
         if "confidence" in data:
             cfg.confidence = ConfidenceConfig(**data["confidence"])
+        if "prediction" in data:
+            cfg.prediction = PredictionConfig(**data["prediction"])
         if "comms" in data:
             cfg.comms = CommsConfig(**data["comms"])
         if "camera" in data:
@@ -11,19 +11,29 @@ from pathlib import Path
 from typing import Any, Optional
 
 import cv2
+import numpy as np
 
 from src.comms.http_tx import HTTPSender
 from src.comms.packet import PerceptionPacket
 from src.comms.serial_tx import SerialSender
 from src.comms.udp_tx import UDPSender
 from src.config import AppConfig, load_config
-from src.pipeline import PipelineOutput, PipelineState, run_pipeline
+from src.pipeline import PipelineOutput, PipelineState, reuse_output, run_pipeline
 from src.utils.logging import log
 from src.utils.math2d import to_robot_frame_clamped
+from src.utils.threads import (
+    ThreadCpuMeter,
+    apply_cv_threads,
+    pin_current_thread,
+    set_current_thread_nice,
+)
 from src.utils.timing import LoopRegulator
 from src.vision.camera import OpenCVCamera, RpicamVidCamera
+from src.vision.change import FrameChangeDetector
 from src.vision.debug_draw import draw_overlay, make_mask_preview
+from src.vision.fused import NUMBA_AVAILABLE
 from src.vision.masks import crop_roi
+from src.vision.workspace import PipelineWorkspace
 
 
 def process_roi(
@@ -44,17 +54,18 @@ def process_roi(
     )
 
 
-@dataclass
+@dataclass(slots=True)
 class FrameItem:
     timestamp: float
     frame: Any
 
 
-@dataclass
+@dataclass(slots=True)
 class PerceptionResult:
     timestamp: float
     output: PipelineOutput
     roi: Any
+    reused: bool = False  # output carried over from an unchanged earlier frame
 
 
 def _make_sender(method: str, cfg: AppConfig) -> Any:
@@ -93,6 +104,13 @@ def main() -> None:
     parser.add_argument("--source", default=None, help="webcam or video:/path/to/file")
     parser.add_argument("--comms", choices=["udp", "serial", "stdout", "http"], default=None)
     parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument(
+        "--debug-level",
+        choices=["auto", "none", "summary", "full"],
+        default=None,
+        help="Per-frame debug artifacts to build "
+        "(default: config; auto = masks only when the GUI shows them)",
+    )
     args = parser.parse_args()
 
     cfg_path = Path(args.config)
@@ -118,11 +136,19 @@ def main() -> None:
         if args.comms is not None:
             cfg.comms.method = args.comms
         gui = not getattr(args, "no_gui", False)
+    if args.debug_level is not None:
+        cfg.debug_level = args.debug_level
+    if cfg.debug_level == "auto":
+        # Only the mask preview reads debug artifacts; headless runs build none.
+        cfg.debug_level = "full" if gui and cfg.show_masks else "none"
     source = _parse_source(cfg.camera.source, cfg)
     sender = _make_sender(cfg.comms.method, cfg)
     regulator = LoopRegulator(target_hz=cfg.fps)
 
     state = PipelineState()
+    if not gui:
+        # Masks are only kept for the GUI preview, so buffers can be reused per frame.
+        state.workspace = PipelineWorkspace()
     state.path_mask_key = "red"
     log("path_mask_red", reason="tracking red tape")
     if isinstance(source, str) and Path(source).name in {"test_run.mp4", "test_video.mp4"}:
@@ -150,17 +176,32 @@ def main() -> None:
     except RuntimeError as exc:
         raise SystemExit(f"Camera initialization failed: {exc}") from exc
 
+    tc = cfg.threads
+    apply_cv_threads(tc)
+    if cfg.classifier.fused and not NUMBA_AVAILABLE:
+        log("classifier_fused_unavailable", reason="numba not installed", fallback="cvtColor+lut")
     mode = args.mode or "default"
-    log("perception_start", source=cfg.camera.source, fps=cfg.fps, comms=cfg.comms.method, mode=mode)
+    log(
+        "perception_start",
+        source=cfg.camera.source,
+        fps=cfg.fps,
+        comms=cfg.comms.method,
+        mode=mode,
+        debug_level=cfg.debug_level,
+        cv_threads=cv2.getNumThreads(),
+    )
 
     frame_queue: "queue.Queue[Optional[FrameItem]]" = queue.Queue(maxsize=2)
     result_queue: "queue.Queue[Optional[PerceptionResult]]" = queue.Queue(maxsize=2)
     stop_event = threading.Event()
+    cpu_meter = ThreadCpuMeter(("capture", "worker", "output"))
 
     def capture_loop() -> None:
+        pin_current_thread(tc.capture_cpus, "capture")
         try:
             while not stop_event.is_set():
                 frame = cam.read()
+                cpu_meter.mark("capture")
                 if frame is None:
                     log("stream_end_or_read_fail")
                     break
@@ -176,21 +217,47 @@ def main() -> None:
             except queue.Full:
                 pass
 
+    change = None
+    if cfg.reuse.enabled:
+        rc = cfg.reuse
+        change = FrameChangeDetector(rc.thumb_width, rc.threshold, rc.max_age_s, rc.max_frames)
+
     def worker_loop() -> None:
+        # Before the first run_pipeline, so the mask pool inherits the placement.
+        pin_current_thread(tc.worker_cpus, "worker")
+        set_current_thread_nice(tc.worker_nice, "worker")
+        last_out: Optional[PipelineOutput] = None
         try:
             while not stop_event.is_set():
                 try:
                     item = frame_queue.get(timeout=0.5)
                 except queue.Empty:
                     continue
+                finally:
+                    cpu_meter.mark("worker")
                 if item is None:
                     break
 
                 roi = crop_roi(item.frame, cfg.roi_y_start)
-                out = run_pipeline(roi_bgr=roi, state=state, cfg=cfg)
+                # Static scene: resend the last result, re-predicted to this frame's time.
+                reused = (
+                    change is not None
+                    and change.unchanged(roi, item.timestamp)
+                    and last_out is not None
+                )
+                if reused:
+                    out = reuse_output(last_out, roi.shape, state, cfg, item.timestamp)
+                else:
+                    out = run_pipeline(roi_bgr=roi, state=state, cfg=cfg, timestamp=item.timestamp)
+                    last_out = out
                 try:
                     result_queue.put(
-                        PerceptionResult(timestamp=item.timestamp, output=out, roi=roi),
+                        PerceptionResult(
+                            timestamp=item.timestamp,
+                            output=out,
+                            roi=roi if gui else None,
+                            reused=reused,
+                        ),
                         timeout=0.5,
                     )
                 except queue.Full:
@@ -205,8 +272,10 @@ def main() -> None:
     worker_thread = threading.Thread(target=worker_loop, name="perception_worker", daemon=True)
     capture_thread.start()
     worker_thread.start()
+    pin_current_thread(tc.output_cpus, "output")
 
     frame_count = 0
+    reused_count = 0
     fps_window_start = time.time()
 
     try:
@@ -220,22 +289,35 @@ def main() -> None:
             if result is None:
                 break
 
+            cpu_meter.mark("output")
             out = result.output
             frame_count += 1
+            reused_count += int(result.reused)
 
             now = time.time()
             window_dt = now - fps_window_start
             if window_dt >= 1.0:
                 current_fps = frame_count / window_dt if window_dt > 0 else 0.0
+                extra: dict[str, Any] = {}
+                if state.rectifier is not None:
+                    extra["remap_ms"] = round(state.rectifier.last_ms, 3)
+                if change is not None:
+                    extra["reused"] = reused_count
+                # Per-thread CPU over the window, % of one core.
+                for role, pct in cpu_meter.window().items():
+                    extra[f"cpu_{role}"] = pct
                 log(
                     "perception_fps",
                     fps=current_fps,
                     target_fps=cfg.fps,
                     window_s=window_dt,
                     frames=frame_count,
+                    proc_scale=round(state.scale, 2),
+                    **extra,
                 )
                 fps_window_start = now
                 frame_count = 0
+                reused_count = 0
 
             # Robot frame: X+ right, Y+ forward; clamp so sqrt(px^2+py^2) <= 1 (max speed)
             px_out, py_out = to_robot_frame_clamped(out.px, out.py)
@@ -251,6 +333,19 @@ def main() -> None:
                 target_px=out.target_px,
                 target_py=out.target_py,
             )
+            if cfg.prediction.enabled:
+                pkt.pred_px, pkt.pred_py = to_robot_frame_clamped(out.pred_px, out.pred_py)
+                pkt.pred_target_px, pkt.pred_target_py = out.pred_target_px, out.pred_target_py
+                pkt.horizon_s = out.horizon_s
+            if cfg.heading.branches:
+                pkt.branches = []
+                for br in out.branches:
+                    bx, by = to_robot_frame_clamped(br["px"], br["py"])
+                    pkt.branches.append({"px": bx, "py": by, "agreement": br["agreement"]})
+            if cfg.heading.estimator == "weighted":
+                pkt.lookahead = [
+                    None if v is None else to_robot_frame_clamped(*v) for v in out.lookahead
+                ]
             line = pkt.to_json(zone_encoding=cfg.comms.zone_encoding)
             if sender is None:
                 print(line, flush=True)
@@ -258,7 +353,8 @@ def main() -> None:
                 sender.send_line(line)
 
             if gui:
-                overlay = draw_overlay(result.roi, state.p_prev, out.zone, out.gamma)
+                # state.p_prev is updated in place by the worker; draw this frame's copy.
+                overlay = draw_overlay(result.roi, np.array([out.px, out.py]), out.zone, out.gamma)
                 cv2.imshow("perception_roi", overlay)
                 if cfg.show_masks and "masks" in out.debug_artifacts:
                     cv2.imshow("perception_masks", make_mask_preview(out.debug_artifacts["masks"]))
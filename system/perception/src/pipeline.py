@@ -2,16 +2,28 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Any
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Mapping, Sequence
 
+import cv2
 import numpy as np
 
 from src.config import AppConfig
-from src.utils.math2d import unit
+from src.utils.math2d import unit, unit2
+from src.utils.predict import MotionPredictor
+from src.utils.timing import ScaleController
 from src.vision.confidence import compute_gamma
-from src.vision.heading import extract_heading
-from src.vision.masks import build_masks, to_hsv
+from src.vision.contours import ContourCache, ContourSet
+from src.vision.heading import extract_heading, find_branches
+from src.vision.classify import MASK_BITS
+from src.vision.compiled import CompiledConfig, compile_config
+from src.vision.masks import build_banded_masks, build_batch_masks, build_frame_masks
+from src.vision.rectify import Calibration, Rectifier
+from src.vision.workspace import PipelineWorkspace, buf
 from src.vision.zones import classify_zone
 
 
@@ -19,11 +31,26 @@ from src.vision.zones import classify_zone
 class PipelineState:
     """Stateful pipeline fields carried frame-to-frame."""
 
-    p_prev: np.ndarray = field(default_factory=lambda: unit([0.0, -1.0]))
+    p_prev: np.ndarray = field(default_factory=lambda: np.array([0.0, -1.0]))  # updated in place
     path_mask_key: str = "red"
+    scale: float = 1.0
+    scaler: ScaleController | None = None
+    # Tracking window as ROI fractions (x0, y0, x1, y1); None means search the full ROI.
+    track_window: tuple[float, float, float, float] | None = None
+    # Reused frame buffers; outputs' masks are then only valid until the next frame.
+    workspace: PipelineWorkspace | None = None
+    predictor: MotionPredictor | None = None
+    rectifier: Rectifier | None = None
+    mask_pool: ThreadPoolExecutor | None = None
+    # Derived from the AppConfig last passed in; rebuilt when a different one is
+    # passed. After editing cfg in place, assign compile_config(cfg) here: one
+    # attribute swap, so a frame never mixes old and new values.
+    compiled: CompiledConfig | None = None
+    # classify_zone stages skipped by its early-exit cascade, plus "frames" processed.
+    zone_skips: Counter[str] = field(default_factory=Counter)
 
 
-@dataclass
+@dataclass(slots=True)
 class PipelineOutput:
     px: float
     py: float
@@ -34,70 +61,585 @@ class PipelineOutput:
     target_detected: bool = False
     target_px: float = 0.0
     target_py: float = 0.0
+    # Every qualifying blue target, largest first: area, circularity, cx, cy (ROI px)
+    # and the unit vector px, py from the ROI centre. target_* mirror the first entry.
+    targets: list[dict[str, float]] = field(default_factory=list)
+    # With heading.branches, the path branches above a fork, best agreement with the
+    # previous heading first: px, py (unit, image frame), area, cx, cy (ROI px) and
+    # agreement. Empty when the feature is off or no fork was seen.
+    branches: list[dict[str, float]] = field(default_factory=list)
+    # heading.estimator "weighted": unfiltered unit heading (image frame) per
+    # heading.lookahead distance, None where too few rows; empty otherwise.
+    lookahead: list[tuple[float, float] | None] = field(default_factory=list)
+    # Heading/target vectors extrapolated horizon_s past the frame timestamp
+    # (cfg.prediction); equal to the unpredicted values when prediction is off.
+    pred_px: float = 0.0
+    pred_py: float = 0.0
+    pred_target_px: float = 0.0
+    pred_target_py: float = 0.0
+    horizon_s: float = 0.0
     debug_artifacts: dict[str, Any] = field(default_factory=dict)
 
 
-def run_pipeline(roi_bgr: np.ndarray, state: PipelineState, cfg: AppConfig) -> PipelineOutput:
-    """Process one ROI frame and update pipeline state."""
-    hsv = to_hsv(roi_bgr)
-    masks = build_masks(hsv, cfg)
-    heading_mask = masks[state.path_mask_key]
+def _processing_scale(state: PipelineState, cfg: AppConfig) -> float:
+    sc = cfg.scale
+    if sc.mode == "fixed":
+        state.scale = max(0.05, min(1.0, float(sc.value)))
+    elif sc.mode == "auto":
+        if state.scaler is None:
+            state.scaler = ScaleController(
+                budget_s=sc.budget_frac / max(cfg.fps, 1e-3),
+                scale=sc.value,
+                min_scale=sc.min_scale,
+                max_scale=sc.max_scale,
+                step=sc.step,
+            )
+        state.scale = state.scaler.scale
+    else:
+        raise ValueError(f"Unsupported scale mode: {sc.mode}")
+    return state.scale
+
+
+def _rectifier(state: PipelineState, roi_w: int, cfg: AppConfig) -> Rectifier | None:
+    rc = cfg.rectify
+    if not rc.enabled:
+        return None
+    if state.rectifier is None or state.rectifier.frame_w != roi_w:
+        if not rc.calibration:
+            raise ValueError("rectify.enabled requires rectify.calibration")
+        calib = Calibration.load(rc.calibration)
+        state.rectifier = Rectifier(calib, roi_w, cfg.roi_y_start, rc.cache_dir or None)
+    return state.rectifier
+
+
+def _mask_pool(state: PipelineState, cfg: AppConfig) -> ThreadPoolExecutor | None:
+    workers = min(int(cfg.threads.mask_workers), len(MASK_BITS))
+    if workers <= 1:
+        return None
+    if state.mask_pool is None:
+        # Each worker runs OpenCV kernels that use cv2's own pool; keep the
+        # product within the core count instead of oversubscribing.
+        if hasattr(os, "sched_getaffinity"):
+            cpus = len(os.sched_getaffinity(0))
+        else:
+            cpus = os.cpu_count() or 1
+        cv_threads = max(1, cpus // workers)
+        if cv2.getNumThreads() > cv_threads:
+            cv2.setNumThreads(cv_threads)
+        state.mask_pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="perception_mask"
+        )
+    return state.mask_pool
+
+
+def _contours_to_roi(contours: Any, sx: float, sy: float) -> list[np.ndarray]:
+    k = np.array([1.0 / sx, 1.0 / sy])
+    return [np.rint(c * k).astype(np.int32) for c in contours]
+
 
-    raw_heading, area_used, accepted_path_contours, heading_debug = extract_heading(
-        red_mask=heading_mask,
-        prev_heading=state.p_prev,
-        min_area=cfg.heading.min_area,
-        use_centerline=cfg.heading.use_centerline,
+def _box_to_roi(box: tuple[int, int, int, int], sx: float, sy: float) -> tuple[int, int, int, int]:
+    x0, y0, x1, y1 = box
+    return int(round(x0 / sx)), int(round(y0 / sy)), int(round(x1 / sx)), int(round(y1 / sy))
+
+
+def _window_px(
+    window: tuple[float, float, float, float], w: int, h: int
+) -> tuple[int, int, int, int]:
+    x0, y0 = int(window[0] * w), int(window[1] * h)
+    x1, y1 = int(np.ceil(window[2] * w)), int(np.ceil(window[3] * h))
+    return x0, y0, max(x0 + 1, x1), max(y0 + 1, y1)
+
+
+def _next_window(
+    bbox: tuple[int, int, int, int], margin: float, w: int, h: int
+) -> tuple[float, float, float, float]:
+    x0, y0, x1, y1 = bbox
+    return (
+        max(0.0, (x0 - margin) / w),
+        max(0.0, (y0 - margin) / h),
+        min(1.0, (x1 + margin) / w),
+        min(1.0, (y1 + margin) / h),
     )
 
-    p_filt = unit(cfg.alpha * unit(state.p_prev) + (1.0 - cfg.alpha) * unit(raw_heading))
-    if float(np.linalg.norm(p_filt)) < 1e-9:
-        p_filt = unit([0.0, -1.0])
-    state.p_prev = p_filt
+
+def _compiled(state: PipelineState, cfg: AppConfig) -> CompiledConfig:
+    cc = state.compiled
+    if cc is None or cc.cfg is not cfg:
+        cc = state.compiled = compile_config(cfg)
+    return cc
+
+
+def _target_vector(cx: float, cy: float, w: int, h: int) -> tuple[float, float]:
+    """Unit vector from the ROI centre to (cx, cy), with y up; zero if centred."""
+    if w <= 0 or h <= 0:
+        return 0.0, 0.0
+    dx = (cx - w / 2.0) / (w / 2.0)
+    dy = (h / 2.0 - cy) / (h / 2.0)
+    return unit2(float(dx), float(dy))
+
+
+def _resize_for_processing(
+    roi_bgr: np.ndarray, scale: float, ws: PipelineWorkspace | None = None
+) -> tuple[np.ndarray, float, float]:
+    roi_h, roi_w = roi_bgr.shape[:2]
+    if scale >= 0.999:
+        return roi_bgr, 1.0, 1.0
+    proc_w = max(1, int(round(roi_w * scale)))
+    proc_h = max(1, int(round(roi_h * scale)))
+    dst = buf(ws, "proc_bgr", (proc_h, proc_w) + roi_bgr.shape[2:])
+    proc_bgr = cv2.resize(roi_bgr, (proc_w, proc_h), dst=dst, interpolation=cv2.INTER_AREA)
+    return proc_bgr, proc_w / roi_w, proc_h / roi_h
+
+
+@dataclass(slots=True)
+class _FrameMeasure:
+    """Per-frame results that do not depend on the heading history."""
+
+    raw_heading: np.ndarray | None  # None when no line was fitted
+    area_used: float
+    accepted_path_contours: list[np.ndarray]
+    heading_debug: dict[str, Any]
+    zone: str
+    zone_debug: dict[str, Any]
+    target_detected: bool
+    target_px: float
+    target_py: float
+    targets: list[dict[str, float]]
+    branches: list[dict[str, float]]
+    lookahead: list[tuple[float, float] | None]
+    masks: Mapping[str, np.ndarray]
+    contour_traces: int
+    scale: float
+    roi_size: tuple[int, int]  # (w, h)
+
+
+def _branches(
+    mask: np.ndarray, p_prev: np.ndarray, min_area: float, min_rows: int, sx: float, sy: float
+) -> tuple[list[dict[str, float]], int | None]:
+    """Fork branches of the processing-scale mask and the fork row, mapped back to ROI pixels."""
+    branches, split = find_branches(mask, p_prev, min_area, min_rows)
+    if split is not None:
+        split = int(round(split / sy))
+    if sx * sy == 1.0:
+        return branches, split
+    area_scale = sx * sy
+    prev_x, prev_y = unit2(float(p_prev[0]), float(p_prev[1]))
+    for br in branches:
+        px, py = unit2(br["px"] / sx, br["py"] / sy)
+        br.update(
+            px=px,
+            py=py,
+            area=br["area"] / area_scale,
+            cx=br["cx"] / sx,
+            cy=br["cy"] / sy,
+            agreement=px * prev_x + py * prev_y,
+        )
+    branches.sort(key=lambda br: br["agreement"], reverse=True)
+    return branches, split
+
+
+def _measure(
+    masks: Mapping[str, np.ndarray],
+    roi_shape: tuple[int, ...],
+    sx: float,
+    sy: float,
+    scale: float,
+    state: PipelineState,
+    cfg: AppConfig,
+    ws: PipelineWorkspace | None = None,
+) -> _FrameMeasure:
+    roi_h, roi_w = roi_shape[:2]
+    heading_mask = masks[state.path_mask_key]
+    proc_h, proc_w = heading_mask.shape[:2]
+    cc = _compiled(state, cfg)
+    th = cc.thresholds(sx, sy, scale)
+    area_scale = th.area_scale
+    full_debug = cc.debug_level == "full"
+    # Each mask is traced at most once; heading and zones share the results.
+    contours = ContourCache(masks, ws)
+
+    def fit_heading(
+        mask: np.ndarray, path_contours: Any
+    ) -> tuple[np.ndarray, float, list[np.ndarray], dict[str, Any]]:
+        return extract_heading(
+            red_mask=mask,
+            prev_heading=state.p_prev,
+            min_area=th.heading_min_area,
+            use_centerline=cfg.heading.use_centerline,
+            contours=path_contours,
+            estimator=cfg.heading.estimator,
+            scanlines=cfg.heading.scanlines,
+            scanline_min_run=th.scanline_min_run,
+            ws=ws,
+            row_weight_decay=cfg.heading.row_weight_decay,
+            lookahead=cfg.heading.lookahead,
+        )
+
+    def confident(fit: tuple[np.ndarray, float, list[np.ndarray], dict[str, Any]]) -> bool:
+        gamma_fit = compute_gamma(fit[1] / area_scale, cfg.confidence.expected_area)
+        return bool(fit[3]["fit_ok"]) and gamma_fit >= cfg.tracking.min_gamma
+
+    fit = None
+    window_traces = 0
+    if cfg.tracking.enabled and state.track_window is not None:
+        x0, y0, x1, y1 = _window_px(state.track_window, proc_w, proc_h)
+        crop = heading_mask[y0:y1, x0:x1]
+        window_set = None
+        if cfg.heading.estimator != "scanline":
+            found, _ = cv2.findContours(crop, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            window_set = ContourSet(found)
+            window_traces = 1
+        fit = fit_heading(crop, window_set)
+        if confident(fit):
+            heading_dbg = fit[3]
+            bx0, by0, bx1, by1 = heading_dbg["bbox"]
+            heading_dbg.update(
+                bbox=(bx0 + x0, by0 + y0, bx1 + x0, by1 + y0), window=(x0, y0, x1, y1)
+            )
+            offset = np.array([x0, y0], dtype=np.int32)
+            fit = (fit[0], fit[1], [c + offset for c in fit[2]], heading_dbg)
+            # With every path pixel inside the window its trace equals the full
+            # one, so zones reuse it; path outside the window still needs a trace.
+            if window_set is not None and cv2.countNonZero(crop) == cv2.countNonZero(heading_mask):
+                contours.put(state.path_mask_key, window_set.shifted(x0, y0))
+        else:
+            fit = None  # lost the line inside the window: search the full ROI this frame
+    if fit is None:
+        # The scanline estimator reads the mask directly; zones trace it only if needed.
+        path_contours = None
+        if cfg.heading.estimator != "scanline":
+            path_contours = contours.get(state.path_mask_key)
+        fit = fit_heading(heading_mask, path_contours)
+    if cfg.tracking.enabled:
+        margin = cfg.tracking.margin_px * scale
+        state.track_window = None
+        if confident(fit):
+            state.track_window = _next_window(fit[3]["bbox"], margin, proc_w, proc_h)
+    raw_heading, area_used, accepted_path_contours, heading_debug = fit
+    if not heading_debug["fit_ok"]:
+        raw_heading = None
+    elif area_scale != 1.0:
+        # Undo anisotropic rounding of the resize.
+        raw_heading = unit((float(raw_heading[0]) / sx, float(raw_heading[1]) / sy))
+    lookahead = heading_debug.get("lookahead", [])
+    if area_scale != 1.0:
+        lookahead = [None if v is None else unit2(v[0] / sx, v[1] / sy) for v in lookahead]
+        # The tracking window above stays in processing pixels; reported boxes do not.
+        for key in ("bbox", "window"):
+            if key in heading_debug:
+                heading_debug[key] = _box_to_roi(heading_debug[key], sx, sy)
+    branches: list[dict[str, float]] = []
+    if cfg.heading.branches:
+        branches, fork_row = _branches(
+            heading_mask, state.p_prev, th.heading_min_area, cfg.heading.branch_min_rows, sx, sy
+        )
+        heading_debug["fork_row"] = fork_row
+        if branches:
+            # Follow the branch that agrees best with where we were going.
+            raw_heading = np.array([branches[0]["px"], branches[0]["py"]], dtype=np.float64)
 
     zone, zone_debug = classify_zone(
         masks=masks,
-        zone_cfg=cfg.zones,
+        zone_cfg=th.zones,
         path_mask_key=state.path_mask_key,
+        contours=contours,
+        need_confidences=cc.debug_level != "none",
     )
-    gamma = compute_gamma(area_used, cfg.confidence.expected_area)
-
-    path_detected = heading_debug.get("fit_ok", False)
 
     # target_detected: True when blue circular blob found (TARGET zone), False otherwise
-    target_found = zone_debug.get("target_found", False)
-    target_detected = bool(target_found)
-    target_px, target_py = 0.0, 0.0
-    if target_detected:
-        tb = zone_debug.get("target_best", {})
-        cx = tb.get("cx", 0.0)
-        cy = tb.get("cy", 0.0)
-        h, w = masks["blue"].shape[:2]
-        if w > 0 and h > 0:
-            dx = (cx - w / 2.0) / (w / 2.0)
-            dy = (h / 2.0 - cy) / (h / 2.0)
-            norm = float(np.linalg.norm([dx, dy]))
-            if norm > 1e-9:
-                target_px = float(dx / norm)
-                target_py = float(dy / norm)
+    target_detected = bool(zone_debug.get("target_found", False))
+    if area_scale != 1.0:
+        area_used = area_used / area_scale
+        for tgt in zone_debug["targets"]:
+            tgt.update(area=tgt["area"] / area_scale, cx=tgt["cx"] / sx, cy=tgt["cy"] / sy)
+        zone_debug["path_area_total"] /= area_scale
+        zone_debug["danger_area_largest"] /= area_scale
+        if full_debug:
+            zone_debug["path_contours"] = _contours_to_roi(zone_debug["path_contours"], sx, sy)
+            boxes = zone_debug["danger_boxes"].astype(np.float64)
+            boxes[:, 0::2] /= sx
+            boxes[:, 1::2] /= sy
+            zone_debug["danger_boxes"] = np.rint(boxes).astype(np.int32)
+            accepted_path_contours = _contours_to_roi(accepted_path_contours, sx, sy)
+    if not full_debug:
+        del zone_debug["path_contours"], zone_debug["danger_boxes"]
+    targets = []
+    for tgt in zone_debug["targets"]:
+        px, py = _target_vector(tgt["cx"], tgt["cy"], roi_w, roi_h)
+        targets.append(dict(tgt, px=px, py=py))
+    target_px, target_py = (targets[0]["px"], targets[0]["py"]) if targets else (0.0, 0.0)
 
-    return PipelineOutput(
-        px=float(p_filt[0]),
-        py=float(p_filt[1]),
+    return _FrameMeasure(
+        raw_heading=raw_heading,
+        area_used=area_used,
+        accepted_path_contours=accepted_path_contours,
+        heading_debug=heading_debug,
         zone=zone,
-        gamma=float(gamma),
-        path_detected=path_detected,
-        path_mask_key=state.path_mask_key,
+        zone_debug=zone_debug,
         target_detected=target_detected,
         target_px=target_px,
         target_py=target_py,
-        debug_artifacts={
-            "masks": masks,
+        targets=targets,
+        branches=branches,
+        lookahead=lookahead,
+        masks=masks,
+        contour_traces=contours.traces + window_traces,
+        scale=scale,
+        roi_size=(roi_w, roi_h),
+    )
+
+
+def _predict(
+    m: _FrameMeasure, state: PipelineState, cfg: AppConfig, t_frame: float, horizon_s: float
+) -> tuple[np.ndarray | None, tuple[float, float] | None]:
+    pc = cfg.prediction
+    if state.predictor is None:
+        state.predictor = MotionPredictor(pc.alpha, pc.beta, pc.max_gap_s)
+    best = m.targets[0] if m.targets else None
+    state.predictor.update(t_frame, m.raw_heading, (best["cx"], best["cy"]) if best else None)
+    t_out = t_frame + horizon_s
+    heading = state.predictor.predict_heading(t_out)
+    target = state.predictor.predict_target(t_out) if best else None
+    return heading, target
+
+
+def _horizon_s(cfg: AppConfig, t_frame: float) -> float:
+    pc = cfg.prediction
+    horizon_s = pc.latency_s + (max(0.0, time.time() - t_frame) if pc.measure_latency else 0.0)
+    return min(horizon_s, pc.max_horizon_s)
+
+
+def _finalize(
+    m: _FrameMeasure,
+    state: PipelineState,
+    cfg: AppConfig,
+    t_frame: float | None = None,
+    horizon_s: float = 0.0,
+) -> PipelineOutput:
+    """
+    Apply the heading filter (and predictor, given a timestamp) in frame order
+    and assemble the output.
+    """
+    state.zone_skips.update(m.zone_debug["skipped"])
+    state.zone_skips["frames"] += 1
+    # Scalar math: this runs per frame on two 2-vectors, where arrays only cost.
+    p_prev = state.p_prev
+    prev_x, prev_y = unit2(float(p_prev[0]), float(p_prev[1]))
+    if m.raw_heading is not None:
+        raw_heading = (float(m.raw_heading[0]), float(m.raw_heading[1]))
+    else:
+        raw_heading = (prev_x, prev_y)
+    raw_x, raw_y = unit2(*raw_heading)
+    a = cfg.alpha
+    px, py = unit2(a * prev_x + (1.0 - a) * raw_x, a * prev_y + (1.0 - a) * raw_y)
+    if px == 0.0 and py == 0.0:
+        px, py = 0.0, -1.0
+    p_prev[0], p_prev[1] = px, py
+
+    gamma = compute_gamma(m.area_used, cfg.confidence.expected_area)
+    path_detected = m.heading_debug.get("fit_ok", False)
+
+    pred_heading, pred_target = (px, py), None
+    if cfg.prediction.enabled and t_frame is not None:
+        heading, pred_target = _predict(m, state, cfg, t_frame, horizon_s)
+        if heading is not None:
+            pred_heading = heading
+    else:
+        horizon_s = 0.0
+    pred_target_px, pred_target_py = m.target_px, m.target_py
+    if pred_target is not None:
+        pred_target_px, pred_target_py = _target_vector(*pred_target, *m.roi_size)
+
+    # none: nothing retained; summary: scalars only; full: also masks and contours.
+    level = _compiled(state, cfg).debug_level
+    debug_artifacts: dict[str, Any] = {}
+    if level != "none":
+        debug_artifacts = {
             "raw_heading": raw_heading,
-            "path_area_used": area_used,
+            "path_area_used": m.area_used,
             "path_mask_key": state.path_mask_key,
-            "accepted_path_contours": accepted_path_contours,
-            "heading_debug": heading_debug,
-            "zone_debug": zone_debug,
-        },
+            "heading_debug": m.heading_debug,
+            "zone_debug": m.zone_debug,
+            "contour_traces": m.contour_traces,
+            "proc_scale": m.scale,
+        }
+    if level == "full":
+        debug_artifacts["masks"] = m.masks
+        debug_artifacts["accepted_path_contours"] = m.accepted_path_contours
+
+    return PipelineOutput(
+        px=px,
+        py=py,
+        zone=m.zone,
+        gamma=float(gamma),
+        path_detected=path_detected,
+        path_mask_key=state.path_mask_key,
+        target_detected=m.target_detected,
+        target_px=m.target_px,
+        target_py=m.target_py,
+        targets=m.targets,
+        branches=m.branches,
+        lookahead=m.lookahead,
+        pred_px=float(pred_heading[0]),
+        pred_py=float(pred_heading[1]),
+        pred_target_px=pred_target_px,
+        pred_target_py=pred_target_py,
+        horizon_s=horizon_s,
+        debug_artifacts=debug_artifacts,
     )
+
+
+def run_pipeline(
+    roi_bgr: np.ndarray,
+    state: PipelineState,
+    cfg: AppConfig,
+    timestamp: float | None = None,
+) -> PipelineOutput:
+    """
+    Process one ROI frame and update pipeline state.
+
+    The frame may be processed at a reduced scale (cfg.scale); area thresholds
+    are rescaled to match and all outputs are reported in ROI coordinates.
+    With state.workspace set, steady-state frames make no large allocations.
+    cfg.debug_level controls what debug_artifacts retains (see compiled.DEBUG_LEVELS).
+    With cfg.rectify enabled, masks and all outputs are in rectified ROI space.
+    cfg.row_bands masks far rows at lower resolution (not combined with rectify).
+    `timestamp` is the frame's capture time (time.time() clock; defaults to now)
+    used by cfg.prediction to extrapolate pred_* to the expected actuation time.
+    """
+    t_start = time.perf_counter()
+    t_frame = time.time() if timestamp is None else float(timestamp)
+    cc = _compiled(state, cfg)
+    scale = _processing_scale(state, cfg)
+    ws = state.workspace
+    proc_bgr, sx, sy = _resize_for_processing(roi_bgr, scale, ws)
+    rectifier = _rectifier(state, roi_bgr.shape[1], cfg)
+    # Cleaning kernels shrink with the frame so thin lines survive reduced scales.
+    th = cc.thresholds(sx, sy, scale)
+    if cfg.row_bands.enabled and rectifier is None:
+        masks = build_banded_masks(proc_bgr, cfg, ws, cc, th.band_morph)
+    else:
+        masks = build_frame_masks(proc_bgr, cfg, ws, rectifier, cc, th.morph)
+    pool = _mask_pool(state, cfg)
+    if pool is not None:
+        # The masks heading and zones will read; path first since it is needed first.
+        # Green only feeds zone confidences, which the cascade skips without debug.
+        names = [state.path_mask_key, "blue", "danger"]
+        if cc.debug_level != "none":
+            names.append("green")
+        masks.prefetch(dict.fromkeys(names), pool)
+    measure = _measure(masks, roi_bgr.shape, sx, sy, scale, state, cfg, ws)
+    if state.scaler is not None and cfg.scale.mode == "auto":
+        state.scaler.update(time.perf_counter() - t_start)
+    out = _finalize(measure, state, cfg, t_frame, _horizon_s(cfg, t_frame))
+    if rectifier is not None and out.debug_artifacts:
+        out.debug_artifacts["remap_ms"] = rectifier.last_ms
+    return out
+
+
+def reuse_output(
+    out: PipelineOutput,
+    roi_shape: tuple[int, ...],
+    state: PipelineState,
+    cfg: AppConfig,
+    timestamp: float,
+) -> PipelineOutput:
+    """
+    Return `out` resent for a later, unchanged frame captured at `timestamp`.
+
+    Measurements and the heading filter are kept as they are, but pred_* and
+    horizon_s are extrapolated again from the predictor to this frame's time,
+    so the prediction does not lag behind by the age of the reused frame.
+    """
+    if not cfg.prediction.enabled or state.predictor is None:
+        return out
+    horizon_s = _horizon_s(cfg, timestamp)
+    t_out = timestamp + horizon_s
+    heading = state.predictor.predict_heading(t_out)
+    pred_px, pred_py = out.px, out.py
+    if heading is not None:
+        pred_px, pred_py = float(heading[0]), float(heading[1])
+    pred_target_px, pred_target_py = out.target_px, out.target_py
+    target = state.predictor.predict_target(t_out) if out.targets else None
+    if target is not None:
+        pred_target_px, pred_target_py = _target_vector(*target, roi_shape[1], roi_shape[0])
+    return replace(
+        out,
+        pred_px=pred_px,
+        pred_py=pred_py,
+        pred_target_px=pred_target_px,
+        pred_target_py=pred_target_py,
+        horizon_s=horizon_s,
+    )
+
+
+def batch_fallback_reasons(cfg: AppConfig) -> list[str]:
+    """Config options that make run_pipeline_batch fall back to the per-frame loop."""
+    # Auto scale, tracking and branch ranking need the previous frame's result
+    # before the next can be measured; row bands and rectify are not batched.
+    checks = {
+        "scale.mode=auto": cfg.scale.mode != "fixed",
+        "tracking": cfg.tracking.enabled,
+        "rectify": cfg.rectify.enabled,
+        "heading.branches": cfg.heading.branches,
+        "row_bands": cfg.row_bands.enabled,
+    }
+    return [name for name, on in checks.items() if on]
+
+
+def run_pipeline_batch(
+    frames: np.ndarray | Sequence[np.ndarray],
+    state: PipelineState,
+    cfg: AppConfig,
+    workers: int = 1,
+) -> list[PipelineOutput]:
+    """
+    Process a stack of equally sized ROI frames (N, H, W, 3) for offline use.
+
+    Color classification runs once over the whole stack; per-frame heading and
+    zone measurements follow, and the heading filter is applied in frame order
+    at the end, so `workers` threads can measure chunks of the stack in parallel.
+    Outputs are identical to calling run_pipeline on each frame.
+
+    This saves the per-frame Python overhead and batches the color lookup,
+    but morphology, labelling and contour work stay per frame and dominate,
+    so on one core expect roughly loop speed; the gain comes from `workers`.
+    Configs named by batch_fallback_reasons run the per-frame loop instead.
+    state.workspace is not used here since frames of a batch are alive together,
+    and without frame timestamps the pred_* fields are left unpredicted.
+    """
+    if len(frames) == 0:
+        return []
+    if batch_fallback_reasons(cfg):
+        return [run_pipeline(f, state, cfg) for f in frames]
+
+    cc = _compiled(state, cfg)
+    scale = _processing_scale(state, cfg)
+    if scale >= 0.999:
+        procs = np.asarray(frames)
+        factors = [(1.0, 1.0)] * len(procs)
+    else:
+        resized = [_resize_for_processing(f, scale) for f in frames]
+        procs = np.stack([r[0] for r in resized])
+        factors = [(sx, sy) for _, sx, sy in resized]
+    roi_shape = np.shape(frames[0])
+    morph = cc.thresholds(*factors[0], scale).morph  # depends on the nominal scale only
+
+    def measure_chunk(lo: int, hi: int) -> list[_FrameMeasure]:
+        mask_sets = build_batch_masks(procs[lo:hi], cfg, cc, morph)
+        return [
+            _measure(masks, roi_shape, sx, sy, scale, state, cfg)
+            for masks, (sx, sy) in zip(mask_sets, factors[lo:hi])
+        ]
+
+    # Measurements are independent of heading history, so chunks may run on
+    # worker threads (OpenCV releases the GIL); the filter below stays ordered.
+    n = len(procs)
+    workers = max(1, min(int(workers), n))
+    bounds = [(i * n // workers, (i + 1) * n // workers) for i in range(workers)]
+    if workers == 1:
+        measures = measure_chunk(0, n)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            measures = [m for part in pool.map(lambda b: measure_chunk(*b), bounds) for m in part]
+    return [_finalize(m, state, cfg) for m in measures]
@@ -86,10 +86,12 @@ def _draw_status(frame: np.ndarray, zone: str, gamma: float, fps_now: float) ->
     )
 
 
-def _print_profile(capture_ms: float, pre_ms: float, pipeline_ms: float, render_ms: float, total_ms: float) -> None:
+def _print_profile(
+    capture_ms: float, pipeline_ms: float, render_ms: float, total_ms: float
+) -> None:
     print(
-        f"[profile] cap={capture_ms:.1f}ms pre={pre_ms:.1f}ms "
-        f"pipe={pipeline_ms:.1f}ms draw={render_ms:.1f}ms total={total_ms:.1f}ms"
+        f"[profile] cap={capture_ms:.1f}ms pipe={pipeline_ms:.1f}ms "
+        f"draw={render_ms:.1f}ms total={total_ms:.1f}ms"
     )
 
 
@@ -178,7 +180,11 @@ def main() -> None:
     parser.add_argument("--fps", type=float, default=30.0)
     parser.add_argument("--backend", choices=["auto", "gstreamer", "ffmpeg"], default="auto")
     parser.add_argument("--log-rate", type=float, default=0.0, help="JSON log rate in Hz (0 disables)")
-    parser.add_argument("--proc-scale", type=float, default=1.0, help="ROI processing scale (0.25..1.0)")
+    parser.add_argument(
+        "--proc-scale",
+        default=None,
+        help="ROI processing scale (0.25..1.0) or 'auto'; defaults to the config's scale section",
+    )
     parser.add_argument("--display-scale", type=float, default=1.0, help="Display scale (0.25..1.0)")
     parser.add_argument("--profile", action="store_true", help="Print timing breakdowns")
     parser.add_argument("--no-masks", action="store_true")
@@ -186,12 +192,19 @@ def main() -> None:
     args = parser.parse_args()
 
     cv2.setUseOptimized(True)
-    proc_scale = max(0.25, min(1.0, float(args.proc_scale)))
     display_scale = max(0.25, min(1.0, float(args.display_scale)))
     cfg = load_config(args.config)
     cfg.fps = args.fps
     cfg.camera.source = args.source
+    if args.proc_scale == "auto":
+        cfg.scale.mode = "auto"
+    elif args.proc_scale is not None:
+        cfg.scale.mode = "fixed"
+        cfg.scale.value = max(0.25, min(1.0, float(args.proc_scale)))
     show_masks = not args.no_masks
+    if cfg.debug_level == "auto":
+        # The HUD reads zone confidences; the mask panel needs full artifacts.
+        cfg.debug_level = "full" if show_masks else "summary"
 
     state = PipelineState()
 
@@ -224,7 +237,7 @@ def main() -> None:
     frame_idx = 0
     cached_panel: Optional[np.ndarray] = None
     last_panel_t = 0.0
-    profile_acc = {"cap": 0.0, "pre": 0.0, "pipe": 0.0, "draw": 0.0, "total": 0.0}
+    profile_acc = {"cap": 0.0, "pipe": 0.0, "draw": 0.0, "total": 0.0}
     profile_count = 0
     profile_last = time.perf_counter()
 
@@ -242,19 +255,8 @@ def main() -> None:
                 roi = crop_roi(frame, cfg.roi_y_start)
             t1 = time.perf_counter()
 
-            display_roi = roi
-            if proc_scale < 0.999:
-                roi_proc = cv2.resize(
-                    roi,
-                    (int(roi.shape[1] * proc_scale), int(roi.shape[0] * proc_scale)),
-                    interpolation=cv2.INTER_AREA,
-                )
-            else:
-                roi_proc = roi
+            out = run_pipeline(roi_bgr=roi, state=state, cfg=cfg)
             t2 = time.perf_counter()
-
-            out = run_pipeline(roi_bgr=roi_proc, state=state, cfg=cfg)
-            t3 = time.perf_counter()
             zone_conf = out.debug_artifacts.get("zone_debug", {}).get("zone_confidences", {})
             now_epoch = time.time()
             if log_period > 0.0 and (now_epoch - last_log_t) >= log_period:
@@ -276,7 +278,7 @@ def main() -> None:
                 )
                 last_log_t = now_epoch
 
-            canvas = display_roi.copy()
+            canvas = roi.copy()
             _draw_heading_arrow(canvas, out.px, out.py, out.gamma)
 
             now = time.perf_counter()
@@ -290,7 +292,7 @@ def main() -> None:
                 now_perf = time.perf_counter()
                 # Rebuild panel at a lower rate; overlays still update every frame.
                 if cached_panel is None or (now_perf - last_panel_t) >= 0.1:
-                    cached_panel = _make_small_mask_panel(out.debug_artifacts["masks"], roi_proc.shape)
+                    cached_panel = _make_small_mask_panel(out.debug_artifacts["masks"], roi.shape)
                     last_panel_t = now_perf
                 _overlay_mask_panel(canvas, cached_panel)
 
@@ -319,22 +321,20 @@ def main() -> None:
             if (cv2.waitKey(1) & 0xFF) == ord("q"):
                 break
 
-            t4 = time.perf_counter()
+            t3 = time.perf_counter()
             profile_acc["cap"] += (t1 - t0) * 1000.0
-            profile_acc["pre"] += (t2 - t1) * 1000.0
-            profile_acc["pipe"] += (t3 - t2) * 1000.0
-            profile_acc["draw"] += (t4 - t3) * 1000.0
-            profile_acc["total"] += (t4 - t_loop0) * 1000.0
+            profile_acc["pipe"] += (t2 - t1) * 1000.0
+            profile_acc["draw"] += (t3 - t2) * 1000.0
+            profile_acc["total"] += (t3 - t_loop0) * 1000.0
             profile_count += 1
             if args.profile and (time.perf_counter() - profile_last) >= 1.0 and profile_count > 0:
                 _print_profile(
                     capture_ms=profile_acc["cap"] / profile_count,
-                    pre_ms=profile_acc["pre"] / profile_count,
                     pipeline_ms=profile_acc["pipe"] / profile_count,
                     render_ms=profile_acc["draw"] / profile_count,
                     total_ms=profile_acc["total"] / profile_count,
                 )
-                profile_acc = {"cap": 0.0, "pre": 0.0, "pipe": 0.0, "draw": 0.0, "total": 0.0}
+                profile_acc = {"cap": 0.0, "pipe": 0.0, "draw": 0.0, "total": 0.0}
                 profile_count = 0
                 profile_last = time.perf_counter()
 
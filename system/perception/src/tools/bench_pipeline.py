@@ -0,0 +1,655 @@
+"""Offline benchmarks for perception pipeline stages on recorded ROI clips."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from collections import Counter
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any, Callable
+
+if __package__ is None or __package__ == "":
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import cv2
+import numpy as np
+
+from src.comms.packet import ZONE_TO_INT, PerceptionPacket
+from src.config import AppConfig, ClassifierConfig, MorphConfig, ThreadsConfig, load_config
+from src.pipeline import (
+    PipelineOutput,
+    PipelineState,
+    _measure,
+    batch_fallback_reasons,
+    run_pipeline,
+    run_pipeline_batch,
+)
+from src.utils.math2d import to_robot_frame_clamped, unit2
+from src.tools.arrow_sim import _synthetic_frame
+from src.vision.classify import (
+    MASK_BITS,
+    bgr_table,
+    classify_bgr,
+    classify_hsv,
+    hsv_luts,
+    label_mask,
+)
+from src.vision.compiled import compile_config
+from src.vision.contours import ContourCache
+from src.vision.heading import extract_heading
+from src.vision.fused import NUMBA_AVAILABLE, fused_classify
+from src.vision.masks import (
+    _lazy_from_labels,
+    _raw_mask_inrange,
+    build_banded_masks,
+    build_frame_masks,
+    build_masks,
+    to_hsv,
+)
+from src.vision.rectify import Calibration, Rectifier
+from src.vision.workspace import PipelineWorkspace
+from src.vision.zones import classify_zone
+
+
+def _load_frames(clips: list[str], cfg: AppConfig, limit: int) -> list[np.ndarray]:
+    """Load ROI frames from recorded clips, or synthesize them when no clip is given."""
+    if not clips:
+        h = cfg.camera.height - cfg.roi_y_start
+        return [_synthetic_frame(cfg.camera.width, h, i / cfg.fps) for i in range(limit)]
+
+    frames: list[np.ndarray] = []
+    for clip in clips:
+        cap = cv2.VideoCapture(clip)
+        if not cap.isOpened():
+            raise SystemExit(f"Could not open clip: {clip}")
+        while len(frames) < limit:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+    if not frames:
+        raise SystemExit("No frames decoded from clips")
+    return frames
+
+
+def _time_per_frame_ms(fn: Callable[[Any], Any], frames: list[Any], repeat: int) -> float:
+    fn(frames[0])  # warm caches / lazy tables
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for f in frames:
+            fn(f)
+    return (time.perf_counter() - t0) * 1000.0 / (repeat * len(frames))
+
+
+def _run_clip(frames: list[np.ndarray], cfg: AppConfig) -> None:
+    state = PipelineState()
+    for f in frames:
+        run_pipeline(f, state, cfg)
+
+
+def _bench_masks(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Compare the inRange mask path against the lookup-table classifier.
+
+    Three levels: classify (raw masks from a ready HSV image, what the
+    classifier replaces), build_masks (all five masks cleaned, the old eager
+    path) and run_pipeline (headless with debug_level none, as on the robot,
+    so only the masks the frame reads are built; auto would build them all).
+    """
+    modes = ["inrange", "lut"]
+    cfg = replace(cfg, debug_level="none")
+    cfgs = {m: replace(cfg, classifier=ClassifierConfig(mode=m)) for m in modes}
+    cc = compile_config(cfg)
+    hsvs = [to_hsv(f) for f in frames]
+
+    def classify(hsv: np.ndarray, mode: str) -> list[np.ndarray]:
+        if mode == "inrange":
+            return [_raw_mask_inrange(hsv, cc, name) for name in MASK_BITS]
+        labels = classify_hsv(hsv, cc.luts)
+        return [label_mask(labels, bits) for bits in MASK_BITS.values()]
+
+    mismatched = 0
+    for hsv in hsvs:
+        ref = build_masks(hsv, cfgs["inrange"])
+        got = build_masks(hsv, cfgs["lut"])
+        if any(not np.array_equal(ref[k], got[k]) for k in ref):
+            mismatched += 1
+
+    h, w = frames[0].shape[:2]
+    print(f"[masks] frames={len(frames)} shape={w}x{h} mismatched={mismatched}")
+    base: tuple[float, ...] = ()
+    for m in modes:
+        c = cfgs[m]
+        state = PipelineState()
+        times = (
+            _time_per_frame_ms(lambda hsv: classify(hsv, m), hsvs, repeat),
+            _time_per_frame_ms(lambda f: dict(build_masks(to_hsv(f), c)), frames, repeat),
+            _time_per_frame_ms(lambda f: run_pipeline(f, state, c), frames, repeat),
+        )
+        base = base or times
+        cls_ms, masks_ms, pipe_ms = times
+        print(
+            f"  {m:8s} classify={cls_ms:.3f}ms ({base[0] / cls_ms:.2f}x) "
+            f"build_masks={masks_ms:.3f}ms ({base[1] / masks_ms:.2f}x) "
+            f"run_pipeline={pipe_ms:.3f}ms ({base[2] / pipe_ms:.2f}x, {1000.0 / pipe_ms:.0f} fps)"
+        )
+
+    # debug_level none retains no masks, so run the measure stage directly.
+    state = PipelineState()
+    built = []
+    for f in frames:
+        masks = build_frame_masks(f, cfg)
+        _measure(masks, f.shape, 1.0, 1.0, 1.0, state, cfg)
+        built.append(len(masks.built))
+    print(f"  lazy masks built per frame (debug_level=none): {float(np.mean(built)):.2f} of 5")
+
+
+def _bench_bgr_accuracy(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Report bgr_lut agreement with the exact HSV path, per mask and end to end."""
+    bits = cfg.classifier.bgr_bits
+    hsv_cfg = replace(cfg, classifier=ClassifierConfig(mode="lut"))
+    bgr_cfg = replace(cfg, classifier=ClassifierConfig(mode="bgr_lut", bgr_bits=bits))
+    luts = hsv_luts(cfg)
+    table = bgr_table(cfg, bits)
+
+    names = list(MASK_BITS)
+    raw_diff = dict.fromkeys(names, 0)
+    inter = dict.fromkeys(names, 0)
+    union = dict.fromkeys(names, 0)
+    zone_agree = 0
+    angle_err: list[float] = []
+    hsv_state, bgr_state = PipelineState(), PipelineState()
+    for f in frames:
+        ref_labels = classify_hsv(to_hsv(f), luts)
+        got_labels = classify_bgr(f, table, bits)
+        ref = build_frame_masks(f, hsv_cfg)
+        got = build_frame_masks(f, bgr_cfg)
+        for name, b in MASK_BITS.items():
+            disagree = ((ref_labels & b) > 0) != ((got_labels & b) > 0)
+            raw_diff[name] += int(np.count_nonzero(disagree))
+            inter[name] += int(np.count_nonzero(ref[name] & got[name]))
+            union[name] += int(np.count_nonzero(ref[name] | got[name]))
+
+        out_ref = run_pipeline(f, hsv_state, hsv_cfg)
+        out_got = run_pipeline(f, bgr_state, bgr_cfg)
+        zone_agree += int(out_ref.zone == out_got.zone)
+        dot = max(-1.0, min(1.0, out_ref.px * out_got.px + out_ref.py * out_got.py))
+        angle_err.append(math.degrees(math.acos(dot)))
+
+    pixels = len(frames) * frames[0].shape[0] * frames[0].shape[1]
+    print(f"[bgr-accuracy] frames={len(frames)} bgr_bits={bits} table={table.nbytes // 1024}KiB")
+    for name in names:
+        iou = inter[name] / union[name] if union[name] else 1.0
+        raw_pct = 100.0 * raw_diff[name] / pixels
+        print(f"  {name:7s} raw_disagree={raw_pct:.3f}% cleaned_iou={iou:.4f}")
+    print(
+        f"  zone_agreement={100.0 * zone_agree / len(frames):.1f}% "
+        f"heading_err_deg mean={float(np.mean(angle_err)):.2f} max={float(np.max(angle_err)):.2f}"
+    )
+
+    hsv_ms = _time_per_frame_ms(lambda f: classify_hsv(to_hsv(f), luts), frames, repeat)
+    bgr_ms = _time_per_frame_ms(lambda f: classify_bgr(f, table, bits), frames, repeat)
+    print(
+        f"  classify: cvtColor+lut={hsv_ms:.3f}ms bgr_lut={bgr_ms:.3f}ms ({hsv_ms / bgr_ms:.2f}x)"
+    )
+
+
+def _bench_contours(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Count findContours/labelling calls per frame with and without the shared cache."""
+    key = "red"
+    mask_sets = [dict(build_frame_masks(f, cfg)) for f in frames]
+
+    def separate(masks: dict[str, np.ndarray]) -> int:
+        heading_cache, zone_cache = ContourCache(masks), ContourCache(masks)
+        extract_heading(masks[key], np.array([0.0, -1.0]), cfg.heading.min_area,
+                        cfg.heading.use_centerline, contours=heading_cache.get(key))
+        classify_zone(masks, cfg.zones, key, contours=zone_cache)
+        return heading_cache.traces + zone_cache.traces + zone_cache.labelings
+
+    def shared(masks: dict[str, np.ndarray]) -> int:
+        cache = ContourCache(masks)
+        extract_heading(masks[key], np.array([0.0, -1.0]), cfg.heading.min_area,
+                        cfg.heading.use_centerline, contours=cache.get(key))
+        classify_zone(masks, cfg.zones, key, contours=cache)
+        return cache.traces + cache.labelings
+
+    before = float(np.mean([separate(m) for m in mask_sets]))
+    after = float(np.mean([shared(m) for m in mask_sets]))
+    sep_ms = _time_per_frame_ms(separate, mask_sets, repeat)
+    shr_ms = _time_per_frame_ms(shared, mask_sets, repeat)
+    print(f"[contours] frames={len(frames)} path_mask={key}")
+    print(
+        f"  mask passes/frame: separate={before:.2f} shared={after:.2f} saved={before - after:.2f}"
+    )
+    print(f"  heading+zones: separate={sep_ms:.3f}ms shared={shr_ms:.3f}ms")
+
+    # Early-exit cascade: zone only (debug off) vs zone plus confidences.
+    skips: Counter[str] = Counter()
+    for m in mask_sets:
+        skips.update(classify_zone(m, cfg.zones, key, need_confidences=False)[1]["skipped"])
+    full_ms = _time_per_frame_ms(lambda m: classify_zone(m, cfg.zones, key), mask_sets, repeat)
+    fast_ms = _time_per_frame_ms(
+        lambda m: classify_zone(m, cfg.zones, key, need_confidences=False), mask_sets, repeat
+    )
+    print(f"  zones: confidences={full_ms:.3f}ms cascade={fast_ms:.3f}ms skipped={dict(skips)}")
+
+
+def _heading_variants(cfg: AppConfig) -> dict[str, dict[str, Any]]:
+    h = cfg.heading
+    return {
+        "centerline": {"estimator": "fitline", "use_centerline": True},
+        "contour_pts": {"estimator": "fitline", "use_centerline": False},
+        "moments": {"estimator": "moments"},
+        "weighted": {
+            "estimator": "weighted",
+            "row_weight_decay": h.row_weight_decay,
+            "lookahead": h.lookahead,
+        },
+        f"scanline{h.scanlines}": {
+            "estimator": "scanline",
+            "scanlines": h.scanlines,
+            "scanline_min_run": h.scanline_min_run,
+        },
+    }
+
+
+def _bench_heading(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Compare heading estimators against the full centerline fit (time incl. contour trace)."""
+    key = "red"
+    masks = [dict(build_frame_masks(f, cfg))[key] for f in frames]
+    prev = np.array([0.0, -1.0], dtype=np.float32)
+    variants = _heading_variants(cfg)
+
+    def run(mask: np.ndarray, kwargs: dict[str, Any]) -> tuple[np.ndarray, float, list, dict]:
+        return extract_heading(mask, prev, cfg.heading.min_area, **kwargs)
+
+    ref = [run(m, variants["centerline"]) for m in masks]
+    print(f"[heading] frames={len(frames)} path_mask={key} reference=centerline")
+    base_ms = 0.0
+    for name, kwargs in variants.items():
+        ms = _time_per_frame_ms(lambda m: run(m, kwargs), masks, repeat)
+        base_ms = base_ms or ms
+        errs, agree = [], 0
+        for m, r in zip(masks, ref):
+            got = run(m, kwargs)
+            agree += int(got[3]["fit_ok"] == r[3]["fit_ok"])
+            if got[3]["fit_ok"] and r[3]["fit_ok"]:
+                dot = float(np.clip(np.dot(got[0], r[0]), -1.0, 1.0))
+                errs.append(math.degrees(math.acos(dot)))
+        err = f"mean={np.mean(errs):.2f} p95={np.percentile(errs, 95):.2f}" if errs else "n/a"
+        agree_pct = 100.0 * agree / len(masks)
+        print(
+            f"  {name:14s} {ms:.3f}ms ({base_ms / ms:.1f}x) fit_ok_agree={agree_pct:.0f}% "
+            f"angle_err_deg {err}"
+        )
+
+
+def _bench_batch(
+    frames: list[np.ndarray], cfg: AppConfig, repeat: int, batch: int, workers: int
+) -> None:
+    """Compare the per-frame loop against run_pipeline_batch over the same frames."""
+    stack = np.stack(frames)
+    chunks = [stack[i : i + batch] for i in range(0, len(stack), batch)]
+
+    def loop() -> list:
+        state = PipelineState()
+        return [run_pipeline(f, state, cfg) for f in frames]
+
+    def batched() -> list:
+        state = PipelineState()
+        return [o for c in chunks for o in run_pipeline_batch(c, state, cfg, workers=workers)]
+
+    same = all(
+        (a.px, a.py, a.zone, a.gamma, a.path_detected, a.target_detected)
+        == (b.px, b.py, b.zone, b.gamma, b.path_detected, b.target_detected)
+        for a, b in zip(loop(), batched())
+    )
+    loop_ms = _time_per_frame_ms(lambda _: loop(), [None], repeat) / len(frames)
+    batch_ms = _time_per_frame_ms(lambda _: batched(), [None], repeat) / len(frames)
+    fallback = ",".join(batch_fallback_reasons(cfg)) or "none"
+    print(
+        f"[batch] frames={len(frames)} batch={batch} workers={workers} "
+        f"identical={same} fallback={fallback}"
+    )
+    print(f"  loop={loop_ms:.3f}ms/frame batch={batch_ms:.3f}ms/frame ({loop_ms / batch_ms:.2f}x)")
+
+
+def _bench_remap(frames: list[np.ndarray], cfg: AppConfig, repeat: int, calibration: str) -> None:
+    """Per-frame cost of the rectify remap on the label image versus on BGR."""
+    calib_path = calibration or cfg.rectify.calibration or "configs/calibration.example.yaml"
+    calib = Calibration.load(calib_path)
+    rect = Rectifier(calib, frames[0].shape[1], cfg.roi_y_start, cache_dir=None)
+    t0 = time.perf_counter()
+    rect.maps((frames[0].shape[1], frames[0].shape[0]))
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    luts = hsv_luts(cfg)
+    labels = [classify_hsv(to_hsv(f), luts) for f in frames]
+
+    label_ms = _time_per_frame_ms(lambda l: rect.apply(l, labels=True), labels, repeat)
+    bgr_ms = _time_per_frame_ms(lambda f: rect.apply(f, labels=False), frames, repeat)
+    plain_ms = _time_per_frame_ms(lambda f: dict(build_frame_masks(f, cfg)), frames, repeat)
+    rect_ms = _time_per_frame_ms(
+        lambda f: dict(build_frame_masks(f, cfg, rectifier=rect)), frames, repeat
+    )
+    print(f"[remap] frames={len(frames)} calibration={calib_path} map_build={build_ms:.1f}ms")
+    print(f"  remap: labels(nearest)={label_ms:.3f}ms bgr(bilinear)={bgr_ms:.3f}ms")
+    print(
+        f"  build_frame_masks: plain={plain_ms:.3f}ms rectified={rect_ms:.3f}ms "
+        f"(+{rect_ms - plain_ms:.3f}ms)"
+    )
+
+
+def _bench_threads(frames: list[np.ndarray], cfg: AppConfig, repeat: int, max_workers: int) -> None:
+    """Per-frame latency of run_pipeline with mask building on 1..N threads."""
+    cv_before = cv2.getNumThreads()
+    print(f"[threads] frames={len(frames)} cpus={os.cpu_count()} cv2_threads={cv_before}")
+    base_ms = None
+    for workers in sorted({1, 2, max_workers}):
+        c = replace(cfg, threads=ThreadsConfig(mask_workers=workers))
+        cv2.setNumThreads(cv_before)
+        state = PipelineState()
+        ms = _time_per_frame_ms(lambda f: run_pipeline(f, state, c), frames, repeat)
+        if state.mask_pool is not None:
+            state.mask_pool.shutdown()
+        base_ms = base_ms or ms
+        print(
+            f"  mask_workers={workers} cv2_threads={cv2.getNumThreads()} "
+            f"run_pipeline={ms:.3f}ms ({base_ms / ms:.2f}x)"
+        )
+    cv2.setNumThreads(cv_before)
+
+
+def _bench_fused(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Fused one-pass classification (numba) vs cvtColor + LUT, and box-limited morphology."""
+    luts = hsv_luts(cfg)
+    print(f"[fused] frames={len(frames)} numba={NUMBA_AVAILABLE}")
+    if NUMBA_AVAILABLE:
+        mismatched = sum(
+            not np.array_equal(fused_classify(f, luts)[0], classify_hsv(to_hsv(f), luts))
+            for f in frames
+        )
+        ref_ms = _time_per_frame_ms(lambda f: classify_hsv(to_hsv(f), luts), frames, repeat)
+        got_ms = _time_per_frame_ms(lambda f: fused_classify(f, luts), frames, repeat)
+        print(
+            f"  classify: cvtColor+lut={ref_ms:.3f}ms fused={got_ms:.3f}ms "
+            f"({ref_ms / got_ms:.2f}x) mismatched={mismatched}"
+        )
+        fused_cfg = replace(cfg, classifier=replace(cfg.classifier, mode="lut", fused=True))
+        lut_cfg = replace(cfg, classifier=replace(cfg.classifier, mode="lut", fused=False))
+        ref_ms = _time_per_frame_ms(
+            lambda f: run_pipeline(f, PipelineState(), lut_cfg), frames, repeat
+        )
+        got_ms = _time_per_frame_ms(
+            lambda f: run_pipeline(f, PipelineState(), fused_cfg), frames, repeat
+        )
+        print(f"  run_pipeline: lut={ref_ms:.3f}ms fused={got_ms:.3f}ms ({ref_ms / got_ms:.2f}x)")
+    else:
+        print("  numba not installed: classifier.fused falls back to cvtColor + LUT")
+    # Morphology limited to per-class boxes is independent of the compiler; the
+    # (slow without numba) kernel only supplies the stats here and is not timed.
+    labelled = [fused_classify(f, luts) for f in frames[: min(len(frames), 8)]]
+    cc = compile_config(cfg)
+    full_ms = _time_per_frame_ms(lambda ls: dict(_lazy_from_labels(ls[0], cc)), labelled, repeat)
+    box_ms = _time_per_frame_ms(
+        lambda ls: dict(_lazy_from_labels(ls[0], cc, stats=ls[1])), labelled, repeat
+    )
+    print(
+        f"  all masks: full-frame morph={full_ms:.3f}ms box-limited={box_ms:.3f}ms "
+        f"({full_ms / box_ms:.2f}x)"
+    )
+
+
+def _bench_bands(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Row-band masking vs one full-resolution pass: mask stage, whole pipeline and accuracy."""
+    base = replace(
+        cfg,
+        row_bands=replace(cfg.row_bands, enabled=False),
+        rectify=replace(cfg.rectify, enabled=False),
+    )
+    banded = replace(base, row_bands=replace(cfg.row_bands, enabled=True))
+    rb = banded.row_bands
+    print(f"[bands] frames={len(frames)} edges={rb.edges} scales={rb.scales}")
+    names = ("red", "blue", "danger")
+    for label, c, build in (
+        ("full", base, lambda f, c, ws, cc: build_frame_masks(f, c, ws, None, cc)),
+        ("banded", banded, build_banded_masks),
+    ):
+        cc, ws = compile_config(c), PipelineWorkspace()
+        mask_ms = _time_per_frame_ms(
+            lambda f: [build(f, c, ws, cc)[n] for n in names], frames, repeat
+        )
+        state = PipelineState(workspace=PipelineWorkspace())
+        run_ms = _time_per_frame_ms(lambda f: run_pipeline(f, state, c), frames, repeat)
+        print(f"  {label:7s} masks={mask_ms:.3f}ms run_pipeline={run_ms:.3f}ms")
+    print(f"  {_output_deltas(frames, base, banded)}")
+
+
+def _output_deltas(frames: list[np.ndarray], ref_cfg: AppConfig, cfg: AppConfig) -> str:
+    """Heading/gamma/zone differences of cfg against ref_cfg, run over the clip in order."""
+    s_ref, s_got = PipelineState(), PipelineState()
+    errs, gammas, zones = [], [], 0
+    for f in frames:
+        ref = run_pipeline(f, s_ref, ref_cfg)
+        got = run_pipeline(f, s_got, cfg)
+        zones += int(ref.zone == got.zone)
+        gammas.append(abs(ref.gamma - got.gamma))
+        if ref.path_detected and got.path_detected:
+            errs.append(math.degrees(math.acos(min(1.0, ref.px * got.px + ref.py * got.py))))
+    err = f"mean={np.mean(errs):.2f} p95={np.percentile(errs, 95):.2f}" if errs else "n/a"
+    return (
+        f"heading_err_deg {err} gamma_abs_diff mean={np.mean(gammas):.3f} "
+        f"zone_agree={100.0 * zones / len(frames):.0f}%"
+    )
+
+
+def _morph_variants(cfg: AppConfig) -> dict[str, MorphConfig]:
+    m = replace(cfg.morph, masks={})
+    return {
+        "config": cfg.morph,
+        "ellipse": replace(m, method="morph", shape="ellipse"),
+        "rect": replace(m, method="morph", shape="rect"),
+        "cross": replace(m, method="morph", shape="cross"),
+        f"median{m.median_ksize}": replace(m, method="median"),
+        "none": replace(m, method="none"),
+        "rect,danger=none": replace(
+            m, method="morph", shape="rect", masks={"danger": {"method": "none"}}
+        ),
+    }
+
+
+def _bench_morph(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Mask cleaning strategies: all five masks, whole pipeline, and deltas vs the config."""
+    print(f"[morph] frames={len(frames)} kernel_size={cfg.morph.kernel_size} reference=config")
+    for name, morph in _morph_variants(cfg).items():
+        c = replace(cfg, morph=morph)
+        cc, ws = compile_config(c), PipelineWorkspace()
+        mask_ms = _time_per_frame_ms(
+            lambda f: dict(build_frame_masks(f, c, ws, None, cc)), frames, repeat
+        )
+        state = PipelineState(workspace=PipelineWorkspace())
+        run_ms = _time_per_frame_ms(lambda f: run_pipeline(f, state, c), frames, repeat)
+        deltas = _output_deltas(frames, cfg, c)
+        print(f"  {name:16s} masks={mask_ms:.3f}ms run_pipeline={run_ms:.3f}ms {deltas}")
+
+
+def _packet(out: PipelineOutput, t: float, cfg: AppConfig) -> PerceptionPacket:
+    # Mirrors the packet assembly in src/main.py.
+    px, py = to_robot_frame_clamped(out.px, out.py)
+    pkt = PerceptionPacket(
+        px=px, py=py, zone=out.zone, gamma=out.gamma, t=t,
+        path_detected=out.path_detected, path_mask_key=out.path_mask_key,
+        target_detected=out.target_detected, target_px=out.target_px, target_py=out.target_py,
+    )
+    if cfg.prediction.enabled:
+        pkt.pred_px, pkt.pred_py = to_robot_frame_clamped(out.pred_px, out.pred_py)
+        pkt.pred_target_px, pkt.pred_target_py = out.pred_target_px, out.pred_target_py
+        pkt.horizon_s = out.horizon_s
+    if cfg.heading.branches:
+        pkt.branches = []
+        for br in out.branches:
+            bx, by = to_robot_frame_clamped(br["px"], br["py"])
+            pkt.branches.append({"px": bx, "py": by, "agreement": br["agreement"]})
+    if cfg.heading.estimator == "weighted":
+        pkt.lookahead = [None if v is None else to_robot_frame_clamped(*v) for v in out.lookahead]
+    return pkt
+
+
+def _fork_frame(w: int, h: int, shift: float = 0.0) -> np.ndarray:
+    # A Y fork, so the branch list is non-empty.
+    frame = np.full((h, w, 3), (60, 170, 60), dtype=np.uint8)
+    t = max(2, h // 16)
+    cx, fy = w // 2, h // 2
+    cv2.line(frame, (cx, h - 1), (cx, fy), (0, 0, 255), t)
+    cv2.line(frame, (cx, fy), (int(cx - w * (0.25 + shift / 4)), 0), (0, 0, 255), t)
+    cv2.line(frame, (cx, fy), (int(cx + w * (0.3 - shift / 4)), 0), (0, 0, 255), t)
+    return frame
+
+
+def _asdict_json(pkt: PerceptionPacket, zone_encoding: str) -> str:
+    # The previous serializer: asdict copy, prune unset optionals, fresh encoder per call.
+    data = asdict(pkt)
+    optional = ("pred_px", "pred_py", "pred_target_px", "pred_target_py", "horizon_s")
+    for key in optional + ("branches", "lookahead"):
+        if data[key] is None:
+            del data[key]
+    if zone_encoding == "int":
+        data["zone"] = ZONE_TO_INT.get(pkt.zone, -1)
+    return json.dumps(data, separators=(",", ":"))
+
+
+def _array_filter(p_prev: np.ndarray, raw: np.ndarray, alpha: float) -> np.ndarray:
+    # The previous heading filter on float32 arrays.
+    def unit_arr(v: Any) -> np.ndarray:
+        arr = np.asarray(list(v), dtype=np.float32)
+        n = float(np.linalg.norm(arr))
+        return np.zeros_like(arr) if n < 1e-9 else arr / n
+
+    return unit_arr(alpha * unit_arr(p_prev) + (1.0 - alpha) * unit_arr(raw))
+
+
+def _bench_packet(frames: list[np.ndarray], cfg: AppConfig, repeat: int) -> None:
+    """Per-packet cost from a run_pipeline result to the JSON line, and the heading filter math."""
+    enc = cfg.comms.zone_encoding
+
+    def outputs(
+        c: AppConfig, clip: list[np.ndarray] = frames
+    ) -> list[tuple[PipelineOutput, float]]:
+        state = PipelineState()
+        stamps = [i / c.fps for i in range(len(clip))]
+        return [(run_pipeline(f, state, c, timestamp=t), t) for f, t in zip(clip, stamps)]
+
+    # Check every optional field against the reference, not only those the config enables.
+    forks = [_fork_frame(frames[0].shape[1], frames[0].shape[0], i / 10.0) for i in range(10)]
+    checks = {
+        "config": cfg,
+        "branches": replace(cfg, heading=replace(cfg.heading, branches=True)),
+        "lookahead": replace(cfg, heading=replace(cfg.heading, estimator="weighted")),
+    }
+    mismatched = {}
+    for name, c in checks.items():
+        outs = outputs(c, frames + forks)
+        mismatched[name] = sum(
+            _packet(o, t, c).to_json(enc) != _asdict_json(_packet(o, t, c), enc) for o, t in outs
+        )
+    outs = outputs(cfg)
+    n = max(1, 2000 // len(outs)) * repeat
+    new_us = 1000.0 * _time_per_frame_ms(
+        lambda ot: _packet(ot[0], ot[1], cfg).to_json(enc), outs, n
+    )
+    old_us = 1000.0 * _time_per_frame_ms(
+        lambda ot: _asdict_json(_packet(ot[0], ot[1], cfg), enc), outs, n
+    )
+    print(
+        f"[packet] outputs={len(outs)} prediction={cfg.prediction.enabled} "
+        f"zone_encoding={enc} mismatched={mismatched}"
+    )
+    print(
+        f"  output->json: asdict+dumps={old_us:.2f}us direct={new_us:.2f}us "
+        f"({old_us / new_us:.2f}x)"
+    )
+
+    prev, raw, a = (0.0, -1.0), (0.3, -0.9), cfg.alpha
+    prev_arr, raw_arr = np.array(prev, dtype=np.float32), np.array(raw, dtype=np.float32)
+    arr_us = 1000.0 * _time_per_frame_ms(
+        lambda _: _array_filter(prev_arr, raw_arr, a), [None], 5000 * repeat
+    )
+
+    def scalar(_: Any) -> tuple[float, float]:
+        px, py = unit2(*prev)
+        rx, ry = unit2(*raw)
+        return unit2(a * px + (1.0 - a) * rx, a * py + (1.0 - a) * ry)
+
+    sc_us = 1000.0 * _time_per_frame_ms(scalar, [None], 5000 * repeat)
+    print(f"  heading filter: arrays={arr_us:.2f}us scalar={sc_us:.2f}us ({arr_us / sc_us:.2f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark perception pipeline stages")
+    parser.add_argument(
+        "bench",
+        choices=[
+            "masks",
+            "bgr-accuracy",
+            "contours",
+            "heading",
+            "batch",
+            "remap",
+            "threads",
+            "fused",
+            "packet",
+            "bands",
+            "morph",
+        ],
+        help="Which benchmark to run",
+    )
+    parser.add_argument("clips", nargs="*", help="Recorded ROI clips (default: synthetic frames)")
+    parser.add_argument("--config", default="configs/default.yaml")
+    parser.add_argument("--frames", type=int, default=300, help="Max frames to load")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timing repetitions over the frame set"
+    )
+    parser.add_argument("--batch", type=int, default=32, help="Frames per run_pipeline_batch call")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="batch: worker threads; threads: max mask_workers"
+    )
+    parser.add_argument(
+        "--calibration", default="", help="remap: calibration YAML (default: config or example)"
+    )
+    args = parser.parse_args()
+
+    cv2.setUseOptimized(True)
+    cfg = load_config(args.config)
+    frames = _load_frames(args.clips, cfg, args.frames)
+
+    if args.bench == "masks":
+        _bench_masks(frames, cfg, args.repeat)
+    elif args.bench == "bgr-accuracy":
+        _bench_bgr_accuracy(frames, cfg, args.repeat)
+    elif args.bench == "contours":
+        _bench_contours(frames, cfg, args.repeat)
+    elif args.bench == "heading":
+        _bench_heading(frames, cfg, args.repeat)
+    elif args.bench == "batch":
+        _bench_batch(frames, cfg, args.repeat, args.batch, args.workers)
+    elif args.bench == "remap":
+        _bench_remap(frames, cfg, args.repeat, args.calibration)
+    elif args.bench == "threads":
+        _bench_threads(frames, cfg, args.repeat, max(1, args.workers))
+    elif args.bench == "fused":
+        _bench_fused(frames, cfg, args.repeat)
+    elif args.bench == "packet":
+        _bench_packet(frames, cfg, args.repeat)
+    elif args.bench == "bands":
+        _bench_bands(frames, cfg, args.repeat)
+    elif args.bench == "morph":
+        _bench_morph(frames, cfg, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,9 @@ Payload schema:
     "target": {"detected": bool, "vector": {"x": float, "y": float}},
     "red_line": {"detected": bool, "vector": {"x": float, "y": float}}
   }
-  or blue_line/black_line when path_mask_key is blue/black.
+  or blue_line/black_line when path_mask_key is blue/black. Packets with
+  prediction fields add
+    "predicted": {"horizon_s": float, "target": {"x", "y"}, "<line_key>": {"x", "y"}}
 """
 
 from __future__ import annotations
@@ -95,6 +97,7 @@ def main() -> None:
             latest_target_detected = bool(data.get("target_detected", False))
             latest_target_px = data.get("target_px", 0.0)
             latest_target_py = data.get("target_py", 0.0)
+            latest_pred = data if "pred_px" in data else None
         except (json.JSONDecodeError, TypeError):
             continue
 
@@ -123,6 +126,15 @@ def main() -> None:
                 "vector": {"x": latest_px, "y": latest_py},
             },
         }
+        if latest_pred is not None:
+            payload["predicted"] = {
+                "horizon_s": latest_pred.get("horizon_s", 0.0),
+                "target": {
+                    "x": latest_pred.get("pred_target_px", 0.0),
+                    "y": latest_pred.get("pred_target_py", 0.0),
+                },
+                line_key: {"x": latest_pred["pred_px"], "y": latest_pred.get("pred_py", 0.0)},
+            }
         body = json.dumps(payload).encode("utf-8")
         sys.stderr.write(f"post_vectors: sending {json.dumps(payload)}\n")
         if args.verbose:
@@ -10,17 +10,44 @@ import cv2
 
 from src.comms.packet import PerceptionPacket
 from src.config import load_config
-from src.pipeline import PipelineState, run_pipeline
+from src.pipeline import (
+    PipelineOutput,
+    PipelineState,
+    batch_fallback_reasons,
+    run_pipeline,
+    run_pipeline_batch,
+)
+from src.utils.logging import log
 from src.utils.math2d import to_robot_frame_clamped
 from src.vision.camera import OpenCVCamera
 from src.vision.debug_draw import draw_overlay, make_mask_preview
 
 
+def _print_packet(out: PipelineOutput, zone_encoding: str) -> None:
+    px_out, py_out = to_robot_frame_clamped(out.px, out.py)
+    pkt = PerceptionPacket(
+        px=px_out,
+        py=py_out,
+        zone=out.zone,
+        gamma=out.gamma,
+        t=time.time(),
+        path_detected=out.path_detected,
+        path_mask_key=out.path_mask_key,
+    )
+    print(pkt.to_json(zone_encoding=zone_encoding))
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Replay recorded ROI video")
     parser.add_argument("video_path", help="Path to ROI video file")
     parser.add_argument("--config", default="configs/default.yaml")
     parser.add_argument("--no-gui", action="store_true")
+    parser.add_argument(
+        "--batch", type=int, default=1, help="Frames per run_pipeline_batch call (--no-gui only)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker threads per batch (--no-gui only)"
+    )
     args = parser.parse_args()
 
     cfg = load_config(args.config)
@@ -36,24 +63,35 @@ def main() -> None:
     if Path(args.video_path).name in {"test_run.mp4", "test_video.mp4"}:
         state.path_mask_key = "black"
     gui = not args.no_gui
+    if cfg.debug_level == "auto":
+        cfg.debug_level = "full" if gui and cfg.show_masks else "none"
+    if not gui and args.batch > 1:
+        fallback = batch_fallback_reasons(cfg)
+        if fallback:
+            log("batch_fallback", reasons=",".join(fallback), mode="per-frame loop")
+        done = False
+        while not done:
+            frames = []
+            while len(frames) < args.batch:
+                roi = cam.read()
+                if roi is None:
+                    done = True
+                    break
+                frames.append(roi)
+            if frames:
+                for out in run_pipeline_batch(frames, state, cfg, workers=args.workers):
+                    _print_packet(out, cfg.comms.zone_encoding)
+        cam.release()
+        return
+
     while True:
         roi = cam.read()
         if roi is None:
             break
 
         out = run_pipeline(roi, state, cfg)
-        px_out, py_out = to_robot_frame_clamped(out.px, out.py)
-        pkt = PerceptionPacket(
-            px=px_out,
-            py=py_out,
-            zone=out.zone,
-            gamma=out.gamma,
-            t=time.time(),
-            path_detected=out.path_detected,
-            path_mask_key=out.path_mask_key,
-        )
         zone, gamma, debug = out.zone, out.gamma, out.debug_artifacts
-        print(pkt.to_json(zone_encoding=cfg.comms.zone_encoding))
+        _print_packet(out, cfg.comms.zone_encoding)
 
         if gui:
             cv2.imshow("replay_roi", draw_overlay(roi, state.p_prev, zone, gamma))
@@ -14,12 +14,23 @@ def clamp01(value: float) -> float:
 
 
 def unit(vec: Iterable[float]) -> np.ndarray:
-    """Return vec normalized to unit length, or zero vector if tiny."""
-    arr = np.asarray(list(vec), dtype=np.float32)
-    norm = float(np.linalg.norm(arr))
+    """Return vec normalized to unit length (float32), or zero vector if tiny."""
+    if not isinstance(vec, (list, tuple, np.ndarray)):
+        vec = list(vec)
+    arr = np.array(vec, dtype=np.float32)
+    norm = math.hypot(*arr.tolist())
     if norm < 1e-9:
-        return np.zeros_like(arr, dtype=np.float32)
-    return arr / norm
+        return np.zeros_like(arr)
+    arr /= norm
+    return arr
+
+
+def unit2(x: float, y: float) -> tuple[float, float]:
+    """Scalar unit() for a 2D vector: no arrays, (0.0, 0.0) if tiny."""
+    norm = math.hypot(x, y)
+    if norm < 1e-9:
+        return 0.0, 0.0
+    return x / norm, y / norm
 
 
 def to_robot_frame_clamped(px_image: float, py_image: float) -> tuple[float, float]:
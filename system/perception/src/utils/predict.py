@@ -0,0 +1,85 @@
+"""Constant-velocity prediction for latency compensation."""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+
+def _wrap_pi(a: float) -> float:
+    return (a + math.pi) % (2.0 * math.pi) - math.pi
+
+
+class AlphaBetaFilter:
+    """
+    Alpha-beta (steady-state constant-velocity Kalman) filter on one scalar.
+
+    With wrap=True the value is an angle in radians and residuals are wrapped
+    to [-pi, pi). The filter re-initializes after max_gap_s without updates.
+    """
+
+    def __init__(
+        self, alpha: float, beta: float, max_gap_s: float = 0.5, wrap: bool = False
+    ) -> None:
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        self.max_gap_s = float(max_gap_s)
+        self.wrap = bool(wrap)
+        self.x: float | None = None
+        self.v = 0.0
+        self.t: float | None = None
+
+    def update(self, z: float, t: float) -> None:
+        if self.x is None or self.t is None or not 0.0 < t - self.t <= self.max_gap_s:
+            if self.t is not None and t == self.t and self.x is not None:
+                return  # duplicate timestamp: keep the first measurement
+            self.x, self.v, self.t = float(z), 0.0, float(t)
+            return
+        dt = t - self.t
+        x_pred = self.x + self.v * dt
+        r = float(z) - x_pred
+        if self.wrap:
+            r = _wrap_pi(r)
+        self.x = x_pred + self.alpha * r
+        if self.wrap:
+            self.x = _wrap_pi(self.x)
+        self.v += self.beta * r / dt
+        self.t = float(t)
+
+    def predict(self, t: float) -> float | None:
+        """Extrapolated value at time t, or None if uninitialized or stale."""
+        if self.x is None or self.t is None or t - self.t > self.max_gap_s + 1e-9:
+            return None
+        x = self.x + self.v * max(0.0, t - self.t)
+        return _wrap_pi(x) if self.wrap else x
+
+
+class MotionPredictor:
+    """Tracks heading angle and target centroid; extrapolates both to a future time."""
+
+    def __init__(self, alpha: float, beta: float, max_gap_s: float) -> None:
+        self.heading = AlphaBetaFilter(alpha, beta, max_gap_s, wrap=True)
+        self.target_x = AlphaBetaFilter(alpha, beta, max_gap_s)
+        self.target_y = AlphaBetaFilter(alpha, beta, max_gap_s)
+
+    def update(
+        self, t: float, heading: np.ndarray | None, target_xy: tuple[float, float] | None
+    ) -> None:
+        if heading is not None:
+            self.heading.update(math.atan2(float(heading[1]), float(heading[0])), t)
+        if target_xy is not None:
+            self.target_x.update(target_xy[0], t)
+            self.target_y.update(target_xy[1], t)
+
+    def predict_heading(self, t: float) -> np.ndarray | None:
+        a = self.heading.predict(t)
+        if a is None:
+            return None
+        return np.array([math.cos(a), math.sin(a)], dtype=np.float32)
+
+    def predict_target(self, t: float) -> tuple[float, float] | None:
+        x, y = self.target_x.predict(t), self.target_y.predict(t)
+        if x is None or y is None:
+            return None
+        return x, y
@@ -0,0 +1,82 @@
+"""Thread placement (CPU affinity, niceness) and per-thread CPU accounting."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Sequence
+
+import cv2
+
+from src.config import ThreadsConfig
+from src.utils.logging import log
+
+
+def apply_cv_threads(cfg: ThreadsConfig) -> None:
+    """Cap OpenCV's internal pool at cfg.cv_threads (0 keeps OpenCV's default)."""
+    if cfg.cv_threads > 0:
+        cv2.setNumThreads(int(cfg.cv_threads))
+
+
+def pin_current_thread(cpus: Sequence[int], role: str) -> bool:
+    """
+    Restrict the calling thread to `cpus`; empty means leave it unpinned.
+
+    On Linux sched_setaffinity(0, ...) applies to the calling thread only.
+    Threads it creates afterwards (the mask workers) inherit the mask, but
+    threads that already exist keep theirs. cv2's pool is shared by the whole
+    process and takes the mask of whichever thread first runs a parallel cv2
+    call; that need not be the worker, and pinning afterwards does not move it.
+    """
+    if not cpus:
+        return False
+    if not hasattr(os, "sched_setaffinity"):
+        log("thread_affinity_unsupported", role=role)
+        return False
+    try:
+        os.sched_setaffinity(0, {int(c) for c in cpus})
+    except OSError as exc:
+        log("thread_affinity_failed", role=role, cpus=list(cpus), error=exc)
+        return False
+    return True
+
+
+def set_current_thread_nice(nice: int, role: str) -> bool:
+    """Set the calling thread's nice value (negative needs CAP_SYS_NICE); 0 leaves it alone."""
+    if nice == 0:
+        return False
+    try:
+        # On Linux the PRIO_PROCESS "pid" may be a thread id, affecting only that thread.
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), int(nice))
+    except (OSError, AttributeError) as exc:
+        log("thread_nice_failed", role=role, nice=nice, error=exc)
+        return False
+    return True
+
+
+class ThreadCpuMeter:
+    """
+    Per-thread CPU time, sampled by each thread itself and read by another.
+
+    Threads call mark(role) once per loop iteration (time.thread_time() is only
+    readable for the calling thread); window() returns each role's share of one
+    core since the previous window() call, in percent.
+    """
+
+    def __init__(self, roles: Sequence[str]) -> None:
+        # Keys are fixed up front so concurrent mark() calls never resize the dict.
+        self._cpu = dict.fromkeys(roles, 0.0)
+        self._last = dict.fromkeys(roles, 0.0)
+        self._last_t = time.perf_counter()
+
+    def mark(self, role: str) -> None:
+        self._cpu[role] = time.thread_time()
+
+    def window(self) -> dict[str, float]:
+        now = time.perf_counter()
+        dt = max(now - self._last_t, 1e-9)
+        cpu = dict(self._cpu)
+        pct = {role: round(100.0 * max(0.0, cpu[role] - self._last[role]) / dt, 1) for role in cpu}
+        self._last, self._last_t = cpu, now
+        return pct
@@ -22,3 +22,57 @@ class LoopRegulator:
             return
         # We are late; jump to now so stale deadlines do not accumulate.
         self.next_tick = now
+
+
+class ScaleController:
+    """
+    Picks a processing scale so per-frame work stays inside a time budget.
+
+    Work is assumed to grow with pixel count (scale^2). The controller steps
+    down when the smoothed frame time exceeds the budget, steps back up when
+    there is clear headroom, and holds for a few frames after each change.
+    """
+
+    def __init__(
+        self,
+        budget_s: float,
+        scale: float = 1.0,
+        min_scale: float = 0.25,
+        max_scale: float = 1.0,
+        step: float = 0.1,
+        headroom: float = 0.6,
+        smoothing: float = 0.8,
+        hold_frames: int = 15,
+    ) -> None:
+        self.budget_s = float(budget_s)
+        self.min_scale = float(min_scale)
+        self.max_scale = float(max_scale)
+        self.step = float(step)
+        self.headroom = float(headroom)
+        self.smoothing = float(smoothing)
+        self.hold_frames = int(hold_frames)
+        self.scale = max(self.min_scale, min(self.max_scale, float(scale)))
+        self.avg_s: float | None = None
+        self._hold = 0
+
+    def update(self, elapsed_s: float) -> float:
+        """Feed one frame's processing time; return the scale for the next frame."""
+        if self.avg_s is None:
+            self.avg_s = float(elapsed_s)
+        else:
+            self.avg_s = self.smoothing * self.avg_s + (1.0 - self.smoothing) * float(elapsed_s)
+        if self._hold > 0:
+            self._hold -= 1
+            return self.scale
+
+        new_scale = self.scale
+        if self.avg_s > self.budget_s:
+            new_scale = max(self.min_scale, self.scale - self.step)
+        elif self.avg_s < self.headroom * self.budget_s:
+            new_scale = min(self.max_scale, self.scale + self.step)
+        if new_scale != self.scale:
+            # Predict the new cost so the next decision does not wait for the EMA to settle.
+            self.avg_s *= (new_scale / self.scale) ** 2
+            self.scale = new_scale
+            self._hold = self.hold_frames
+        return self.scale
@@ -0,0 +1,52 @@
+"""Cheap frame-change detection for reusing pipeline results on static scenes."""
+
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+
+class FrameChangeDetector:
+    """
+    Compares a small grayscale thumbnail against the one from the last full run.
+
+    A frame is "unchanged" when the mean absolute thumbnail difference is at or
+    below `threshold` (0-255 gray levels). Comparing against the last full run,
+    not the previous frame, keeps slow drift from accumulating unnoticed; the
+    reuse age and frame count caps force periodic full runs anyway.
+    """
+
+    def __init__(
+        self, thumb_width: int, threshold: float, max_age_s: float, max_frames: int
+    ) -> None:
+        self.thumb_width = max(4, int(thumb_width))
+        self.threshold = float(threshold)
+        self.max_age_s = float(max_age_s)
+        self.max_frames = int(max_frames)
+        self._ref: np.ndarray | None = None
+        self._ref_t = 0.0
+        self._reused = 0
+        self.last_diff = 0.0
+
+    def _thumbnail(self, frame_bgr: np.ndarray) -> np.ndarray:
+        h, w = frame_bgr.shape[:2]
+        tw = min(self.thumb_width, w)
+        th = max(1, int(round(h * tw / w)))
+        small = cv2.resize(frame_bgr, (tw, th), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def unchanged(self, frame_bgr: np.ndarray, t: float) -> bool:
+        """
+        True if the previous result can be reused for this frame; otherwise
+        the frame becomes the new reference.
+        """
+        thumb = self._thumbnail(frame_bgr)
+        ref = self._ref
+        if ref is not None and ref.shape == thumb.shape:
+            self.last_diff = float(cv2.norm(thumb, ref, cv2.NORM_L1)) / thumb.size
+            fresh = t - self._ref_t <= self.max_age_s and self._reused < self.max_frames
+            if fresh and self.last_diff <= self.threshold:
+                self._reused += 1
+                return True
+        self._ref, self._ref_t, self._reused = thumb, t, 0
+        return False
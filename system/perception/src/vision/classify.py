@@ -0,0 +1,147 @@
+"""Single-pass HSV color classification via precomputed lookup tables."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from src.config import AppConfig
+from src.vision.workspace import PipelineWorkspace, buf
+
+# One bit per configured HSV range; a pixel may belong to several ranges.
+CLASS_BITS: dict[str, int] = {
+    "red1": 1 << 0,
+    "red2": 1 << 1,
+    "green": 1 << 2,
+    "blue": 1 << 3,
+    "black": 1 << 4,
+    "danger": 1 << 5,
+}
+
+# Output masks as unions of range bits.
+MASK_BITS: dict[str, int] = {
+    "red": CLASS_BITS["red1"] | CLASS_BITS["red2"],
+    "green": CLASS_BITS["green"],
+    "blue": CLASS_BITS["blue"],
+    "black": CLASS_BITS["black"],
+    "danger": CLASS_BITS["danger"],
+}
+
+
+def _ranges_key(cfg: AppConfig) -> tuple[tuple[tuple[int, int, int], tuple[int, int, int]], ...]:
+    return tuple((getattr(cfg, name).lo, getattr(cfg, name).hi) for name in CLASS_BITS)
+
+
+@lru_cache(maxsize=8)
+def _compile_hsv_luts(
+    key: tuple[tuple[tuple[int, int, int], tuple[int, int, int]], ...],
+) -> np.ndarray:
+    # HSV ranges are axis-aligned boxes, so the full 3D table factors exactly:
+    #   lut3d[h, s, v] == luts[0][h] & luts[1][s] & luts[2][v]
+    # Three 256-entry tables stay in L1 instead of an 11 MB volume.
+    luts = np.zeros((3, 256), dtype=np.uint8)
+    for (lo, hi), bit in zip(key, CLASS_BITS.values()):
+        for ch in range(3):
+            luts[ch, lo[ch] : hi[ch] + 1] |= bit
+    luts.setflags(write=False)
+    return luts
+
+
+def hsv_luts(cfg: AppConfig) -> np.ndarray:
+    """Return (3, 256) per-channel bit tables for the configured HSV ranges (cached)."""
+    return _compile_hsv_luts(_ranges_key(cfg))
+
+
+@lru_cache(maxsize=4)
+def _compile_bgr_table(
+    key: tuple[tuple[tuple[int, int, int], tuple[int, int, int]], ...],
+    bits: int,
+) -> np.ndarray:
+    # Classify the centre of every quantized BGR cell through the exact HSV path.
+    n = 1 << bits
+    shift = 8 - bits
+    q = np.arange(n, dtype=np.uint8)
+    r, g, b = np.meshgrid(q, q, q, indexing="ij")  # flat index = r<<2n | g<<n | b
+    cells = np.stack((b, g, r), axis=-1).reshape(-1, 1, 3)
+    centres = (cells << shift) | np.uint8((1 << shift) >> 1)
+    hsv = cv2.cvtColor(centres, cv2.COLOR_BGR2HSV)
+    cube = classify_hsv(hsv, _compile_hsv_luts(key)).reshape(n, n, n)  # [r, g, b]
+    # Lay the cube out as an image addressed by remap coordinates x = g<<8 | b,
+    # y = r (see classify_bgr); columns with b >= n are never read. The image is
+    # n * ((n-1)*256 + n) bytes (1012 KiB at 6 bits), but each (r, g) row of b
+    # is one contiguous run; on a 64-byte aligned base every run sits inside one
+    # cache line, so the lines actually read total 256 KiB at 6 bits.
+    width = ((n - 1) << 8) + n
+    padded = np.zeros((n, n, 256), dtype=np.uint8)
+    padded[:, :, :n] = cube
+    table = _aligned_empty((n, width))
+    table[:] = padded.reshape(n, n * 256)[:, :width]
+    table.setflags(write=False)
+    return table
+
+
+def _aligned_empty(shape: tuple[int, int], align: int = 64) -> np.ndarray:
+    size = shape[0] * shape[1]
+    raw = np.empty(size + align, dtype=np.uint8)
+    start = -raw.ctypes.data % align
+    return raw[start : start + size].reshape(shape)
+
+
+def bgr_table(cfg: AppConfig, bits: int) -> np.ndarray:
+    """
+    Return the BGR->label table image for the configured HSV ranges (cached):
+    label of quantized (b, g, r) at row r, column g << 8 | b. The image is
+    ~1 MiB at 6 bits, of which classify_bgr reads 256 KiB of cache lines.
+    """
+    # remap takes int16 coordinates and sources narrower than SHRT_MAX columns.
+    if not 1 <= int(bits) <= 7:
+        raise ValueError("classifier.bgr_bits must be in 1..7")
+    return _compile_bgr_table(_ranges_key(cfg), int(bits))
+
+
+def classify_hsv(
+    hsv: np.ndarray, luts: np.ndarray, ws: PipelineWorkspace | None = None
+) -> np.ndarray:
+    """Map an HSV image to a uint8 label image of CLASS_BITS flags."""
+    shape = hsv.shape[:2]
+    labels = buf(ws, "labels", shape)
+    chan = buf(ws, "classify_chan", shape)
+    hit = buf(ws, "classify_hit", shape)
+    labels = cv2.LUT(cv2.extractChannel(hsv, 0, dst=chan), luts[0], dst=labels)
+    for ch in (1, 2):
+        chan = cv2.extractChannel(hsv, ch, dst=chan)
+        hit = cv2.LUT(chan, luts[ch], dst=hit)
+        cv2.bitwise_and(labels, hit, dst=labels)
+    return labels
+
+
+def label_mask(labels: np.ndarray, bits: int, dst: np.ndarray | None = None) -> np.ndarray:
+    """Return a 0/255 mask of pixels whose label has any of the given bits set."""
+    dst = cv2.bitwise_and(labels, int(bits), dst=dst)
+    return cv2.compare(dst, 0, cv2.CMP_GT, dst=dst)
+
+
+def classify_bgr(
+    bgr: np.ndarray, table: np.ndarray, bits: int, ws: PipelineWorkspace | None = None
+) -> np.ndarray:
+    """
+    Map a BGR image straight to a label image through a quantized BGR table.
+
+    Three whole-frame passes, all vectorized: BGR->BGRA, quantize every byte
+    at once on the uint32 view, and one nearest-neighbour remap that gathers
+    from the table image (the BGRA bytes double as its int16 coordinates).
+    """
+    n = int(bits)
+    shape = bgr.shape[:2]
+    bgra = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA, dst=buf(ws, "bgr_bgra", shape + (4,)))
+    # Each pixel as one little-endian uint32 b | g<<8 | r<<16 | a<<24: shift all
+    # channels down together, then mask off bits that crossed a byte boundary
+    # and the alpha byte.
+    packed = bgra.view(np.uint32)[..., 0]
+    np.right_shift(packed, 8 - n, out=packed)
+    np.bitwise_and(packed, np.uint32(((1 << n) - 1) * 0x010101), out=packed)
+    # Read as int16 pairs the pixel is (x, y) = (g<<8 | b, r): a CV_16SC2 map.
+    coords = bgra.view(np.int16).reshape(shape + (2,))
+    return cv2.remap(table, coords, None, cv2.INTER_NEAREST, dst=buf(ws, "labels", shape))
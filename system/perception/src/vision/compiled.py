@@ -0,0 +1,183 @@
+"""Per-config constants derived once from an AppConfig instead of every frame."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+
+import cv2
+import numpy as np
+
+from src.config import AppConfig, ZoneConfig
+from src.vision.classify import CLASS_BITS, MASK_BITS, bgr_table, hsv_luts
+
+DEBUG_LEVELS = ("none", "summary", "full")
+CLASSIFIER_MODES = ("lut", "bgr_lut", "inrange")
+MORPH_METHODS = ("morph", "median", "none")
+MORPH_SHAPES = {"ellipse": cv2.MORPH_ELLIPSE, "rect": cv2.MORPH_RECT, "cross": cv2.MORPH_CROSS}
+
+
+def morph_kernel(shape: str, k: int) -> np.ndarray:
+    kernel = cv2.getStructuringElement(MORPH_SHAPES[shape], (k, k))
+    kernel.setflags(write=False)
+    return kernel
+
+
+@dataclass(frozen=True)
+class MaskMorph:
+    """Resolved cleaning for one mask (see MorphConfig)."""
+
+    method: str
+    kernel: np.ndarray
+    open_iters: int
+    close_iters: int
+    median_ksize: int
+
+    @property
+    def reach(self) -> int:
+        """Distance in pixels beyond the raw mask's support that cleaning can read or write."""
+        if self.method == "median":
+            return self.median_ksize // 2
+        if self.method == "none":
+            return 0
+        # Opening never grows the support; each closing dilation grows it by the kernel radius.
+        return (max(self.kernel.shape) // 2) * (self.open_iters + self.close_iters + 1)
+
+
+def _mask_morph(cfg: AppConfig, name: str, scale: float = 1.0) -> MaskMorph:
+    base = cfg.morph
+    try:
+        m = replace(base, masks={}, **base.masks.get(name, {}))
+    except TypeError as exc:
+        raise ValueError(f"Unsupported morph.masks.{name} setting: {exc}") from None
+    if m.method not in MORPH_METHODS:
+        raise ValueError(f"Unsupported morph method for {name}: {m.method}")
+    if m.shape not in MORPH_SHAPES:
+        raise ValueError(f"Unsupported morph shape for {name}: {m.shape}")
+    method, ksize = m.method, int(m.median_ksize)
+    if method == "median":
+        if ksize < 3 or ksize % 2 == 0:
+            raise ValueError(f"morph median_ksize for {name} must be odd and >= 3: {ksize}")
+        ksize = int(ksize * scale) | 1
+        if ksize < 3:
+            method = "none"  # a 1x1 median is the identity
+    # Odd kernel of kernel_size * scale pixels: the same scene-space cleaning at any scale.
+    k = max(1, int(m.kernel_size)) if scale == 1.0 else max(1, int(int(m.kernel_size) * scale)) | 1
+    return MaskMorph(
+        method=method,
+        kernel=morph_kernel(m.shape, k),
+        open_iters=max(0, int(m.open_iters)),
+        close_iters=max(0, int(m.close_iters)),
+        median_ksize=ksize,
+    )
+
+
+def band_morph(cfg: AppConfig, scale: float = 1.0) -> tuple[dict[str, MaskMorph], ...]:
+    """Per-mask cleaning for each row band of a frame processed at `scale`."""
+    return tuple(
+        {name: _mask_morph(cfg, name, sc * scale) for name in MASK_BITS}
+        for sc in cfg.row_bands.scales
+    )
+
+
+@dataclass(frozen=True)
+class ScaledThresholds:
+    """Pixel thresholds at one processing scale (areas scale with sx * sy)."""
+
+    area_scale: float
+    zones: ZoneConfig
+    heading_min_area: float
+    scanline_min_run: int
+    morph: dict[str, MaskMorph]  # kernels and median apertures scaled to the frame
+    # row_bands: per band (top to bottom), cleaning at band scale * frame scale.
+    band_morph: tuple[dict[str, MaskMorph], ...] = ()
+
+
+@dataclass(frozen=True)
+class CompiledConfig:
+    """
+    Bounds, kernels, lookup tables and thresholds the pipeline reads per frame.
+
+    Never changed after compile_config() (the scaled-threshold memo only
+    caches), so replacing state.compiled with a new instance is an atomic
+    config change: a frame sees either the old values or the new, never a mix.
+    """
+
+    cfg: AppConfig
+    debug_level: str  # "auto" resolved
+    bounds: dict[str, tuple[np.ndarray, np.ndarray]]  # CLASS_BITS name -> HSV (lo, hi) uint8
+    morph: dict[str, MaskMorph]  # MASK_BITS name -> cleaning
+    luts: np.ndarray  # (3, 256) per-channel HSV label tables
+    bgr_table: np.ndarray | None  # bgr_lut mode only
+    _scaled: dict[tuple[float, float, float], ScaledThresholds] = field(
+        default_factory=dict, compare=False, repr=False
+    )
+
+    def thresholds(self, sx: float, sy: float, scale: float) -> ScaledThresholds:
+        """Thresholds for a frame resized by (sx, sy) at nominal `scale` (memoized)."""
+        key = (sx, sy, scale)
+        th = self._scaled.get(key)
+        if th is None:
+            c = self.cfg
+            area_scale = sx * sy
+            zones = c.zones
+            if area_scale != 1.0:
+                zones = replace(
+                    zones,
+                    target_min_area=zones.target_min_area * area_scale,
+                    danger_area_thresh=zones.danger_area_thresh * area_scale,
+                    path_area_thresh=zones.path_area_thresh * area_scale,
+                )
+            th = ScaledThresholds(
+                area_scale=area_scale,
+                zones=zones,
+                heading_min_area=c.heading.min_area * area_scale,
+                scanline_min_run=max(1, int(round(c.heading.scanline_min_run * scale))),
+                morph=(
+                    self.morph
+                    if scale == 1.0
+                    else {name: _mask_morph(c, name, scale) for name in MASK_BITS}
+                ),
+                band_morph=band_morph(c, scale) if c.row_bands.enabled else (),
+            )
+            if len(self._scaled) >= 64:  # auto scale visits few sizes; stay bounded anyway
+                self._scaled.clear()
+            self._scaled[key] = th
+        return th
+
+
+def compile_config(cfg: AppConfig) -> CompiledConfig:
+    """Validate cfg and precompute everything the per-frame path derives from it."""
+    level = "full" if cfg.debug_level == "auto" else cfg.debug_level
+    if level not in DEBUG_LEVELS:
+        raise ValueError(f"Unsupported debug level: {cfg.debug_level}")
+    mode = cfg.classifier.mode
+    if mode not in CLASSIFIER_MODES:
+        raise ValueError(f"Unsupported classifier mode: {mode}")
+
+    unknown = set(cfg.morph.masks) - set(MASK_BITS)
+    if unknown:
+        raise ValueError(f"Unsupported morph.masks entries: {sorted(unknown)}")
+    rb = cfg.row_bands
+    if rb.enabled:
+        if len(rb.scales) != len(rb.edges) + 1:
+            raise ValueError("row_bands.scales needs one entry per band (len(edges) + 1)")
+        if any(not 0.0 < e < 1.0 for e in rb.edges) or list(rb.edges) != sorted(rb.edges):
+            raise ValueError("row_bands.edges must be increasing fractions in (0, 1)")
+        if any(not 0.0 < sc <= 1.0 for sc in rb.scales):
+            raise ValueError("row_bands.scales must be in (0, 1]")
+
+    bounds = {}
+    for name in CLASS_BITS:
+        r = getattr(cfg, name)
+        lo, hi = np.array(r.lo, dtype=np.uint8), np.array(r.hi, dtype=np.uint8)
+        lo.setflags(write=False)
+        hi.setflags(write=False)
+        bounds[name] = (lo, hi)
+    return CompiledConfig(
+        cfg=cfg,
+        debug_level=level,
+        bounds=bounds,
+        morph={name: _mask_morph(cfg, name) for name in MASK_BITS},
+        luts=hsv_luts(cfg),
+        bgr_table=bgr_table(cfg, cfg.classifier.bgr_bits) if mode == "bgr_lut" else None,
+    )
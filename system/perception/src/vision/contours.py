@@ -0,0 +1,125 @@
+"""Per-frame contour and component cache shared by heading extraction and zone classification."""
+
+from __future__ import annotations
+
+from typing import Mapping, Sequence
+
+import cv2
+import numpy as np
+
+from src.vision.workspace import PipelineWorkspace, buf
+
+
+class ContourSet:
+    """External contours of one mask with areas up front and lazy perimeters/moments."""
+
+    def __init__(
+        self, contours: Sequence[np.ndarray], areas: Sequence[float] | None = None
+    ) -> None:
+        self.contours = contours
+        if areas is None:
+            areas = [float(cv2.contourArea(c)) for c in contours]
+        self.areas = list(areas)
+        self._perimeters: dict[int, float] = {}
+        self._moments: dict[int, dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.contours)
+
+    def perimeter(self, i: int) -> float:
+        peri = self._perimeters.get(i)
+        if peri is None:
+            peri = float(cv2.arcLength(self.contours[i], True))
+            self._perimeters[i] = peri
+        return peri
+
+    def moments(self, i: int) -> dict[str, float]:
+        m = self._moments.get(i)
+        if m is None:
+            m = cv2.moments(self.contours[i])
+            self._moments[i] = m
+        return m
+
+    def select(self, min_area: float) -> list[int]:
+        """Indices of contours with area >= min_area."""
+        return [i for i, a in enumerate(self.areas) if a >= min_area]
+
+    def shifted(self, dx: int, dy: int) -> ContourSet:
+        """The same contours translated by (dx, dy); areas carry over."""
+        offset = np.array([dx, dy], dtype=np.int32)
+        return ContourSet([c + offset for c in self.contours], self.areas)
+
+
+class ComponentSet:
+    """8-connected components of one mask with vectorized stats and lazy outlines."""
+
+    def __init__(self, mask: np.ndarray, labels: np.ndarray | None = None) -> None:
+        n, labels, stats, centroids = cv2.connectedComponentsWithStats(
+            mask, labels=labels, connectivity=8, ltype=cv2.CV_32S
+        )
+        # Row 0 is the background; component i lives at label i + 1.
+        self.labels = labels
+        self.boxes = stats[1:, : cv2.CC_STAT_AREA]
+        self.areas = stats[1:, cv2.CC_STAT_AREA].astype(np.float64)
+        self.centroids = centroids[1:]
+        self._outlines: dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def select(self, min_area: float) -> np.ndarray:
+        """Indices of components with pixel area >= min_area, largest first."""
+        keep = np.flatnonzero(self.areas >= min_area)
+        return keep[np.argsort(-self.areas[keep], kind="stable")]
+
+    def outline(self, i: int) -> np.ndarray:
+        """External contour of component i in mask coordinates."""
+        c = self._outlines.get(i)
+        if c is None:
+            x, y, w, h = (int(v) for v in self.boxes[i])
+            crop = cv2.compare(self.labels[y : y + h, x : x + w], i + 1, cv2.CMP_EQ)
+            found, _ = cv2.findContours(
+                crop, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x, y)
+            )
+            c = max(found, key=len)
+            self._outlines[i] = c
+        return c
+
+
+class ContourCache:
+    """Traces or labels each mask at most once per frame, keyed by mask name."""
+
+    def __init__(
+        self, masks: Mapping[str, np.ndarray], ws: PipelineWorkspace | None = None
+    ) -> None:
+        self._masks = masks
+        self._ws = ws
+        self._sets: dict[str, ContourSet] = {}
+        self._components: dict[str, ComponentSet] = {}
+        self.traces = 0
+        self.labelings = 0
+
+    def get(self, name: str) -> ContourSet:
+        cs = self._sets.get(name)
+        if cs is None:
+            mask = self._masks[name]
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            self.traces += 1
+            cs = ContourSet(contours)
+            self._sets[name] = cs
+        return cs
+
+    def put(self, name: str, contours: ContourSet) -> None:
+        """Use contours traced elsewhere for mask `name`; they must equal its full trace."""
+        self._sets[name] = contours
+
+    def components(self, name: str) -> ComponentSet:
+        comps = self._components.get(name)
+        if comps is None:
+            mask = self._masks[name]
+            labels = buf(self._ws, f"components:{name}", mask.shape[:2], np.int32)
+            comps = ComponentSet(mask, labels=labels)
+            self.labelings += 1
+            self._components[name] = comps
+        return comps
+
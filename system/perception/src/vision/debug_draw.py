@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from typing import Mapping
+
 import cv2
 import numpy as np
 
@@ -36,7 +38,7 @@ def draw_overlay(
     return out
 
 
-def make_mask_preview(masks: dict[str, np.ndarray]) -> np.ndarray:
+def make_mask_preview(masks: Mapping[str, np.ndarray]) -> np.ndarray:
     """Create a tiled BGR preview of masks for debug view."""
     red = cv2.cvtColor(masks["red"], cv2.COLOR_GRAY2BGR)
     green = cv2.cvtColor(masks["green"], cv2.COLOR_GRAY2BGR)
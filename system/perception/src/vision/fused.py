@@ -0,0 +1,116 @@
+"""Optional compiled single-pass HSV classification with per-class statistics."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from src.vision.classify import CLASS_BITS
+from src.vision.workspace import PipelineWorkspace, buf
+
+try:
+    import numba
+except ImportError:  # optional: classifier.fused then falls back to cvtColor + LUT
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+# OpenCV's 8-bit BGR->HSV is fixed point with 12 fractional bits and two
+# reciprocal tables (saturate_cast rounds half to even, as np.rint does).
+_HSV_SHIFT = 12
+
+
+@lru_cache(maxsize=1)
+def _hsv_div_tables() -> tuple[np.ndarray, np.ndarray]:
+    i = np.arange(256, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        sdiv = np.where(i > 0, np.rint((255 << _HSV_SHIFT) / i), 0).astype(np.int64)
+        hdiv = np.where(i > 0, np.rint((180 << _HSV_SHIFT) / (6.0 * i)), 0).astype(np.int64)
+    sdiv.setflags(write=False)
+    hdiv.setflags(write=False)
+    return sdiv, hdiv
+
+
+def _fused_kernel(bgr, luts, sdiv, hdiv, labels, counts, boxes):
+    # One pass: OpenCV-exact HSV, per-channel LUT classification, and per class
+    # bit the pixel count and bounding box (x0, y0, x1, y1; x1/y1 exclusive).
+    h, w = labels.shape
+    nclass = counts.shape[0]
+    half = 1 << (_HSV_SHIFT - 1)
+    for y in range(h):
+        for x in range(w):
+            b = np.int64(bgr[y, x, 0])
+            g = np.int64(bgr[y, x, 1])
+            r = np.int64(bgr[y, x, 2])
+            v = max(b, g, r)
+            diff = v - min(b, g, r)
+            s = (diff * sdiv[v] + half) >> _HSV_SHIFT
+            if v == r:
+                hue = g - b
+            elif v == g:
+                hue = b - r + 2 * diff
+            else:
+                hue = r - g + 4 * diff
+            hue = (hue * hdiv[diff] + half) >> _HSV_SHIFT
+            if hue < 0:
+                hue += 180
+            lab = luts[0, hue] & luts[1, s] & luts[2, v]
+            labels[y, x] = lab
+            if lab == 0:
+                continue
+            for k in range(nclass):
+                if (lab >> k) & 1:
+                    counts[k] += 1
+                    if x < boxes[k, 0]:
+                        boxes[k, 0] = x
+                    if y < boxes[k, 1]:
+                        boxes[k, 1] = y
+                    if x >= boxes[k, 2]:
+                        boxes[k, 2] = x + 1
+                    if y >= boxes[k, 3]:
+                        boxes[k, 3] = y + 1
+
+
+if NUMBA_AVAILABLE:
+    _compiled_kernel = numba.njit(cache=True, nogil=True)(_fused_kernel)
+else:
+    _compiled_kernel = _fused_kernel  # pure Python: correct but far too slow for frames
+
+
+@dataclass
+class LabelStats:
+    """Per-class-bit pixel counts and bounding boxes of a label image."""
+
+    shape: tuple[int, int]  # (h, w) of the label image
+    counts: np.ndarray  # (len(CLASS_BITS),) int64
+    boxes: np.ndarray  # (len(CLASS_BITS), 4) int64 x0, y0, x1, y1; x1/y1 exclusive
+
+    def box(self, bits: int) -> tuple[int, int, int, int] | None:
+        """Union box of the classes in `bits`, or None if none of them has a pixel."""
+        ks = [k for k in range(len(self.counts)) if bits >> k & 1 and self.counts[k] > 0]
+        if not ks:
+            return None
+        b = self.boxes[ks]
+        return int(b[:, 0].min()), int(b[:, 1].min()), int(b[:, 2].max()), int(b[:, 3].max())
+
+
+def fused_classify(
+    bgr: np.ndarray, luts: np.ndarray, ws: PipelineWorkspace | None = None
+) -> tuple[np.ndarray, LabelStats]:
+    """
+    Classify a BGR image in one pass: the same labels as classify_hsv(to_hsv(bgr))
+    plus per-class counts and boxes. Compiled with numba when installed.
+    """
+    h, w = bgr.shape[:2]
+    labels = buf(ws, "labels", (h, w))
+    if labels is None:
+        labels = np.empty((h, w), dtype=np.uint8)
+    n = len(CLASS_BITS)
+    counts = np.zeros(n, dtype=np.int64)
+    boxes = np.empty((n, 4), dtype=np.int64)
+    boxes[:] = (w, h, 0, 0)
+    sdiv, hdiv = _hsv_div_tables()
+    _compiled_kernel(np.ascontiguousarray(bgr), luts, sdiv, hdiv, labels, counts, boxes)
+    return labels, LabelStats((h, w), counts, boxes)
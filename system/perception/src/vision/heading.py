@@ -2,27 +2,42 @@
 
 from __future__ import annotations
 
-from typing import Any
+import math
+from functools import lru_cache
+from typing import Any, Sequence
 
 import cv2
 import numpy as np
 
-from src.utils.math2d import unit
+from src.utils.math2d import unit, unit2
+from src.vision.contours import ContourSet
+from src.vision.workspace import PipelineWorkspace, buf
 
 
-def _centerline_points(mask: np.ndarray) -> np.ndarray:
-    ys, xs = np.where(mask > 0)
-    if ys.size == 0:
-        return np.empty((0, 2), dtype=np.float32)
+@lru_cache(maxsize=8)
+def _row_weights(w: int) -> np.ndarray:
+    # Columns (x, 1): one matmul gives per-row sum of x and pixel count.
+    weights = np.column_stack((np.arange(w, dtype=np.float32), np.ones(w, dtype=np.float32)))
+    weights.setflags(write=False)
+    return weights
 
-    # Vectorized centerline extraction:
-    # for each row y, compute mean x of active pixels.
-    h = mask.shape[0]
-    counts = np.bincount(ys, minlength=h).astype(np.float32)
-    sums = np.bincount(ys, weights=xs.astype(np.float32), minlength=h).astype(np.float32)
-    valid = counts > 0
-    y_vals = np.nonzero(valid)[0].astype(np.float32)
-    x_vals = sums[valid] / counts[valid]
+
+def _row_sums(mask: np.ndarray, ws: PipelineWorkspace | None = None) -> np.ndarray:
+    """Per-row (sum of x, pixel count) of active pixels, shape (h, 2) float32."""
+    h, w = mask.shape[:2]
+    ones = buf(ws, "centerline", (h, w), np.float32)
+    ones = np.minimum(mask, 1, out=ones, dtype=np.float32, casting="unsafe")
+    return np.dot(ones, _row_weights(w))
+
+
+def _centerline_points(mask: np.ndarray, ws: PipelineWorkspace | None = None) -> np.ndarray:
+    """Mean x of active pixels for every non-empty row, as (x, y) points."""
+    sums = _row_sums(mask, ws)
+    valid = sums[:, 1] > 0
+    if not valid.any():
+        return np.empty((0, 2), dtype=np.float32)
+    y_vals = np.flatnonzero(valid).astype(np.float32)
+    x_vals = sums[valid, 0] / sums[valid, 1]
     return np.column_stack((x_vals, y_vals)).astype(np.float32)
 
 
@@ -33,43 +48,288 @@ def _all_contour_points(contours: list[np.ndarray]) -> np.ndarray:
     return pts
 
 
+def _scanline_points(mask: np.ndarray, scanlines: int, min_run: int) -> tuple[np.ndarray, float]:
+    """
+    Sample K evenly spaced rows and return the centre of the widest run per row.
+
+    Returns (points Nx2 as (x, y), estimated line area in pixels).
+    """
+    h, w = mask.shape[:2]
+    k = max(2, min(int(scanlines), h))
+    rows = np.linspace(h - 1, 0, k).round().astype(np.intp)
+    padded = np.zeros((k, w + 2), dtype=np.int8)
+    np.minimum(mask[rows], 1, out=padded[:, 1:-1], casting="unsafe")
+    edges = np.diff(padded.ravel())
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  # in order, so each end pairs with its start
+    run_len = ends - starts
+    keep = run_len >= max(1, int(min_run))
+    if not keep.any():
+        return np.empty((0, 2), dtype=np.float32), 0.0
+    starts, run_len = starts[keep], run_len[keep]
+    run_row = starts // (w + 2)
+
+    # Widest run per sampled row: sort by (row, length) and take each row's last entry.
+    order = np.lexsort((run_len, run_row))
+    last = np.append(run_row[order][1:] != run_row[order][:-1], True)
+    best = order[last]
+    xs = starts[best] - run_row[best] * (w + 2) + (run_len[best] - 1) * 0.5
+    ys = rows[run_row[best]]
+    area = float(run_len[best].sum()) * (h / k)
+    return np.column_stack((xs, ys)).astype(np.float32), area
+
+
+def _fit_forward(pts: np.ndarray) -> np.ndarray:
+    line = cv2.fitLine(pts, cv2.DIST_L2, 0, 0.01, 0.01)
+    vx, vy = float(line[0][0]), float(line[1][0])
+
+    # Force "forward" direction to point upwards in image coordinates.
+    if vy > 0:
+        vx, vy = -vx, -vy
+    return unit([vx, vy])
+
+
+def _weighted_fits(
+    sums: np.ndarray, decay: float, lookahead: Sequence[float]
+) -> tuple[np.ndarray | None, list[tuple[float, float] | None]]:
+    """
+    Weighted least-squares x = a + b*y over per-row centres.
+
+    Row weights fall off as exp(-d / decay) with d the distance from the
+    bottom row as a fraction of the mask height (decay <= 0: uniform), so
+    near-field rows dominate. Weighted moments are accumulated bottom-up once;
+    the fit over all rows and the fit over the rows within each lookahead
+    fraction of the height then cost O(1) each. Returns (forward heading or
+    None, one heading or None per lookahead); a fit needs two rows.
+    """
+    h = sums.shape[0]
+    valid = sums[:, 1] > 0
+    ys = np.flatnonzero(valid)[::-1]  # bottom-up
+    if ys.size < 2:
+        return None, [None] * len(lookahead)
+    xs = sums[ys, 0].astype(np.float64) / sums[ys, 1]
+    d = (h - 1 - ys) / max(h - 1, 1)
+    w = np.exp(-d / decay) if decay > 0 else np.ones(ys.size)
+    y = ys.astype(np.float64)
+    wy = w * y
+    moments = np.cumsum(np.stack((w, wy, w * xs, wy * y, wy * xs)), axis=1)
+
+    def fit(k: int) -> tuple[float, float] | None:
+        if k < 2:
+            return None
+        s1, sy, sx, syy, sxy = moments[:, k - 1]
+        den = s1 * syy - sy * sy
+        if den <= 1e-9 * s1 * s1:
+            return None
+        b = (s1 * sxy - sx * sy) / den
+        return unit2(-float(b), -1.0)  # dx/dy = b, pointing up the image
+
+    full = fit(ys.size)
+    # Rows within distance L of the bottom: a prefix of the bottom-up order.
+    counts = np.searchsorted(d, np.asarray(lookahead, dtype=np.float64), side="right")
+    return (
+        None if full is None else np.array(full, dtype=np.float64),
+        [fit(int(k)) for k in counts],
+    )
+
+
+def _principal_axis(contours: ContourSet, keep: list[int]) -> np.ndarray | None:
+    """Major axis of the union of filled contours from summed raw moments (closed form)."""
+    m00 = m10 = m01 = m20 = m11 = m02 = 0.0
+    for i in keep:
+        m = contours.moments(i)
+        m00 += m["m00"]
+        m10 += m["m10"]
+        m01 += m["m01"]
+        m20 += m["m20"]
+        m11 += m["m11"]
+        m02 += m["m02"]
+    if m00 <= 1e-9:
+        return None
+    cx, cy = m10 / m00, m01 / m00
+    mu20 = m20 / m00 - cx * cx
+    mu02 = m02 / m00 - cy * cy
+    mu11 = m11 / m00 - cx * cy
+    theta = 0.5 * math.atan2(2.0 * mu11, mu20 - mu02)
+    vx, vy = math.cos(theta), math.sin(theta)
+
+    # Force "forward" direction to point upwards in image coordinates.
+    if vy > 0:
+        vx, vy = -vx, -vy
+    return unit([vx, vy])
+
+
 def extract_heading(
     red_mask: np.ndarray,
     prev_heading: np.ndarray,
     min_area: float,
     use_centerline: bool = True,
+    contours: ContourSet | None = None,
+    estimator: str = "fitline",
+    scanlines: int = 16,
+    scanline_min_run: int = 3,
+    ws: PipelineWorkspace | None = None,
+    row_weight_decay: float = 0.5,
+    lookahead: Sequence[float] = (),
 ) -> tuple[np.ndarray, float, list[np.ndarray], dict[str, Any]]:
     """
     Fit heading vector from accepted red contours.
 
+    Pass the frame's cached ContourSet for red_mask to avoid re-tracing it.
+    estimator="scanline" skips contours and fits the widest run centre on
+    `scanlines` sampled rows instead (no accepted contours are returned).
+    estimator="moments" takes the principal axis of the accepted contours'
+    second-order central moments instead of drawing them and running fitLine.
+    estimator="weighted" fits the centerline by weighted least squares (near
+    rows count more, see _weighted_fits) and also sets debug["lookahead"]: a
+    heading (or None) per `lookahead` fraction of the mask height, from the
+    same row sums.
+    On success debug["bbox"] is the (x0, y0, x1, y1) extent of the fitted data in
+    red_mask pixels (run_pipeline maps it back to ROI pixels).
+    `ws` supplies reusable scratch buffers for the centerline rasterization.
+
     Returns:
         heading_raw: unit vector (or previous vector if no detection)
         detected_area: sum area of accepted contours
         accepted_contours: contours used for heading estimation
         debug: diagnostic values
     """
-    contours, _ = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    accepted = [c for c in contours if cv2.contourArea(c) >= min_area]
-    total_area = float(sum(cv2.contourArea(c) for c in accepted))
+    if estimator == "scanline":
+        pts, area = _scanline_points(red_mask, scanlines, scanline_min_run)
+        if area < min_area or pts.shape[0] < 2:
+            return unit(prev_heading), 0.0, [], {"fit_ok": False}
+        x0, y0 = pts.min(axis=0)
+        x1, y1 = pts.max(axis=0)
+        bbox = (int(x0), int(y0), int(x1) + 1, int(y1) + 1)
+        debug = {"fit_ok": True, "bbox": bbox, "scanline_rows": int(pts.shape[0])}
+        return _fit_forward(pts), area, [], debug
+    if estimator not in ("fitline", "moments", "weighted"):
+        raise ValueError(f"Unsupported heading estimator: {estimator}")
+
+    if contours is None:
+        found, _ = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours = ContourSet(found)
+    keep = contours.select(min_area)
+    accepted = [contours.contours[i] for i in keep]
+    total_area = float(sum(contours.areas[i] for i in keep))
 
     if not accepted:
         return unit(prev_heading), 0.0, [], {"fit_ok": False}
 
-    if use_centerline:
-        draw_mask = np.zeros_like(red_mask)
+    x, y, bw, bh = cv2.boundingRect(np.vstack(accepted))
+    bbox = (x, y, x + bw, y + bh)
+    if estimator == "moments":
+        axis = _principal_axis(contours, keep)
+        if axis is None:
+            return unit(prev_heading), total_area, accepted, {"fit_ok": False}
+        return axis, total_area, accepted, {"fit_ok": True, "bbox": bbox}
+
+    if use_centerline or estimator == "weighted":
+        draw_mask = buf(ws, "heading_draw", red_mask.shape[:2])
+        if draw_mask is None:
+            draw_mask = np.zeros_like(red_mask)
+        else:
+            draw_mask.fill(0)
         cv2.drawContours(draw_mask, accepted, -1, 255, thickness=cv2.FILLED)
-        pts = _centerline_points(draw_mask)
+        if estimator == "weighted":
+            heading, ahead = _weighted_fits(_row_sums(draw_mask, ws), row_weight_decay, lookahead)
+            if heading is None:
+                debug = {"fit_ok": False, "lookahead": ahead}
+                return unit(prev_heading), total_area, accepted, debug
+            return heading, total_area, accepted, {"fit_ok": True, "bbox": bbox, "lookahead": ahead}
+        pts = _centerline_points(draw_mask, ws)
     else:
         pts = _all_contour_points(accepted)
 
     if pts.shape[0] < 2:
         return unit(prev_heading), total_area, accepted, {"fit_ok": False}
 
-    line = cv2.fitLine(pts, cv2.DIST_L2, 0, 0.01, 0.01)
-    vx, vy = float(line[0][0]), float(line[1][0])
+    return _fit_forward(pts), total_area, accepted, {"fit_ok": True, "bbox": bbox}
 
-    # Force "forward" direction to point upwards in image coordinates.
-    if vy > 0:
-        vx, vy = -vx, -vy
 
-    return unit([vx, vy]), total_area, accepted, {"fit_ok": True}
+def _split_row(mask: np.ndarray, min_rows: int) -> int | None:
+    """Lowest row where the mask splits into 2+ runs for `min_rows` consecutive rows upward."""
+    on = mask > 0
+    starts = on[:, 1:] & ~on[:, :-1]
+    runs = np.count_nonzero(starts, axis=1) + on[:, 0]
+    multi = runs >= 2
+    k = max(1, int(min_rows))
+    if multi.shape[0] < k:
+        return None
+    window = np.ones(multi.shape[0] - k + 1, dtype=bool)
+    for i in range(k):
+        window &= multi[i : multi.shape[0] - k + 1 + i]
+    hits = np.flatnonzero(window)
+    if hits.size == 0:
+        return None
+    return int(hits[-1]) + k - 1
+
+
+def find_branches(
+    mask: np.ndarray,
+    prev_heading: np.ndarray,
+    min_area: float,
+    min_rows: int = 3,
+) -> tuple[list[dict[str, float]], int | None]:
+    """
+    Candidate path branches above the lowest fork, ranked by agreement with prev_heading.
+
+    Rows above the first row (from the bottom) where the path splits into
+    separate runs are labelled once; every component of at least min_area
+    pixels is one branch. Per-branch centrelines and line fits come from
+    bincounts over (label, row), so the cost is O(pixels) for any number of
+    branches. Each branch has px, py (forward unit vector, image frame), area,
+    cx, cy and agreement (dot product with prev_heading). Returns
+    (branches, fork row or None); branches is empty when there is no fork.
+    """
+    h = mask.shape[0]
+    split = _split_row(mask, min_rows)
+    if split is None:
+        return [], None
+    upper = mask[: split + 1]
+    n, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        upper, connectivity=8, ltype=cv2.CV_32S
+    )
+    keep = np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] >= min_area) + 1
+    if keep.size < 2:
+        return [], split
+
+    ys, xs = np.nonzero(labels)
+    lab = labels[ys, xs]
+    # Per (label, row): pixel count and sum of x -> row centres.
+    key = lab * h + ys
+    cnt = np.bincount(key, minlength=n * h)
+    sum_x = np.bincount(key, weights=xs, minlength=n * h)
+    rows = np.flatnonzero(cnt)
+    row_lab, row_y = rows // h, (rows % h).astype(np.float64)
+    row_x = sum_x[rows] / cnt[rows]
+    # Least squares x = a + b*y per label, one row centre per sample.
+    s1 = np.bincount(row_lab, minlength=n)
+    sy = np.bincount(row_lab, weights=row_y, minlength=n)
+    sx = np.bincount(row_lab, weights=row_x, minlength=n)
+    syy = np.bincount(row_lab, weights=row_y * row_y, minlength=n)
+    sxy = np.bincount(row_lab, weights=row_x * row_y, minlength=n)
+
+    px_prev, py_prev = unit2(float(prev_heading[0]), float(prev_heading[1]))
+    branches: list[dict[str, float]] = []
+    for i in keep:
+        den = s1[i] * syy[i] - sy[i] * sy[i]
+        if s1[i] < 2 or den <= 1e-9:
+            continue
+        b = (s1[i] * sxy[i] - sx[i] * sy[i]) / den
+        bx, by = unit2(-float(b), -1.0)  # dx/dy = b, pointing up the image
+        cx, cy = centroids[i]
+        branches.append(
+            {
+                "px": bx,
+                "py": by,
+                "area": float(stats[i, cv2.CC_STAT_AREA]),
+                "cx": float(cx),
+                "cy": float(cy),
+                "agreement": bx * px_prev + by * py_prev,
+            }
+        )
+    if len(branches) < 2:
+        return [], split
+    branches.sort(key=lambda br: br["agreement"], reverse=True)
+    return branches, split
@@ -2,12 +2,18 @@
 
 from __future__ import annotations
 
-from typing import Dict
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, Iterable, Iterator, Mapping, Sequence
 
 import cv2
 import numpy as np
 
-from src.config import AppConfig, HSVRange
+from src.config import AppConfig
+from src.vision.classify import MASK_BITS, classify_bgr, classify_hsv, label_mask
+from src.vision.compiled import CompiledConfig, MaskMorph, band_morph, compile_config
+from src.vision.fused import NUMBA_AVAILABLE, LabelStats, fused_classify
+from src.vision.rectify import Rectifier
+from src.vision.workspace import PipelineWorkspace, buf
 
 
 def crop_roi(frame: np.ndarray, roi_y_start: int) -> np.ndarray:
@@ -16,41 +22,367 @@ def crop_roi(frame: np.ndarray, roi_y_start: int) -> np.ndarray:
     return frame[y:, :]
 
 
-def to_hsv(roi_bgr: np.ndarray) -> np.ndarray:
-    return cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)
+def to_hsv(roi_bgr: np.ndarray, dst: np.ndarray | None = None) -> np.ndarray:
+    return cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV, dst=dst)
 
 
-def _mask_range(hsv: np.ndarray, r: HSVRange) -> np.ndarray:
-    lo = np.array(r.lo, dtype=np.uint8)
-    hi = np.array(r.hi, dtype=np.uint8)
-    return cv2.inRange(hsv, lo, hi)
+def _compiled(cfg: AppConfig, compiled: CompiledConfig | None) -> CompiledConfig:
+    return compiled if compiled is not None else compile_config(cfg)
 
 
-def clean_mask(mask: np.ndarray, kernel_size: int, open_iters: int, close_iters: int) -> np.ndarray:
-    """Apply open+close morphology to reduce noise and fill small gaps."""
-    k = max(1, int(kernel_size))
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (k, k))
-    out = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=max(0, int(open_iters)))
-    out = cv2.morphologyEx(out, cv2.MORPH_CLOSE, kernel, iterations=max(0, int(close_iters)))
+def clean_mask(
+    mask: np.ndarray,
+    kernel: np.ndarray,
+    open_iters: int,
+    close_iters: int,
+    dst: np.ndarray | None = None,
+    tmp: np.ndarray | None = None,
+) -> np.ndarray:
+    """Apply open+close morphology with a structuring element to reduce noise and fill gaps."""
+    opens, closes = max(0, int(open_iters)), max(0, int(close_iters))
+    out = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, dst=tmp, iterations=opens)
+    out = cv2.morphologyEx(out, cv2.MORPH_CLOSE, kernel, dst=dst, iterations=closes)
     return out
 
 
-def build_masks(hsv: np.ndarray, cfg: AppConfig) -> Dict[str, np.ndarray]:
-    """Build cleaned binary masks for red/green/blue/black/danger."""
-    red = cv2.bitwise_or(_mask_range(hsv, cfg.red1), _mask_range(hsv, cfg.red2))
-    green = _mask_range(hsv, cfg.green)
-    blue = _mask_range(hsv, cfg.blue)
-    black = _mask_range(hsv, cfg.black)
-    danger = _mask_range(hsv, cfg.danger)
-
-    m = cfg.morph
-    return {
-        "red": clean_mask(red, m.kernel_size, m.open_iters, m.close_iters),
-        "green": clean_mask(green, m.kernel_size, m.open_iters, m.close_iters),
-        "blue": clean_mask(blue, m.kernel_size, m.open_iters, m.close_iters),
-        "black": clean_mask(black, m.kernel_size, m.open_iters, m.close_iters),
-        "danger": clean_mask(danger, m.kernel_size, m.open_iters, m.close_iters),
-    }
+def apply_morph(
+    mask: np.ndarray, mm: MaskMorph, dst: np.ndarray | None = None, tmp: np.ndarray | None = None
+) -> np.ndarray:
+    """Clean a mask with its resolved strategy; method "none" returns `mask` itself."""
+    if mm.method == "none":
+        return mask
+    if mm.method == "median":
+        return cv2.medianBlur(mask, mm.median_ksize, dst=dst)
+    return clean_mask(mask, mm.kernel, mm.open_iters, mm.close_iters, dst=dst, tmp=tmp)
+
+
+def _raw_mask_inrange(
+    hsv: np.ndarray, cc: CompiledConfig, name: str, ws: PipelineWorkspace | None = None
+) -> np.ndarray:
+    shape = hsv.shape[:2]
+    if name == "red":
+        red1 = cv2.inRange(hsv, *cc.bounds["red1"], dst=buf(ws, "raw:red", shape))
+        red2 = cv2.inRange(hsv, *cc.bounds["red2"], dst=buf(ws, "raw2:red", shape))
+        return cv2.bitwise_or(red1, red2, dst=red1)
+    return cv2.inRange(hsv, *cc.bounds[name], dst=buf(ws, f"raw:{name}", shape))
+
+
+class LazyMasks(Mapping[str, np.ndarray]):
+    """
+    Per-frame mask mapping for red/green/blue/black/danger.
+
+    A mask is thresholded and morph-cleaned the first time it is looked up,
+    then memoized for the rest of the frame. Iterating (or dict()) builds all.
+    With a workspace, each mask lands in its own reused buffer. prefetch()
+    starts building masks on an executor; lookups then wait for the result.
+    Each mask is cleaned with its own strategy (`morph`, by default
+    CompiledConfig.morph; pass ScaledThresholds.morph for resized frames). With
+    label stats, empty masks skip cleaning and the rest run it only on their
+    padded bounding box.
+    """
+
+    def __init__(
+        self,
+        raw_fn: Callable[[str], np.ndarray],
+        compiled: CompiledConfig,
+        ws: PipelineWorkspace | None = None,
+        stats: LabelStats | None = None,
+        morph: Mapping[str, MaskMorph] | None = None,
+    ) -> None:
+        self._raw_fn = raw_fn
+        self._morph = compiled.morph if morph is None else morph
+        self._ws = ws
+        self._stats = stats
+        self._built: Dict[str, np.ndarray] = {}
+        self._pending: Dict[str, Future[np.ndarray]] = {}
+
+    def _build(self, name: str) -> np.ndarray:
+        # Each mask only touches its own workspace buffers, so builds may run concurrently.
+        mm = self._morph[name]
+        if self._stats is not None and mm.method != "none":
+            return self._build_in_box(name, mm)
+        raw = self._raw_fn(name)
+        return apply_morph(
+            raw,
+            mm,
+            dst=buf(self._ws, f"mask:{name}", raw.shape),
+            tmp=buf(self._ws, f"morph:{name}", raw.shape),
+        )
+
+    def _build_in_box(self, name: str, mm: MaskMorph) -> np.ndarray:
+        # Padding the box by the strategy's reach keeps everything near the crop
+        # edge zero before and after every step: the result is exact.
+        shape = self._stats.shape
+        out = buf(self._ws, f"mask:{name}", shape)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        box = self._stats.box(MASK_BITS[name])
+        if box is None:
+            out.fill(0)
+            return out
+        pad = mm.reach + 1
+        h, w = shape
+        x0, y0 = max(0, box[0] - pad), max(0, box[1] - pad)
+        x1, y1 = min(w, box[2] + pad), min(h, box[3] + pad)
+        raw = self._raw_fn(name)
+        crop = (y1 - y0, x1 - x0)
+        cleaned = apply_morph(
+            np.ascontiguousarray(raw[y0:y1, x0:x1]),
+            mm,
+            dst=buf(self._ws, f"box:{name}", crop),
+            tmp=buf(self._ws, f"morph:{name}", crop),
+        )
+        out.fill(0)
+        out[y0:y1, x0:x1] = cleaned
+        return out
+
+    def prefetch(self, names: Iterable[str], pool: Executor) -> None:
+        """Start building the given masks on `pool`."""
+        for name in names:
+            if name in MASK_BITS and name not in self._built and name not in self._pending:
+                self._pending[name] = pool.submit(self._build, name)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        mask = self._built.get(name)
+        if mask is None:
+            if name not in MASK_BITS:
+                raise KeyError(name)
+            pending = self._pending.pop(name, None)
+            mask = pending.result() if pending is not None else self._build(name)
+            self._built[name] = mask
+        return mask
+
+    def __contains__(self, name: object) -> bool:
+        return name in MASK_BITS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(MASK_BITS)
+
+    def __len__(self) -> int:
+        return len(MASK_BITS)
+
+    @property
+    def built(self) -> tuple[str, ...]:
+        """Names of masks computed so far this frame."""
+        return tuple(self._built)
+
+
+def _lazy_from_labels(
+    labels: np.ndarray,
+    cc: CompiledConfig,
+    ws: PipelineWorkspace | None = None,
+    stats: LabelStats | None = None,
+    morph: Mapping[str, MaskMorph] | None = None,
+) -> LazyMasks:
+    return LazyMasks(
+        lambda name: label_mask(labels, MASK_BITS[name], dst=buf(ws, f"raw:{name}", labels.shape)),
+        cc,
+        ws,
+        stats,
+        morph,
+    )
+
+
+def _lazy_inrange(
+    hsv: np.ndarray,
+    cc: CompiledConfig,
+    ws: PipelineWorkspace | None = None,
+    morph: Mapping[str, MaskMorph] | None = None,
+) -> LazyMasks:
+    return LazyMasks(lambda name: _raw_mask_inrange(hsv, cc, name, ws), cc, ws, morph=morph)
+
+
+def build_masks(
+    hsv: np.ndarray,
+    cfg: AppConfig,
+    ws: PipelineWorkspace | None = None,
+    compiled: CompiledConfig | None = None,
+) -> LazyMasks:
+    """
+    Return lazily built, cleaned binary masks for red/green/blue/black/danger.
+
+    Pass the CompiledConfig for cfg when calling per frame; without it the
+    constants are derived again on every call.
+    """
+    cc = _compiled(cfg, compiled)
+    if cfg.classifier.mode == "inrange":
+        return _lazy_inrange(hsv, cc, ws)
+    # One classification pass up front; per-mask work is a bit test + morphology.
+    return _lazy_from_labels(classify_hsv(hsv, cc.luts, ws), cc, ws)
+
+
+def build_frame_masks(
+    roi_bgr: np.ndarray,
+    cfg: AppConfig,
+    ws: PipelineWorkspace | None = None,
+    rectifier: Rectifier | None = None,
+    compiled: CompiledConfig | None = None,
+    morph: Mapping[str, MaskMorph] | None = None,
+) -> LazyMasks:
+    """
+    Build lazy masks from a BGR ROI; bgr_lut mode never materializes an HSV image.
+
+    `morph` overrides the compiled full-resolution cleaning, e.g. with the
+    kernels of ScaledThresholds when roi_bgr was resized for processing.
+
+    With a rectifier, the label image (1 byte/px) is remapped right after
+    classification; inrange mode has no label image and remaps the BGR ROI.
+    lut mode with classifier.fused uses the compiled one-pass classifier when
+    numba is installed (identical masks), otherwise cvtColor + LUT.
+    """
+    cc = _compiled(cfg, compiled)
+    mode = cfg.classifier.mode
+    if rectifier is not None and mode == "inrange":
+        rectified = buf(ws, "rectified_bgr", roi_bgr.shape)
+        roi_bgr = rectifier.apply(roi_bgr, labels=False, dst=rectified)
+    if mode == "bgr_lut":
+        bits = cfg.classifier.bgr_bits
+        labels = classify_bgr(roi_bgr, cc.bgr_table, bits, ws)
+    elif mode == "lut" and cfg.classifier.fused and NUMBA_AVAILABLE:
+        labels, stats = fused_classify(roi_bgr, cc.luts, ws)
+        if rectifier is None:
+            return _lazy_from_labels(labels, cc, ws, stats, morph)
+    elif mode == "lut":
+        labels = classify_hsv(to_hsv(roi_bgr, buf(ws, "hsv", roi_bgr.shape)), cc.luts, ws)
+    else:
+        return _lazy_inrange(to_hsv(roi_bgr, buf(ws, "hsv", roi_bgr.shape)), cc, ws, morph)
+    if rectifier is not None:
+        # Remapping moves pixels, so fused stats no longer describe the labels.
+        labels = rectifier.apply(labels, labels=True, dst=buf(ws, "rectified_labels", labels.shape))
+    return _lazy_from_labels(labels, cc, ws, morph=morph)
+
+
+def band_rows(h: int, edges: Sequence[float]) -> list[tuple[int, int]]:
+    """(y0, y1) row ranges of the bands split at `edges` (fractions of h), top to bottom."""
+    cuts = [0] + [min(h, max(0, int(round(e * h)))) for e in edges] + [h]
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+class BandedMasks(Mapping[str, np.ndarray]):
+    """
+    Full-size masks stitched from per-band LazyMasks built at reduced scales.
+
+    Each band's masks are built lazily by its own LazyMasks; a lookup stitches
+    them into one mask the size of the source image (nearest upsampling), so
+    heading and zone statistics read image coordinates as usual.
+    """
+
+    def __init__(
+        self,
+        bands: list[tuple[int, int, LazyMasks]],
+        shape: tuple[int, int],
+        ws: PipelineWorkspace | None = None,
+    ) -> None:
+        self._bands = bands
+        self._shape = shape
+        self._ws = ws
+        self._built: Dict[str, np.ndarray] = {}
+
+    def _stitch(self, name: str) -> np.ndarray:
+        h, w = self._shape
+        out = buf(self._ws, f"banded:{name}", self._shape)
+        if out is None:
+            out = np.empty(self._shape, dtype=np.uint8)
+        for y0, y1, masks in self._bands:
+            band = masks[name]
+            if band.shape == (y1 - y0, w):
+                out[y0:y1] = band
+            elif cv2.countNonZero(band) == 0:
+                out[y0:y1] = 0  # most colours are absent from most bands; skip the upsample
+            else:
+                cv2.resize(band, (w, y1 - y0), dst=out[y0:y1], interpolation=cv2.INTER_NEAREST)
+        return out
+
+    def prefetch(self, names: Iterable[str], pool: Executor) -> None:
+        """Start building the given masks of every band on `pool`."""
+        names = list(names)
+        for _, _, masks in self._bands:
+            masks.prefetch(names, pool)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        mask = self._built.get(name)
+        if mask is None:
+            if name not in MASK_BITS:
+                raise KeyError(name)
+            mask = self._built[name] = self._stitch(name)
+        return mask
+
+    def __contains__(self, name: object) -> bool:
+        return name in MASK_BITS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(MASK_BITS)
+
+    def __len__(self) -> int:
+        return len(MASK_BITS)
+
+    @property
+    def built(self) -> tuple[str, ...]:
+        """Names of masks stitched so far this frame."""
+        return tuple(self._built)
+
+
+def build_banded_masks(
+    roi_bgr: np.ndarray,
+    cfg: AppConfig,
+    ws: PipelineWorkspace | None = None,
+    compiled: CompiledConfig | None = None,
+    morph: Sequence[Mapping[str, MaskMorph]] | None = None,
+) -> BandedMasks:
+    """
+    Build masks per cfg.row_bands: each band is resized to its scale and masked
+    on its own (classification and morphology), then stitched back full size.
+
+    Each band cleans with kernels and median apertures scaled by its own
+    factor, so thin far-field features are not opened away. When roi_bgr was
+    itself resized for processing, pass ScaledThresholds.band_morph so the
+    two scales compound.
+    """
+    cc = _compiled(cfg, compiled)
+    if morph is None:
+        morph = band_morph(cfg)
+    rb = cfg.row_bands
+    h, w = roi_bgr.shape[:2]
+    bands = []
+    for i, ((y0, y1), scale) in enumerate(zip(band_rows(h, rb.edges), rb.scales)):
+        if y1 <= y0:
+            continue
+        sub = ws.sub(f"band{i}") if ws is not None else None
+        band = roi_bgr[y0:y1]
+        if scale < 1.0:
+            size = (max(1, int(round(w * scale))), max(1, int(round((y1 - y0) * scale))))
+            dst = buf(sub, "band_bgr", (size[1], size[0], 3))
+            band = cv2.resize(band, size, dst=dst, interpolation=cv2.INTER_AREA)
+        bands.append((y0, y1, build_frame_masks(band, cfg, sub, None, cc, morph[i])))
+    return BandedMasks(bands, (h, w), ws)
+
+
+def build_batch_masks(
+    frames_bgr: np.ndarray,
+    cfg: AppConfig,
+    compiled: CompiledConfig | None = None,
+    morph: Mapping[str, MaskMorph] | None = None,
+) -> list[LazyMasks]:
+    """
+    Classify a (N, H, W, 3) BGR stack in one pass and return lazy masks per frame.
+
+    Color conversion and lookups are per pixel, so running them over the stack
+    viewed as one tall image gives exactly the per-frame result. Morphology
+    stays per frame (inside LazyMasks) so kernels never cross frame borders.
+    """
+    n, h, w = frames_bgr.shape[:3]
+    tall = np.ascontiguousarray(frames_bgr).reshape(n * h, w, 3)
+    cc = _compiled(cfg, compiled)
+    mode = cfg.classifier.mode
+    if mode == "bgr_lut":
+        labels = classify_bgr(tall, cc.bgr_table, cfg.classifier.bgr_bits).reshape(n, h, w)
+        return [_lazy_from_labels(labels[i], cc, morph=morph) for i in range(n)]
+    hsv = to_hsv(tall)
+    if mode == "lut":
+        labels = classify_hsv(hsv, cc.luts).reshape(n, h, w)
+        return [_lazy_from_labels(labels[i], cc, morph=morph) for i in range(n)]
+    stack = hsv.reshape(n, h, w, 3)
+    return [_lazy_inrange(stack[i], cc, morph=morph) for i in range(n)]
 
 
 def mask_ratio(mask: np.ndarray) -> float:
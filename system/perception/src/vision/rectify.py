@@ -0,0 +1,167 @@
+"""Lens-undistortion / bird's-eye remap with maps cached on disk."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+# Relative cache directories are taken from the package root, not the process cwd.
+PACKAGE_ROOT = Path(__file__).resolve().parents[2]
+
+
+@dataclass
+class Calibration:
+    image_size: tuple[int, int]  # (w, h) the intrinsics were measured at
+    camera_matrix: np.ndarray  # 3x3
+    dist_coeffs: np.ndarray  # k1, k2, p1, p2[, k3...]
+    homography: np.ndarray | None  # undistorted full-frame px -> output full-frame px
+    digest: str  # sha256 of the calibration file
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Calibration":
+        raw = Path(path).read_bytes()
+        data = yaml.safe_load(raw) or {}
+        if not isinstance(data, dict):
+            raise ValueError("Calibration YAML must be a mapping")
+        w, h = (int(v) for v in data["image_size"])
+        k = np.asarray(data["camera_matrix"], dtype=np.float64).reshape(3, 3)
+        d = np.asarray(data.get("dist_coeffs", []), dtype=np.float64).reshape(-1)
+        hom = data.get("homography")
+        return cls(
+            image_size=(w, h),
+            camera_matrix=k,
+            dist_coeffs=d,
+            homography=None if hom is None else np.asarray(hom, dtype=np.float64).reshape(3, 3),
+            digest=hashlib.sha256(raw).hexdigest(),
+        )
+
+
+def _source_coords(
+    calib: Calibration, frame_w: int, roi_y: int, proc_size: tuple[int, int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every pixel of the processed ROI, its source location in the processed ROI.
+
+    The ROI is the bottom part of a frame_w-wide frame starting at row roi_y and
+    was resized to proc_size; calibration intrinsics are rescaled to frame_w.
+    """
+    pw, ph = proc_size
+    s = pw / float(frame_w)
+    xs = (np.arange(pw, dtype=np.float64) + 0.5) / s - 0.5
+    ys = (np.arange(ph, dtype=np.float64) + 0.5) / s - 0.5 + roi_y
+    gx, gy = np.meshgrid(xs, ys)
+    pts = np.stack((gx, gy), axis=-1).reshape(-1, 1, 2)
+
+    if calib.homography is not None:
+        pts = cv2.perspectiveTransform(pts, np.linalg.inv(calib.homography))
+
+    k = calib.camera_matrix.copy()
+    k[:2] *= frame_w / float(calib.image_size[0])
+    # Undistorted pixels -> normalized rays -> distorted pixels.
+    rays = cv2.undistortPoints(pts, k, None).reshape(-1, 2)
+    rays3 = np.concatenate((rays, np.ones((rays.shape[0], 1))), axis=1)
+    src, _ = cv2.projectPoints(rays3, np.zeros(3), np.zeros(3), k, calib.dist_coeffs)
+    src = src.reshape(ph, pw, 2)
+
+    map_x = ((src[..., 0] + 0.5) * s - 0.5).astype(np.float32)
+    map_y = ((src[..., 1] - roi_y + 0.5) * s - 0.5).astype(np.float32)
+    return map_x, map_y
+
+
+def _load_maps(path: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+    """Cached maps, or None when the file is unreadable (it is then rebuilt and replaced)."""
+    try:
+        with np.load(path) as data:
+            return data["nearest"], data["map1"], data["map2"]
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def _save_maps(path: Path, **maps: np.ndarray) -> None:
+    # Write beside the target and rename over it, so an interrupted write never
+    # leaves a partial .npz where the next start would load it.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.stem, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **maps)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Rectifier:
+    """
+    Applies the calibration's geometric correction to ROI-sized images.
+
+    Maps are built once per processed ROI size, converted to fixed-point
+    CV_16SC2 (rounded for nearest sampling; integer part + interpolation table
+    for bilinear) and cached on disk keyed by calibration digest, frame width,
+    ROI offset and size. A relative cache_dir is taken from the package root.
+    """
+
+    def __init__(
+        self, calib: Calibration, frame_w: int, roi_y: int, cache_dir: str | Path | None = None
+    ) -> None:
+        self.calib = calib
+        self.frame_w = int(frame_w)
+        self.roi_y = int(roi_y)
+        self.cache_dir = PACKAGE_ROOT / cache_dir if cache_dir else None
+        self._maps: dict[tuple[int, int], tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self.build_ms = 0.0
+        self.cache_hits = 0
+        self.last_ms = 0.0
+
+    def _cache_path(self, size: tuple[int, int]) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        key = f"{self.calib.digest[:16]}_{self.frame_w}_{self.roi_y}_{size[0]}x{size[1]}"
+        return self.cache_dir / f"remap_{key}.npz"
+
+    def maps(self, size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(nearest CV_16SC2, bilinear CV_16SC2, bilinear CV_16UC1) maps for ROI size (w, h)."""
+        cached = self._maps.get(size)
+        if cached is not None:
+            return cached
+        path = self._cache_path(size)
+        if path is not None and path.exists():
+            cached = _load_maps(path)
+            if cached is not None:
+                self.cache_hits += 1
+        if cached is None:
+            t0 = time.perf_counter()
+            map_x, map_y = _source_coords(self.calib, self.frame_w, self.roi_y, size)
+            nearest, _ = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2, nninterpolation=True)
+            map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+            cached = (nearest, map1, map2)
+            self.build_ms += (time.perf_counter() - t0) * 1000.0
+            if path is not None:
+                _save_maps(path, nearest=nearest, map1=map1, map2=map2)
+        self._maps[size] = cached
+        return cached
+
+    def apply(self, img: np.ndarray, labels: bool, dst: np.ndarray | None = None) -> np.ndarray:
+        """
+        Remap an ROI-sized image. Label images use nearest sampling (class bits
+        must not be blended) and move 1 byte per pixel; BGR uses bilinear.
+        """
+        t0 = time.perf_counter()
+        h, w = img.shape[:2]
+        nearest, map1, map2 = self.maps((w, h))
+        border = {"borderMode": cv2.BORDER_CONSTANT, "borderValue": 0}
+        if labels:
+            out = cv2.remap(img, nearest, None, cv2.INTER_NEAREST, dst=dst, **border)
+        else:
+            out = cv2.remap(img, map1, map2, cv2.INTER_LINEAR, dst=dst, **border)
+        self.last_ms = (time.perf_counter() - t0) * 1000.0
+        return out
@@ -0,0 +1,60 @@
+"""Reusable per-frame image buffers for allocation-free steady-state processing."""
+
+from __future__ import annotations
+
+import math
+from typing import Any
+
+import numpy as np
+
+
+class PipelineWorkspace:
+    """
+    Named scratch buffers handed to OpenCV/NumPy calls as dst=/out=.
+
+    A buffer is reallocated only when a request needs more bytes than it holds,
+    so smaller requests (e.g. a tracking-window crop) reuse the same memory.
+    Arrays handed out are overwritten on the next frame: do not keep masks or
+    label images across frames while a workspace is in use.
+    """
+
+    def __init__(self) -> None:
+        self._bufs: dict[str, np.ndarray] = {}
+        self._subs: dict[str, PipelineWorkspace] = {}
+        self._allocations = 0
+
+    def get(self, key: str, shape: tuple[int, ...], dtype: Any = np.uint8) -> np.ndarray:
+        """Return a C-contiguous array of the given shape/dtype backed by buffer `key`."""
+        dt = np.dtype(dtype)
+        n = math.prod(shape) * dt.itemsize  # np.prod costs more than the lookup itself
+        raw = self._bufs.get(key)
+        if raw is None or raw.size < n:
+            raw = np.empty(n, dtype=np.uint8)
+            self._bufs[key] = raw
+            self._allocations += 1
+        return raw[:n].view(dt).reshape(shape)
+
+    def sub(self, key: str) -> PipelineWorkspace:
+        """Nested workspace for a stage that reuses the same buffer names (e.g. per row band)."""
+        ws = self._subs.get(key)
+        if ws is None:
+            ws = self._subs[key] = PipelineWorkspace()
+        return ws
+
+    @property
+    def allocations(self) -> int:
+        return self._allocations + sum(ws.allocations for ws in self._subs.values())
+
+    @property
+    def nbytes(self) -> int:
+        own = sum(b.size for b in self._bufs.values())
+        return own + sum(ws.nbytes for ws in self._subs.values())
+
+
+def buf(
+    ws: PipelineWorkspace | None, key: str, shape: tuple[int, ...], dtype: Any = np.uint8
+) -> np.ndarray | None:
+    """Workspace buffer for `key`, or None (let the callee allocate) without a workspace."""
+    if ws is None:
+        return None
+    return ws.get(key, shape, dtype)
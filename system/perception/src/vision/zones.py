@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Mapping
 
 import cv2
 import numpy as np
@@ -10,96 +10,119 @@ import numpy as np
 from src.config import ZoneConfig
 from src.utils.math2d import clamp01
 from src.utils.math2d import circularity
+from src.vision.contours import ContourCache
 from src.vision.masks import mask_ratio
 
 
-def _contour_areas(mask: np.ndarray) -> tuple[list[np.ndarray], list[float]]:
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    areas = [float(cv2.contourArea(c)) for c in contours]
-    return contours, areas
+_NO_BOXES = np.zeros((0, 4), dtype=np.int32)
+
+
+def _find_targets(contours: ContourCache, zone_cfg: ZoneConfig) -> list[dict[str, Any]]:
+    # Areas are pixel counts from one labelling pass; only components above the
+    # area floor are outlined for the circularity test, which uses the outline's
+    # polygon area so a ring still reads as a circle.
+    blue_comps = contours.components("blue")
+    targets: list[dict[str, Any]] = []
+    for i in blue_comps.select(zone_cfg.target_min_area):
+        outline = blue_comps.outline(int(i))
+        circ = circularity(cv2.contourArea(outline), cv2.arcLength(outline, True))
+        if circ >= zone_cfg.target_min_circularity:
+            cx, cy = blue_comps.centroids[i]
+            area = float(blue_comps.areas[i])
+            targets.append({"area": area, "circularity": circ, "cx": float(cx), "cy": float(cy)})
+    return targets
 
 
 def classify_zone(
-    masks: dict[str, np.ndarray],
+    masks: Mapping[str, np.ndarray],
     zone_cfg: ZoneConfig,
     path_mask_key: str = "red",
+    contours: ContourCache | None = None,
+    need_confidences: bool = True,
 ) -> tuple[str, dict[str, Any]]:
-    """Classify zone according to configured thresholds and fixed priority."""
+    """
+    Classify zone according to configured thresholds and fixed priority.
+
+    Target and danger areas are component pixel counts, not contour polygon
+    areas: holes inside a blob are not counted, so a holed or ring-shaped danger
+    blob reads smaller than its outline, while a solid blob reads slightly
+    larger (by about half its perimeter). Path areas are still polygon areas.
+
+    Cheap exact bounds gate the expensive stages: a component's pixel area never
+    exceeds its mask's pixel count, so blue/danger are only labelled when the
+    count could reach the area threshold. With need_confidences=False, stages
+    that cannot change the zone (anything after a TARGET, path area once the
+    ratio passes, the green mask) are skipped too and zone_confidences is empty.
+    debug["skipped"] names the stages that did not run.
+    """
+    if contours is None:
+        contours = ContourCache(masks)
+    cfg = zone_cfg
+    skipped: list[str] = []
     path_mask = masks[path_mask_key]
-    green = masks["green"]
-    blue = masks["blue"]
-    danger = masks["danger"]
-
-    path_ratio = mask_ratio(path_mask)
-    green_ratio = mask_ratio(green)
-    danger_ratio = mask_ratio(danger)
-
-    path_contours, path_areas = _contour_areas(path_mask)
-    path_area_total = float(sum(path_areas))
-
-    danger_contours, danger_areas = _contour_areas(danger)
-    danger_area_largest = max(danger_areas, default=0.0)
-
-    # TARGET: blue circular blobs
-    target_found = False
-    target_best: dict[str, Any] = {"area": 0.0, "circularity": 0.0, "cx": 0.0, "cy": 0.0}
-    blue_contours, _ = _contour_areas(blue)
-    h, w = blue.shape[:2]
-    for c in blue_contours:
-        area = float(cv2.contourArea(c))
-        if area < zone_cfg.target_min_area:
-            continue
-        peri = float(cv2.arcLength(c, True))
-        circ = circularity(area, peri)
-        if circ >= zone_cfg.target_min_circularity:
-            target_found = True
-            if area > target_best["area"]:
-                M = cv2.moments(c)
-                cx = float(M["m10"] / M["m00"]) if M["m00"] > 0 else w / 2.0
-                cy = float(M["m01"] / M["m00"]) if M["m00"] > 0 else h / 2.0
-                target_best = {"area": area, "circularity": circ, "cx": cx, "cy": cy}
-
-    danger_by_ratio = danger_ratio >= zone_cfg.danger_ratio_thresh
-    danger_by_area = danger_area_largest >= zone_cfg.danger_area_thresh
-    if zone_cfg.danger_mode == "ratio":
-        danger_found = danger_by_ratio
-    elif zone_cfg.danger_mode == "area":
-        danger_found = danger_by_area
-    else:
-        danger_found = danger_by_ratio or danger_by_area
+    total = float(path_mask.shape[0] * path_mask.shape[1]) or 1.0
 
-    path_found = (path_ratio >= zone_cfg.path_ratio_thresh) or (
-        path_area_total >= zone_cfg.path_area_thresh
+    # TARGET: blue circular blobs.
+    targets: list[dict[str, Any]] = []
+    if cv2.countNonZero(masks["blue"]) >= cfg.target_min_area:
+        targets = _find_targets(contours, cfg)
+    else:
+        skipped.append("blue_components")
+    target_found = bool(targets)
+    target_best: dict[str, Any] = (
+        targets[0] if targets else {"area": 0.0, "circularity": 0.0, "cx": 0.0, "cy": 0.0}
     )
-
-    path_conf_ratio = clamp01(path_ratio / max(zone_cfg.path_ratio_thresh, 1e-9))
-    path_conf_area = clamp01(path_area_total / max(zone_cfg.path_area_thresh, 1e-9))
-    conf_path = max(path_conf_ratio, path_conf_area)
-
-    danger_conf_ratio = clamp01(danger_ratio / max(zone_cfg.danger_ratio_thresh, 1e-9))
-    danger_conf_area = clamp01(danger_area_largest / max(zone_cfg.danger_area_thresh, 1e-9))
-    if zone_cfg.danger_mode == "ratio":
-        conf_danger = danger_conf_ratio
-    elif zone_cfg.danger_mode == "area":
-        conf_danger = danger_conf_area
+    decided = target_found and not need_confidences
+
+    # DANGER: ratio from the pixel count; largest component only when it matters.
+    danger_ratio = danger_area_largest = 0.0
+    danger_boxes = _NO_BOXES
+    danger_found = False
+    if decided:
+        skipped.append("danger_mask")
     else:
-        conf_danger = max(danger_conf_ratio, danger_conf_area)
-
-    conf_target = 0.0
-    if target_best["area"] > 0.0:
-        conf_target_area = clamp01(target_best["area"] / max(zone_cfg.target_min_area, 1e-9))
-        conf_target_circ = clamp01(
-            target_best["circularity"] / max(zone_cfg.target_min_circularity, 1e-9)
-        )
-        conf_target = min(conf_target_area, conf_target_circ)
-
-    # SAFE confidence: how strongly we are "not path/danger/target", optionally boosted by green.
-    conf_not_hazard = clamp01(1.0 - max(conf_path, conf_danger, conf_target))
-    conf_green = clamp01(green_ratio / max(zone_cfg.green_ratio_thresh, 1e-9))
-    if zone_cfg.safe_green_required:
-        conf_safe = min(conf_not_hazard, conf_green)
+        danger_count = cv2.countNonZero(masks["danger"])
+        danger_ratio = danger_count / total
+        danger_by_ratio = danger_ratio >= cfg.danger_ratio_thresh
+        if need_confidences:
+            need_area = danger_count > 0
+        else:
+            need_area = (
+                cfg.danger_mode != "ratio"
+                and danger_count >= cfg.danger_area_thresh
+                and not (cfg.danger_mode == "either" and danger_by_ratio)
+            )
+        if need_area:
+            danger_comps = contours.components("danger")
+            danger_area_largest = float(danger_comps.areas.max(initial=0.0))
+            danger_boxes = danger_comps.boxes
+        else:
+            skipped.append("danger_components")
+        danger_by_area = danger_area_largest >= cfg.danger_area_thresh
+        if cfg.danger_mode == "ratio":
+            danger_found = danger_by_ratio
+        elif cfg.danger_mode == "area":
+            danger_found = danger_by_area
+        else:
+            danger_found = danger_by_ratio or danger_by_area
+        decided = decided or (danger_found and not need_confidences)
+
+    # PATH: ratio first; contour area only if the ratio alone does not decide.
+    path_ratio = path_area_total = 0.0
+    path_contours: Any = []
+    path_found = False
+    if decided:
+        skipped.append("path_stats")
     else:
-        conf_safe = max(conf_not_hazard, 0.35 * conf_green)
+        path_ratio = cv2.countNonZero(path_mask) / total
+        path_found = path_ratio >= cfg.path_ratio_thresh
+        if need_confidences or not path_found:
+            path_set = contours.get(path_mask_key)
+            path_area_total = float(sum(path_set.areas))
+            path_contours = path_set.contours
+            path_found = path_found or path_area_total >= cfg.path_area_thresh
+        else:
+            skipped.append("path_contours")
 
     if target_found:
         zone = "TARGET"
@@ -109,10 +132,23 @@ def classify_zone(
         zone = "PATH"
     else:
         # SAFE can optionally require visible green ratio, but defaults to SAFE.
-        if zone_cfg.safe_green_required and green_ratio < zone_cfg.green_ratio_thresh:
-            zone = "SAFE"
-        else:
-            zone = "SAFE"
+        zone = "SAFE"
+
+    green_ratio = 0.0
+    confidences: dict[str, float] = {}
+    if need_confidences:
+        green_ratio = mask_ratio(masks["green"])
+        confidences = _zone_confidences(
+            cfg,
+            path_ratio,
+            path_area_total,
+            danger_ratio,
+            danger_area_largest,
+            target_best,
+            green_ratio,
+        )
+    else:
+        skipped.append("green_mask")
 
     return zone, {
         "path_mask_key": path_mask_key,
@@ -123,12 +159,55 @@ def classify_zone(
         "danger_area_largest": danger_area_largest,
         "target_found": target_found,
         "target_best": target_best,
-        "zone_confidences": {
-            "SAFE": float(conf_safe),
-            "PATH": float(conf_path),
-            "DANGER": float(conf_danger),
-            "TARGET": float(conf_target),
-        },
+        "targets": targets,
+        "zone_confidences": confidences,
         "path_contours": path_contours,
-        "danger_contours": danger_contours,
+        "danger_boxes": danger_boxes,
+        "skipped": tuple(skipped),
+    }
+
+
+def _zone_confidences(
+    cfg: ZoneConfig,
+    path_ratio: float,
+    path_area_total: float,
+    danger_ratio: float,
+    danger_area_largest: float,
+    target_best: dict[str, Any],
+    green_ratio: float,
+) -> dict[str, float]:
+    path_conf_ratio = clamp01(path_ratio / max(cfg.path_ratio_thresh, 1e-9))
+    path_conf_area = clamp01(path_area_total / max(cfg.path_area_thresh, 1e-9))
+    conf_path = max(path_conf_ratio, path_conf_area)
+
+    danger_conf_ratio = clamp01(danger_ratio / max(cfg.danger_ratio_thresh, 1e-9))
+    danger_conf_area = clamp01(danger_area_largest / max(cfg.danger_area_thresh, 1e-9))
+    if cfg.danger_mode == "ratio":
+        conf_danger = danger_conf_ratio
+    elif cfg.danger_mode == "area":
+        conf_danger = danger_conf_area
+    else:
+        conf_danger = max(danger_conf_ratio, danger_conf_area)
+
+    conf_target = 0.0
+    if target_best["area"] > 0.0:
+        conf_target_area = clamp01(target_best["area"] / max(cfg.target_min_area, 1e-9))
+        conf_target_circ = clamp01(
+            target_best["circularity"] / max(cfg.target_min_circularity, 1e-9)
+        )
+        conf_target = min(conf_target_area, conf_target_circ)
+
+    # SAFE confidence: how strongly we are "not path/danger/target", optionally boosted by green.
+    conf_not_hazard = clamp01(1.0 - max(conf_path, conf_danger, conf_target))
+    conf_green = clamp01(green_ratio / max(cfg.green_ratio_thresh, 1e-9))
+    if cfg.safe_green_required:
+        conf_safe = min(conf_not_hazard, conf_green)
+    else:
+        conf_safe = max(conf_not_hazard, 0.35 * conf_green)
+
+    return {
+        "SAFE": float(conf_safe),
+        "PATH": float(conf_path),
+        "DANGER": float(conf_danger),
+        "TARGET": float(conf_target),
     }
@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+
+from src.vision.change import FrameChangeDetector
+
+
+def _frame(x: int = 100) -> np.ndarray:
+    frame = np.full((160, 320, 3), (60, 170, 60), dtype=np.uint8)
+    cv2.circle(frame, (x, 80), 22, (255, 0, 0), -1)
+    return frame
+
+
+def test_static_noisy_frames_are_reused_until_the_scene_moves() -> None:
+    det = FrameChangeDetector(thumb_width=32, threshold=2.0, max_age_s=10.0, max_frames=100)
+    rng = np.random.default_rng(0)
+    assert not det.unchanged(_frame(), 0.0)  # first frame is always a full run
+    for k in range(1, 5):
+        noise = rng.integers(-6, 7, size=(160, 320, 3))
+        noisy = np.clip(_frame().astype(int) + noise, 0, 255).astype(np.uint8)
+        assert det.unchanged(noisy, k * 0.03)
+    assert not det.unchanged(_frame(x=140), 0.2)
+    assert det.unchanged(_frame(x=140), 0.23)
+
+
+def test_reuse_is_capped_by_age_and_count() -> None:
+    det = FrameChangeDetector(thumb_width=32, threshold=2.0, max_age_s=0.1, max_frames=3)
+    frame = _frame()
+    assert not det.unchanged(frame, 0.0)
+    assert [det.unchanged(frame, t) for t in (0.01, 0.02, 0.03, 0.04)] == [True, True, True, False]
+    assert det.unchanged(frame, 0.05)
+    assert not det.unchanged(frame, 0.2)
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.config import AppConfig, HSVRange, MorphConfig
+from src.pipeline import PipelineState, run_pipeline
+from src.vision.compiled import compile_config
+
+
+def _path_frame(w: int = 160, h: int = 80) -> np.ndarray:
+    frame = np.full((h, w, 3), (60, 170, 60), dtype=np.uint8)
+    cv2.line(frame, (w // 2, h - 5), (w // 2 + 10, 5), (0, 0, 255), 10)
+    return frame
+
+
+def test_compile_config_validates_and_precomputes() -> None:
+    cfg = AppConfig()
+    cc = compile_config(cfg)
+    assert cc.debug_level == "full"
+    lo, hi = cc.bounds["blue"]
+    assert lo.dtype == np.uint8 and tuple(lo) == cfg.blue.lo and tuple(hi) == cfg.blue.hi
+    assert cc.bgr_table is None
+    assert cc.thresholds(0.5, 0.5, 0.5) is cc.thresholds(0.5, 0.5, 0.5)
+    assert cc.thresholds(0.5, 0.5, 0.5).zones.target_min_area == cfg.zones.target_min_area * 0.25
+    assert cc.thresholds(1.0, 1.0, 1.0).zones is cfg.zones
+
+    cfg.classifier.mode = "bgr_lut"
+    assert compile_config(cfg).bgr_table is not None
+    cfg.debug_level = "verbose"
+    with pytest.raises(ValueError):
+        compile_config(cfg)
+
+
+def test_pipeline_keeps_compiled_config_until_swapped() -> None:
+    cfg = AppConfig()
+    state = PipelineState()
+    frame = _path_frame()
+    assert run_pipeline(frame, state, cfg).path_detected
+    cc = state.compiled
+    run_pipeline(frame, state, cfg)
+    assert state.compiled is cc
+
+    # In-place edits apply once the compiled config is swapped.
+    cfg.red1 = cfg.red2 = HSVRange(lo=(0, 0, 0), hi=(0, 0, 0))
+    state.compiled = compile_config(cfg)
+    assert not run_pipeline(frame, state, cfg).path_detected
+
+    other = AppConfig()
+    assert run_pipeline(frame, state, other).path_detected
+    assert state.compiled.cfg is other
+
+
+def test_per_mask_morphology_overrides() -> None:
+    masks = {"danger": {"method": "none"}, "green": {"method": "median"}}
+    cfg = AppConfig(morph=MorphConfig(shape="rect", masks=masks))
+    cc = compile_config(cfg)
+    # A rect kernel has every cell set.
+    assert cc.morph["red"].method == "morph" and cc.morph["red"].kernel.all()
+    assert cc.morph["danger"].method == "none"
+    assert cc.morph["green"].method == "median" and cc.morph["green"].median_ksize == 5
+    assert cc.morph["blue"].reach == 2 * 3
+
+    cfg.row_bands.enabled = True
+    cc = compile_config(cfg)
+    far, near = cc.thresholds(1.0, 1.0, 1.0).band_morph[::2]
+    assert far["red"].kernel.shape == (1, 1) and far["green"].method == "none"
+    assert near["red"].kernel.shape == (5, 5)
+    # Band and processing scales compound.
+    assert cc.thresholds(0.5, 0.5, 0.5).band_morph[2]["red"].kernel.shape == (3, 3)
+    assert cc.thresholds(0.5, 0.5, 0.5).band_morph[1]["red"].kernel.shape == (1, 1)
+
+    for bad in (
+        MorphConfig(method="erode"),
+        MorphConfig(shape="disk"),
+        MorphConfig(method="median", median_ksize=4),
+        MorphConfig(masks={"purple": {}}),
+        MorphConfig(masks={"red": {"kernel": 3}}),
+    ):
+        with pytest.raises(ValueError):
+            compile_config(AppConfig(morph=bad))
@@ -0,0 +1,83 @@
+import math
+
+import cv2
+import numpy as np
+
+import src.vision.masks as masks_mod
+from src.config import AppConfig, MorphConfig
+from src.pipeline import PipelineState, run_pipeline
+from src.vision.classify import CLASS_BITS, MASK_BITS, classify_hsv, hsv_luts
+from src.vision.compiled import compile_config
+from src.vision.fused import fused_classify
+from src.vision.masks import _lazy_from_labels, to_hsv
+
+# Without numba these run the kernel as plain Python, so frames stay small.
+
+
+def _sparse_frame(h: int = 60, w: int = 96) -> np.ndarray:
+    frame = np.full((h, w, 3), (60, 170, 60), dtype=np.uint8)
+    cv2.circle(frame, (20, 30), 9, (255, 0, 0), -1)
+    cv2.line(frame, (w - 1, 0), (w - 30, h - 1), (0, 0, 255), 5)  # touches the image border
+    cv2.rectangle(frame, (40, 50), (47, 52), (20, 20, 20), -1)
+    return frame
+
+
+def _line_frame(w: int = 96, h: int = 48, angle_deg: float = 0.0) -> np.ndarray:
+    frame = np.full((h, w, 3), (60, 170, 60), dtype=np.uint8)
+    a = math.radians(angle_deg)
+    c = (w // 2, h - 5)
+    tip = (int(c[0] + math.sin(a) * h), int(c[1] - math.cos(a) * h))
+    cv2.line(frame, c, tip, (0, 0, 255), 6)
+    cv2.circle(frame, (w // 4, h // 2), 6, (255, 0, 0), -1)
+    return frame
+
+
+def test_fused_labels_and_stats_match_opencv() -> None:
+    cfg = AppConfig()
+    luts = hsv_luts(cfg)
+    rng = np.random.default_rng(0)
+    for bgr in (rng.integers(0, 256, size=(40, 64, 3), dtype=np.uint8), _sparse_frame()):
+        labels, stats = fused_classify(bgr, luts)
+        assert np.array_equal(labels, classify_hsv(to_hsv(bgr), luts))
+        for k, bit in enumerate(CLASS_BITS.values()):
+            ys, xs = np.nonzero(labels & bit)
+            assert stats.counts[k] == xs.size
+            if xs.size:
+                assert tuple(stats.boxes[k]) == (xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+
+
+def test_box_limited_morphology_matches_full_frame() -> None:
+    luts = hsv_luts(AppConfig())
+    labels, stats = fused_classify(_sparse_frame(), luts)
+    for morph in (
+        MorphConfig(),
+        MorphConfig(4, 2, 3),
+        MorphConfig(1, 0, 0),
+        MorphConfig(7, 0, 2, shape="rect"),
+        MorphConfig(5, 1, 1, shape="cross", masks={"danger": {"method": "none"}}),
+        MorphConfig(
+            method="median", median_ksize=7, masks={"red": {"method": "morph", "kernel_size": 3}}
+        ),
+    ):
+        cc = compile_config(AppConfig(morph=morph))
+        ref = _lazy_from_labels(labels, cc)
+        got = _lazy_from_labels(labels, cc, stats=stats)
+        for name in MASK_BITS:
+            assert np.array_equal(ref[name], got[name]), (morph, name)
+
+
+def test_fused_pipeline_matches_regular_pipeline(monkeypatch) -> None:
+    monkeypatch.setattr(masks_mod, "NUMBA_AVAILABLE", True)
+    regular, fused = AppConfig(), AppConfig()
+    fused.classifier.fused = True
+    s_ref, s_got = PipelineState(), PipelineState()
+    for i in range(4):
+        frame = _line_frame(angle_deg=10.0 * i)
+        ref = run_pipeline(frame, s_ref, regular)
+        got = run_pipeline(frame, s_got, fused)
+        assert (ref.px, ref.py, ref.zone, ref.gamma, ref.target_px, ref.target_py) == (
+            got.px, got.py, got.zone, got.gamma, got.target_px, got.target_py
+        )
+        for name in MASK_BITS:
+            ref_mask = ref.debug_artifacts["masks"][name]
+            assert np.array_equal(ref_mask, got.debug_artifacts["masks"][name])
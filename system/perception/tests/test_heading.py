@@ -0,0 +1,127 @@
+import math
+
+import cv2
+import numpy as np
+
+from src.vision.heading import extract_heading, find_branches
+
+
+def _line_mask(angle_deg: float, w: int = 320, h: int = 160) -> np.ndarray:
+    mask = np.zeros((h, w), dtype=np.uint8)
+    a = math.radians(angle_deg)
+    c = (w // 2, h - 1)
+    tip = (int(c[0] + math.sin(a) * 2 * h), int(c[1] - math.cos(a) * 2 * h))
+    cv2.line(mask, c, tip, 255, 9)
+    return mask
+
+
+def _fork_mask(w: int = 200, h: int = 160) -> np.ndarray:
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.line(mask, (100, h - 1), (100, 90), 255, 10)
+    cv2.line(mask, (100, 90), (40, 0), 255, 10)  # left arm, ~34 deg
+    cv2.line(mask, (100, 90), (170, 0), 255, 10)  # right arm, ~38 deg
+    return mask
+
+
+def _angle_deg(v: np.ndarray) -> float:
+    return math.degrees(math.atan2(float(v[0]), -float(v[1])))
+
+
+def test_scanline_matches_centerline_fit() -> None:
+    prev = np.array([0.0, -1.0], dtype=np.float32)
+    for angle in (-30.0, 0.0, 15.0, 40.0):
+        mask = _line_mask(angle)
+        ref, ref_area, _, ref_dbg = extract_heading(mask, prev, 100.0)
+        got, got_area, accepted, dbg = extract_heading(
+            mask, prev, 100.0, estimator="scanline", scanlines=12
+        )
+        assert ref_dbg["fit_ok"] and dbg["fit_ok"]
+        assert accepted == []
+        assert got[1] <= 0.0  # forward points up
+        assert abs(_angle_deg(got) - angle) < 2.0
+        assert abs(_angle_deg(got) - _angle_deg(ref)) < 2.0
+        assert abs(got_area / ref_area - 1.0) < 0.25
+
+
+def test_scanline_rejects_empty_mask() -> None:
+    prev = np.array([0.6, -0.8], dtype=np.float32)
+    mask = np.zeros((50, 60), np.uint8)
+    got, area, _, dbg = extract_heading(mask, prev, 10.0, estimator="scanline")
+    assert not dbg["fit_ok"] and area == 0.0
+    assert np.allclose(got, prev)
+
+
+def test_moments_matches_centerline_fit() -> None:
+    prev = np.array([0.0, -1.0], dtype=np.float32)
+    for angle in (-35.0, 0.0, 10.0, 45.0):
+        mask = _line_mask(angle)
+        ref, ref_area, ref_contours, _ = extract_heading(mask, prev, 100.0)
+        got, area, accepted, dbg = extract_heading(mask, prev, 100.0, estimator="moments")
+        assert dbg["fit_ok"]
+        assert got[1] <= 0.0  # forward points up
+        assert abs(_angle_deg(got) - angle) < 1.5
+        assert abs(_angle_deg(got) - _angle_deg(ref)) < 1.5
+        assert area == ref_area and len(accepted) == len(ref_contours)
+
+
+def test_branches_split_fork_and_rank_by_previous_heading() -> None:
+    mask = _fork_mask()
+    right, fork_row = find_branches(mask, np.array([0.3, -1.0]), 150.0)
+    assert fork_row is not None and fork_row < 90
+    assert len(right) == 2
+    assert right[0]["agreement"] >= right[1]["agreement"]
+    assert abs(_angle_deg(np.array([right[0]["px"], right[0]["py"]])) - 38.0) < 3.0
+    assert abs(_angle_deg(np.array([right[1]["px"], right[1]["py"]])) + 34.0) < 3.0
+    assert right[0]["cx"] > 100 > right[1]["cx"]
+
+    left, _ = find_branches(mask, np.array([-0.3, -1.0]), 150.0)
+    assert left[0]["cx"] < 100 < left[1]["cx"]
+
+    # A small arm is not a branch, so there is no fork to report.
+    assert find_branches(mask, np.array([0.0, -1.0]), 5000.0)[0] == []
+
+
+def test_branches_empty_on_a_single_line() -> None:
+    for angle in (-30.0, 0.0, 40.0):
+        assert find_branches(_line_mask(angle), np.array([0.0, -1.0]), 100.0) == ([], None)
+
+
+def test_weighted_fit_matches_centerline_on_straight_lines() -> None:
+    prev = np.array([0.0, -1.0], dtype=np.float32)
+    for angle in (-35.0, 0.0, 20.0, 40.0):
+        mask = _line_mask(angle)
+        ref, ref_area, ref_contours, _ = extract_heading(mask, prev, 100.0)
+        for decay in (0.0, 0.5):
+            got, area, accepted, dbg = extract_heading(
+                mask,
+                prev,
+                100.0,
+                estimator="weighted",
+                row_weight_decay=decay,
+                lookahead=(0.25, 1.0),
+            )
+            assert dbg["fit_ok"] and area == ref_area and len(accepted) == len(ref_contours)
+            assert abs(_angle_deg(got) - _angle_deg(ref)) < 1.0
+            near, far = dbg["lookahead"]
+            assert abs(_angle_deg(np.array(near)) - angle) < 2.0
+            assert abs(_angle_deg(np.array(far)) - angle) < 2.0
+
+
+def test_weighted_lookahead_sees_curvature() -> None:
+    # Straight ahead for the bottom half, then bending right.
+    mask = np.zeros((160, 200), dtype=np.uint8)
+    cv2.line(mask, (100, 159), (100, 80), 255, 9)
+    cv2.line(mask, (100, 80), (180, 0), 255, 9)
+    prev = np.array([0.0, -1.0], dtype=np.float32)
+    _, _, _, dbg = extract_heading(
+        mask, prev, 100.0, estimator="weighted", lookahead=(0.3, 0.6, 1.0)
+    )
+    near, mid, far = (_angle_deg(np.array(v)) for v in dbg["lookahead"])
+    assert abs(near) < 1.0
+    assert near < mid < far
+
+    # Lookahead bands beyond the path's bottom rows have too few rows to fit.
+    top = np.zeros((160, 200), dtype=np.uint8)
+    cv2.line(top, (100, 60), (120, 0), 255, 9)
+    _, _, _, dbg = extract_heading(top, prev, 50.0, estimator="weighted", lookahead=(0.25, 1.0))
+    assert dbg["fit_ok"] and dbg["lookahead"][0] is None and dbg["lookahead"][1] is not None
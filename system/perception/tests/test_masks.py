@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+import cv2
+import numpy as np
+import pytest
+
+from src.config import AppConfig, ClassifierConfig, MorphConfig
+from src.vision.classify import bgr_table, classify_bgr, classify_hsv, hsv_luts
+from src.vision.compiled import compile_config
+from src.vision.masks import band_rows, build_banded_masks, build_frame_masks, build_masks
+from src.vision.workspace import PipelineWorkspace
+
+
+def _random_hsv(h: int = 60, w: int = 80) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    bgr = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+
+
+def _scene_frame(w: int = 320, h: int = 160) -> np.ndarray:
+    # Path, target and danger spread over the near, middle and far row bands.
+    frame = np.full((h, w, 3), (60, 170, 60), dtype=np.uint8)
+    cv2.line(frame, (w // 2, h - 5), (w // 2 + 30, 5), (0, 0, 255), 12)
+    cv2.circle(frame, (w // 4, h // 3), 18, (255, 0, 0), -1)
+    cv2.rectangle(frame, (3 * w // 4, h // 2), (w - 10, h - 10), (40, 40, 40), -1)
+    return frame
+
+
+def test_lut_masks_match_inrange() -> None:
+    cfg = AppConfig()
+    hsv = _random_hsv()
+    ref = build_masks(hsv, replace(cfg, classifier=ClassifierConfig(mode="inrange")))
+    got = build_masks(hsv, replace(cfg, classifier=ClassifierConfig(mode="lut")))
+    assert set(ref) == set(got)
+    for name in ref:
+        assert np.array_equal(ref[name], got[name]), name
+
+
+def test_bgr_lut_matches_hsv_on_cell_centres() -> None:
+    cfg = AppConfig()
+    rng = np.random.default_rng(1)
+    for bits in range(1, 8):
+        cells = rng.integers(0, 1 << bits, size=(40, 50, 3), dtype=np.uint8)
+        bgr = (cells << (8 - bits)) | np.uint8(1 << (7 - bits))
+        ref = classify_hsv(cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV), hsv_luts(cfg))
+        got = classify_bgr(bgr, bgr_table(cfg, bits), bits)
+        assert np.array_equal(ref, got), bits
+        # Any pixel of a cell takes the label of its centre, with or without a workspace.
+        low = rng.integers(0, 1 << (8 - bits), size=cells.shape, dtype=np.uint8)
+        noisy = (cells << (8 - bits)) | low
+        got = classify_bgr(noisy, bgr_table(cfg, bits), bits, PipelineWorkspace())
+        assert np.array_equal(got, ref), bits
+    with pytest.raises(ValueError):
+        bgr_table(cfg, 8)
+
+
+def test_build_masks_is_lazy_and_memoized() -> None:
+    masks = build_masks(_random_hsv(), AppConfig())
+    assert masks.built == ()
+    red = masks["red"]
+    assert masks.built == ("red",)
+    assert masks["red"] is red
+    assert "black" in masks and masks.built == ("red",)
+    assert set(dict(masks)) == {"red", "green", "blue", "black", "danger"}
+
+
+def test_prefetched_masks_match_inline() -> None:
+    hsv = _random_hsv()
+    for mode in ("lut", "inrange"):
+        cfg = replace(AppConfig(), classifier=ClassifierConfig(mode=mode))
+        ref = dict(build_masks(hsv, cfg))
+        masks = build_masks(hsv, cfg, PipelineWorkspace())
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            masks.prefetch(["red", "blue", "danger", "green", "nope"], pool)
+            assert masks.built == ()
+            for name in ref:
+                assert np.array_equal(ref[name], masks[name]), (mode, name)
+
+
+def test_banded_masks_stitch_bands_into_roi() -> None:
+    frame = _scene_frame()
+    h, w = frame.shape[:2]
+    ref = dict(build_frame_masks(frame, AppConfig()))
+
+    # Unscaled bands only differ from one full pass at the band seams.
+    cfg = AppConfig()
+    cfg.row_bands.enabled = True
+    cfg.row_bands.scales = [1.0, 1.0, 1.0]
+    pad = 2 * (cfg.morph.kernel_size // 2) * (cfg.morph.open_iters + cfg.morph.close_iters)
+    seams = np.zeros(h, dtype=bool)
+    for y0, _ in band_rows(h, cfg.row_bands.edges)[1:]:
+        seams[max(0, y0 - pad) : y0 + pad] = True
+    banded = build_banded_masks(frame, cfg, PipelineWorkspace())
+    for name, mask in ref.items():
+        assert np.array_equal(banded[name][~seams], mask[~seams]), name
+
+    # The near band stays exact at full resolution; far bands are upsampled to fill the ROI.
+    cfg.row_bands.scales = [0.25, 0.5, 1.0]
+    near = band_rows(h, cfg.row_bands.edges)[-1][0]
+    banded = build_banded_masks(frame, cfg, PipelineWorkspace(), compile_config(cfg))
+    for name, mask in ref.items():
+        assert banded[name].shape == (h, w)
+        assert np.array_equal(banded[name][near + pad :], mask[near + pad :]), name
+        assert banded.built[-1] == name
+
+
+def test_row_band_config_is_validated() -> None:
+    cfg = AppConfig()
+    cfg.row_bands.enabled = True
+    cfg.row_bands.scales = [0.5, 1.0]
+    with pytest.raises(ValueError):
+        compile_config(cfg)
+    cfg.row_bands.scales = [0.5, 0.5, 1.5]
+    with pytest.raises(ValueError):
+        compile_config(cfg)
+
+
+def test_per_mask_strategies() -> None:
+    hsv = _random_hsv()
+    base = build_masks(hsv, AppConfig(morph=MorphConfig(open_iters=0, close_iters=0)))
+    morph = MorphConfig(
+        masks={"danger": {"method": "none"}, "blue": {"method": "median", "median_ksize": 3}}
+    )
+    masks = build_masks(hsv, AppConfig(morph=morph), PipelineWorkspace())
+    assert np.array_equal(masks["danger"], base["danger"])
+    assert np.array_equal(masks["blue"], cv2.medianBlur(base["blue"], 3))
+    assert not np.array_equal(masks["red"], base["red"])  # still opened and closed
@@ -1,4 +1,5 @@
 import json
+from dataclasses import asdict, fields
 
 from src.comms.packet import PerceptionPacket
 
@@ -31,3 +32,33 @@ def test_packet_path_fields() -> None:
     d = p.to_dict()
     assert d["path_detected"] is True
     assert d["path_mask_key"] == "red"
+
+
+def test_packet_prediction_fields_only_when_set() -> None:
+    p = PerceptionPacket(px=0.1, py=0.9, zone="PATH", gamma=0.8, t=1.0)
+    assert "pred_px" not in p.to_dict()
+    p.pred_px, p.pred_py, p.horizon_s = 0.2, 0.8, 0.12
+    d = json.loads(p.to_json())
+    assert d["pred_px"] == 0.2 and d["horizon_s"] == 0.12
+    assert "pred_target_px" not in d
+
+
+def test_packet_serializer_covers_every_field_in_order() -> None:
+    p = PerceptionPacket(
+        px=0.1, py=0.9, zone="PATH", gamma=0.8, t=1.0,
+        pred_px=0.2, pred_py=0.8, pred_target_px=0.3, pred_target_py=0.4, horizon_s=0.1,
+        branches=[{"px": 0.5, "py": 0.8, "agreement": 0.9}],
+        lookahead=[(0.0, 1.0), None, (0.6, 0.8)],
+    )
+    assert list(p.to_dict()) == [f.name for f in fields(PerceptionPacket)]
+    assert p.to_dict() == asdict(p)
+
+
+def test_packet_branches_only_when_set() -> None:
+    p = PerceptionPacket(px=0.1, py=0.9, zone="PATH", gamma=0.8, t=1.0)
+    assert "branches" not in p.to_dict()
+    p.branches = [
+        {"px": -0.6, "py": 0.8, "agreement": 0.95},
+        {"px": 0.6, "py": 0.8, "agreement": 0.2},
+    ]
+    assert json.loads(p.to_json())["branches"][0]["px"] == -0.6
@@ -0,0 +1,365 @@
+import math
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import src.pipeline as pipeline_mod
+from src.config import AppConfig
+from src.pipeline import (
+    PipelineState,
+    batch_fallback_reasons,
+    reuse_output,
+    run_pipeline,
+    run_pipeline_batch,
+)
+from src.vision.contours import ContourCache
+from src.vision.workspace import PipelineWorkspace
+
+
+def _line_frame(w: int = 320, h: int = 160, angle_deg: float = 20.0) -> np.ndarray:
+    frame = np.zeros((h, w, 3), dtype=np.uint8)
+    frame[:, :] = (60, 170, 60)
+    a = math.radians(angle_deg)
+    c = (w // 2, h - 5)
+    tip = (int(c[0] + math.sin(a) * h), int(c[1] - math.cos(a) * h))
+    cv2.line(frame, c, tip, (0, 0, 255), 10)
+    cv2.circle(frame, (w // 4, h // 2), 22, (255, 0, 0), -1)
+    return frame
+
+
+def test_scaled_pipeline_reports_roi_coordinates() -> None:
+    frame = _line_frame()
+    full_cfg, half_cfg = AppConfig(), AppConfig()
+    full_cfg.alpha = half_cfg.alpha = 0.0
+    half_cfg.scale.value = 0.5
+
+    full = run_pipeline(frame, PipelineState(), full_cfg)
+    half = run_pipeline(frame, PipelineState(), half_cfg)
+
+    assert half.debug_artifacts["proc_scale"] == 0.5
+    assert half.zone == full.zone == "TARGET"
+    assert full.px * half.px + full.py * half.py > math.cos(math.radians(2.0))
+    tb_full = full.debug_artifacts["zone_debug"]["target_best"]
+    tb_half = half.debug_artifacts["zone_debug"]["target_best"]
+    assert abs(tb_full["cx"] - tb_half["cx"]) < 2.0
+    assert abs(tb_full["cy"] - tb_half["cy"]) < 2.0
+    assert abs(tb_half["area"] / tb_full["area"] - 1.0) < 0.1
+
+
+def test_tracking_window_trace_is_reused_for_zones(monkeypatch) -> None:
+    calls = []
+    find_contours = cv2.findContours
+    monkeypatch.setattr(
+        cv2, "findContours", lambda *a, **k: calls.append(1) or find_contours(*a, **k)
+    )
+    frame = _line_frame()
+    cfg = AppConfig()
+    cfg.debug_level = "full"
+    cfg.confidence.expected_area = 1500.0
+    full = run_pipeline(frame, PipelineState(), cfg)
+    full_calls = len(calls)
+
+    cfg.tracking.enabled = True
+    state = PipelineState()
+    run_pipeline(frame, state, cfg)
+    calls.clear()
+    tracked = run_pipeline(frame, state, cfg)
+    # The window trace replaces the full one instead of adding to it.
+    assert "window" in tracked.debug_artifacts["heading_debug"]
+    assert len(calls) == full_calls
+    assert tracked.debug_artifacts["contour_traces"] == full.debug_artifacts["contour_traces"] == 1
+    zd_full, zd_tracked = full.debug_artifacts["zone_debug"], tracked.debug_artifacts["zone_debug"]
+    assert zd_tracked["path_area_total"] == zd_full["path_area_total"]
+    pairs = zip(zd_tracked["path_contours"], zd_full["path_contours"])
+    assert all(np.array_equal(a, b) for a, b in pairs)
+    assert len(zd_tracked["path_contours"]) == len(zd_full["path_contours"])
+
+
+def test_scaled_tracking_reports_boxes_in_roi_pixels() -> None:
+    frame = _line_frame()
+    boxes = {}
+    for scale in (1.0, 0.5):
+        cfg = AppConfig()
+        cfg.scale.value = scale
+        cfg.tracking.enabled = True
+        cfg.confidence.expected_area = 1500.0
+        state = PipelineState()
+        run_pipeline(frame, state, cfg)
+        dbg = run_pipeline(frame, state, cfg).debug_artifacts["heading_debug"]
+        boxes[scale] = (dbg["bbox"], dbg["window"])
+    for full, half in zip(boxes[1.0], boxes[0.5]):
+        assert max(abs(a - b) for a, b in zip(full, half)) <= 3
+
+
+def test_tracking_window_follows_line_and_falls_back() -> None:
+    cfg = AppConfig()
+    cfg.tracking.enabled = True
+    cfg.confidence.expected_area = 1500.0
+    cfg.alpha = 0.0
+    state = PipelineState()
+    frame = _line_frame()
+
+    first = run_pipeline(frame, state, cfg)
+    assert "window" not in first.debug_artifacts["heading_debug"]
+    assert state.track_window is not None
+
+    second = run_pipeline(frame, state, cfg)
+    x0, _, x1, _ = second.debug_artifacts["heading_debug"]["window"]
+    assert x1 - x0 < frame.shape[1]
+    assert abs(first.px - second.px) < 1e-3 and abs(first.py - second.py) < 1e-3
+
+    empty = np.zeros_like(frame)
+    lost = run_pipeline(empty, state, cfg)
+    assert not lost.path_detected
+    assert state.track_window is None
+
+
+def _fields(out) -> tuple:
+    dbg = out.debug_artifacts
+    return (
+        out.px, out.py, out.zone, out.gamma, out.path_detected, out.target_detected,
+        out.target_px, out.target_py, tuple(np.asarray(dbg["raw_heading"]).tolist()),
+        dbg["path_area_used"], dbg["zone_debug"]["zone_confidences"],
+    )
+
+
+def test_batch_matches_per_frame_loop() -> None:
+    frames = [_line_frame(angle_deg=a) for a in (-25.0, -10.0, 0.0, 12.0, 30.0)]
+    frames.insert(2, np.zeros_like(frames[0]))  # a miss in the middle keeps p_prev
+    for mode in ("lut", "inrange", "bgr_lut"):
+        cfg = AppConfig()
+        cfg.classifier.mode = mode
+        loop_state, batch_state = PipelineState(), PipelineState()
+        expected = [run_pipeline(f, loop_state, cfg) for f in frames]
+        got = run_pipeline_batch(np.stack(frames), batch_state, cfg)
+        assert [_fields(o) for o in got] == [_fields(o) for o in expected]
+        assert np.array_equal(loop_state.p_prev, batch_state.p_prev)
+
+
+def test_batch_names_its_fallback_options() -> None:
+    cfg = AppConfig()
+    assert batch_fallback_reasons(cfg) == []
+    cfg.tracking.enabled = True
+    cfg.heading.branches = True
+    assert batch_fallback_reasons(cfg) == ["tracking", "heading.branches"]
+
+
+def test_debug_level_controls_retained_artifacts() -> None:
+    frame = _line_frame()
+    outs, skips = {}, {}
+    for level in ("none", "summary", "full"):
+        cfg = AppConfig()
+        cfg.debug_level = level
+        cfg.scale.value = 0.5
+        state = PipelineState()
+        outs[level] = run_pipeline(frame, state, cfg)
+        skips[level] = state.zone_skips
+
+    assert outs["none"].debug_artifacts == {}
+    summary = outs["summary"].debug_artifacts
+    assert "masks" not in summary and "accepted_path_contours" not in summary
+    assert "path_contours" not in summary["zone_debug"]
+    assert "zone_confidences" in summary["zone_debug"]
+    full = outs["full"].debug_artifacts
+    assert {"masks", "accepted_path_contours"} <= set(full)
+    assert {"path_contours", "danger_boxes"} <= set(full["zone_debug"])
+    values = {(o.px, o.py, o.zone, o.gamma, o.target_px, o.target_py) for o in outs.values()}
+    assert len(values) == 1
+    assert skips["none"]["green_mask"] == 1 and skips["full"]["green_mask"] == 0
+    assert all(s["frames"] == 1 for s in skips.values())
+
+
+def test_prediction_leads_a_turning_line() -> None:
+    cfg = AppConfig()
+    cfg.prediction.enabled = True
+    cfg.prediction.measure_latency = False
+    cfg.prediction.latency_s = 0.1
+    state = PipelineState()
+    rate_deg_s, dt = 30.0, 1.0 / 30.0
+    for k in range(45):
+        frame = _line_frame(angle_deg=-15.0 + rate_deg_s * k * dt)
+        out = run_pipeline(frame, state, cfg, timestamp=k * dt)
+
+    future = math.radians(-15.0 + rate_deg_s * (44 * dt + cfg.prediction.latency_s))
+    pred_err = abs(math.degrees(math.atan2(out.pred_px, -out.pred_py)) - math.degrees(future))
+    ema_err = abs(math.degrees(math.atan2(out.px, -out.py)) - math.degrees(future))
+    assert out.horizon_s == cfg.prediction.latency_s
+    assert pred_err < 1.5 < ema_err
+
+
+def test_reused_output_is_predicted_to_its_own_timestamp() -> None:
+    cfg = AppConfig()
+    cfg.prediction.enabled = True
+    cfg.prediction.measure_latency = False
+    state = PipelineState()
+    rate_deg_s, dt = 30.0, 1.0 / 30.0
+    for k in range(20):
+        frame = _line_frame(angle_deg=-15.0 + rate_deg_s * k * dt)
+        last = run_pipeline(frame, state, cfg, timestamp=k * dt)
+    frame = _line_frame(angle_deg=-15.0 + rate_deg_s * 19 * dt)
+
+    reused = reuse_output(last, frame.shape, state, cfg, timestamp=22 * dt)
+    expected = state.predictor.predict_heading(22 * dt + cfg.prediction.latency_s)
+    assert (reused.pred_px, reused.pred_py) == (float(expected[0]), float(expected[1]))
+    assert (reused.pred_px, reused.pred_py) != (last.pred_px, last.pred_py)
+    assert (reused.px, reused.py, reused.zone) == (last.px, last.py, last.zone)
+
+
+def _numpy_bytes(snapshot: tracemalloc.Snapshot) -> int:
+    arrays = snapshot.filter_traces([tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)])
+    return sum(stat.size for stat in arrays.statistics("filename"))
+
+
+def test_workspace_keeps_steady_state_allocations_flat() -> None:
+    frame = _line_frame()
+    mask_bytes = frame.shape[0] * frame.shape[1]
+    for mode, frames, bands in (
+        ("lut", 1000, False),
+        ("inrange", 100, False),
+        ("bgr_lut", 100, False),
+        ("lut", 100, True),
+    ):
+        cfg = AppConfig()
+        cfg.classifier.mode = mode
+        cfg.tracking.enabled = True
+        cfg.row_bands.enabled = bands
+        state = PipelineState(workspace=PipelineWorkspace())
+        tracemalloc.start()
+        try:
+            for _ in range(5):
+                dict(run_pipeline(frame, state, cfg).debug_artifacts["masks"])
+            warm = state.workspace.allocations
+            arrays_before = _numpy_bytes(tracemalloc.take_snapshot())
+            worst = 0
+            for _ in range(frames):
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                dict(run_pipeline(frame, state, cfg).debug_artifacts["masks"])
+                worst = max(worst, tracemalloc.get_traced_memory()[1] - before)
+            arrays_after = _numpy_bytes(tracemalloc.take_snapshot())
+        finally:
+            tracemalloc.stop()
+        assert state.workspace.allocations == warm, (mode, bands)
+        assert abs(arrays_after - arrays_before) < 4096, (mode, bands)
+        # No frame ever allocates anything as large as a single mask.
+        assert worst < mask_bytes, (mode, bands, worst)
+
+
+def test_branches_follow_the_arm_nearest_the_previous_heading() -> None:
+    frame = np.full((160, 200, 3), (60, 170, 60), dtype=np.uint8)
+    cv2.line(frame, (100, 159), (100, 90), (0, 0, 255), 10)
+    cv2.line(frame, (100, 90), (40, 0), (0, 0, 255), 10)
+    cv2.line(frame, (100, 90), (170, 0), (0, 0, 255), 10)
+    cfg = AppConfig()
+    cfg.heading.branches = True
+    assert run_pipeline(frame, PipelineState(), AppConfig()).branches == []
+    for prev, sign in (((0.4, -1.0), 1.0), ((-0.4, -1.0), -1.0)):
+        for scale in (1.0, 0.5):
+            cfg.scale.value = scale
+            state = PipelineState()
+            state.p_prev[:] = prev
+            out = run_pipeline(frame, state, cfg)
+            assert len(out.branches) == 2
+            best = out.branches[0]
+            assert sign * best["px"] > 0.4 and best["py"] < 0
+            assert sign * (best["cx"] - 100) > 0
+            assert out.debug_artifacts["raw_heading"] == (best["px"], best["py"])
+
+
+def test_weighted_lookahead_reported_in_roi_frame() -> None:
+    frame = _line_frame(angle_deg=25.0)
+    outs = []
+    for scale in (1.0, 0.5):
+        cfg = AppConfig()
+        cfg.heading.estimator = "weighted"
+        cfg.scale.value = scale
+        out = run_pipeline(frame, PipelineState(), cfg)
+        assert out.path_detected and len(out.lookahead) == len(cfg.heading.lookahead)
+        outs.append(out)
+    assert run_pipeline(frame, PipelineState(), AppConfig()).lookahead == []
+    for full, half in zip(outs[0].lookahead, outs[1].lookahead):
+        ang = math.degrees(math.atan2(full[0], -full[1]))
+        assert abs(ang - 25.0) < 2.0
+        assert abs(math.degrees(math.atan2(half[0], -half[1])) - ang) < 2.0
+
+
+def test_row_bands_keep_near_field_heading() -> None:
+    for angle in (-20.0, 0.0, 25.0):
+        frame = _line_frame(angle_deg=angle)
+        cfg = AppConfig()
+        cfg.row_bands.enabled = True
+        ref = run_pipeline(frame, PipelineState(), AppConfig())
+        got = run_pipeline(frame, PipelineState(), cfg)
+        assert got.path_detected and got.zone == ref.zone
+        assert got.target_detected == ref.target_detected
+        assert got.debug_artifacts["masks"]["red"].shape == frame.shape[:2]
+        dot = got.px * ref.px + got.py * ref.py
+        assert math.degrees(math.acos(min(1.0, dot))) < 2.0
+        assert abs(got.gamma - ref.gamma) < 0.1
+
+
+def _thin_line_frame(width: int, w: int = 640, h: int = 240) -> np.ndarray:
+    frame = np.full((h, w, 3), (60, 170, 60), dtype=np.uint8)
+    cv2.line(frame, (w // 2, h - 1), (w // 2 + 40, 0), (0, 0, 255), width)
+    return frame
+
+
+def test_thin_lines_survive_reduced_scale() -> None:
+    # Cleaning kernels shrink with the frame; a full-size 5 px open erased these.
+    for width, scale in ((8, 0.5), (12, 0.35), (16, 0.25)):
+        frame = _thin_line_frame(width)
+        cfg = AppConfig()
+        cfg.scale.value = scale
+        ref = run_pipeline(frame, PipelineState(), AppConfig())
+        out = run_pipeline(frame, PipelineState(), cfg)
+        assert out.path_detected and out.zone == ref.zone == "PATH", (width, scale)
+        assert out.gamma > 0.5 * ref.gamma, (width, scale)
+        assert out.px * ref.px + out.py * ref.py > math.cos(math.radians(3.0)), (width, scale)
+
+
+def test_auto_scale_floor_keeps_thin_line() -> None:
+    frame = _thin_line_frame(16)
+    cfg = AppConfig()
+    cfg.scale.mode = "auto"
+    cfg.fps = 1e6  # impossible budget: the controller steps down to min_scale
+    state = PipelineState()
+    for _ in range(300):
+        run_pipeline(frame, state, cfg)
+        if state.scale == cfg.scale.min_scale:
+            break
+    assert state.scale == cfg.scale.min_scale == 0.25
+    out = run_pipeline(frame, state, cfg)
+    assert out.path_detected and out.zone == "PATH" and out.gamma > 0.0
+
+
+def test_row_bands_with_reduced_scale_keep_thin_line() -> None:
+    frame = _thin_line_frame(8)
+    cfg = AppConfig()
+    cfg.row_bands.enabled = True
+    cfg.scale.value = 0.5
+    ref = run_pipeline(frame, PipelineState(), AppConfig())
+    out = run_pipeline(frame, PipelineState(), cfg)
+    assert out.path_detected and out.zone == "PATH"
+    assert out.gamma > 0.5 * ref.gamma
+    assert out.px * ref.px + out.py * ref.py > math.cos(math.radians(3.0))
+
+
+def test_scanline_without_debug_traces_no_contours(monkeypatch) -> None:
+    caches: list[ContourCache] = []
+
+    class RecordingCache(ContourCache):
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            caches.append(self)
+
+    monkeypatch.setattr(pipeline_mod, "ContourCache", RecordingCache)
+    frame = np.full((160, 320, 3), (60, 170, 60), dtype=np.uint8)
+    cv2.line(frame, (160, 155), (200, 0), (0, 0, 255), 20)
+    cfg = AppConfig()
+    cfg.debug_level = "none"
+    cfg.heading.estimator = "scanline"
+
+    out = run_pipeline(frame, PipelineState(), cfg)
+    assert out.zone == "PATH" and out.path_detected
+    assert [c.traces for c in caches] == [0]
@@ -0,0 +1,31 @@
+import math
+
+from src.utils.predict import AlphaBetaFilter
+
+
+def test_alpha_beta_extrapolates_constant_rate() -> None:
+    f = AlphaBetaFilter(alpha=0.5, beta=0.1, max_gap_s=1.0)
+    for k in range(60):
+        f.update(2.0 + 3.0 * k / 30.0, k / 30.0)
+    t_last = 59 / 30.0
+    assert abs(f.v - 3.0) < 1e-3
+    assert abs(f.predict(t_last + 0.1) - (2.0 + 3.0 * (t_last + 0.1))) < 1e-3
+
+
+def test_alpha_beta_wraps_angles() -> None:
+    f = AlphaBetaFilter(alpha=0.5, beta=0.1, max_gap_s=1.0, wrap=True)
+    for k in range(60):
+        f.update(math.remainder(3.0 + 0.5 * k / 30.0, 2.0 * math.pi), k / 30.0)
+    assert abs(f.v - 0.5) < 1e-3
+    pred = f.predict(59 / 30.0 + 0.2)
+    assert abs(math.remainder(pred - (3.0 + 0.5 * (59 / 30.0 + 0.2)), 2.0 * math.pi)) < 1e-3
+
+
+def test_alpha_beta_restarts_after_gap() -> None:
+    f = AlphaBetaFilter(alpha=0.5, beta=0.1, max_gap_s=0.5)
+    f.update(0.0, 0.0)
+    f.update(1.0, 0.1)
+    assert f.v != 0.0
+    assert f.predict(1.0) is None
+    f.update(5.0, 1.0)
+    assert f.x == 5.0 and f.v == 0.0
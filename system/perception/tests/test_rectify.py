@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from src.config import AppConfig
+from src.pipeline import PipelineState, run_pipeline
+from src.vision.rectify import Calibration, Rectifier
+
+
+def _write_calib(path: Path, homography: list[list[float]] | None = None) -> Path:
+    data = {
+        "image_size": [640, 480],
+        "camera_matrix": [[500.0, 0.0, 320.0], [0.0, 500.0, 240.0], [0.0, 0.0, 1.0]],
+        "dist_coeffs": [0.0, 0.0, 0.0, 0.0, 0.0],
+    }
+    if homography is not None:
+        data["homography"] = homography
+    path.write_text(yaml.safe_dump(data))
+    return path
+
+
+def test_identity_calibration_is_identity_and_cached(tmp_path: Path) -> None:
+    calib = Calibration.load(_write_calib(tmp_path / "calib.yaml"))
+    labels = np.random.default_rng(0).integers(0, 64, size=(120, 320), dtype=np.uint8)
+    first = Rectifier(calib, frame_w=640, roi_y=240, cache_dir=tmp_path / "maps")
+    assert np.array_equal(first.apply(labels, labels=True), labels)
+    assert len(list((tmp_path / "maps").glob("*.npz"))) == 1
+
+    second = Rectifier(calib, frame_w=640, roi_y=240, cache_dir=tmp_path / "maps")
+    assert np.array_equal(second.apply(labels, labels=True), labels)
+    assert second.cache_hits == 1 and second.build_ms == 0.0
+
+
+def test_homography_moves_labels(tmp_path: Path) -> None:
+    shift = [[1.0, 0.0, 10.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    calib = Calibration.load(_write_calib(tmp_path / "calib.yaml", shift))
+    labels = np.zeros((240, 640), dtype=np.uint8)
+    labels[100:140, 200:240] = 4
+    out = Rectifier(calib, frame_w=640, roi_y=240).apply(labels, labels=True)
+    assert np.array_equal(out[:, 10:], labels[:, :-10])
+    assert not out[:, :10].any()
+
+
+def test_pipeline_with_identity_rectify_matches_plain(tmp_path: Path) -> None:
+    frame = np.zeros((160, 320, 3), dtype=np.uint8)
+    frame[:] = (60, 170, 60)
+    frame[:, 150:170] = (0, 0, 255)
+    cfg = AppConfig()
+    plain = run_pipeline(frame, PipelineState(), cfg)
+    cfg.rectify.enabled = True
+    cfg.rectify.calibration = str(_write_calib(tmp_path / "calib.yaml"))
+    cfg.rectify.cache_dir = str(tmp_path / "maps")
+    for mode in ("lut", "inrange"):
+        cfg.classifier.mode = mode
+        out = run_pipeline(frame, PipelineState(), cfg)
+        assert (out.px, out.py, out.zone) == (plain.px, plain.py, plain.zone), mode
+        assert out.debug_artifacts["remap_ms"] > 0.0
+
+
+def test_unreadable_cache_is_rebuilt_and_replaced(tmp_path: Path) -> None:
+    calib = Calibration.load(_write_calib(tmp_path / "calib.yaml"))
+    labels = np.random.default_rng(1).integers(0, 64, size=(120, 320), dtype=np.uint8)
+    Rectifier(calib, frame_w=640, roi_y=240, cache_dir=tmp_path / "maps").apply(labels, labels=True)
+    (cached,) = (tmp_path / "maps").glob("*.npz")
+    cached.write_bytes(cached.read_bytes()[:100])  # as if a write was cut short
+
+    rebuilt = Rectifier(calib, frame_w=640, roi_y=240, cache_dir=tmp_path / "maps")
+    assert np.array_equal(rebuilt.apply(labels, labels=True), labels)
+    assert rebuilt.cache_hits == 0 and rebuilt.build_ms > 0.0
+    assert [p.name for p in (tmp_path / "maps").iterdir()] == [cached.name]
+    reloaded = Rectifier(calib, frame_w=640, roi_y=240, cache_dir=tmp_path / "maps")
+    reloaded.maps((320, 120))
+    assert reloaded.cache_hits == 1
+
+
+def test_relative_cache_dir_ignores_working_directory(tmp_path: Path, monkeypatch) -> None:
+    calib = Calibration.load(_write_calib(tmp_path / "calib.yaml"))
+    monkeypatch.chdir(tmp_path)
+    rect = Rectifier(calib, frame_w=640, roi_y=240, cache_dir=".cache/remap")
+    assert rect.cache_dir == Path(__file__).resolve().parents[1] / ".cache" / "remap"
@@ -0,0 +1,48 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.utils.threads import ThreadCpuMeter, pin_current_thread, set_current_thread_nice
+
+
+def test_cpu_meter_attributes_time_to_the_busy_thread() -> None:
+    meter = ThreadCpuMeter(("busy", "idle"))
+
+    def busy() -> None:
+        end = time.perf_counter() + 0.15
+        while time.perf_counter() < end:
+            pass
+        meter.mark("busy")
+
+    def idle() -> None:
+        time.sleep(0.15)
+        meter.mark("idle")
+
+    meter.window()
+    threads = [threading.Thread(target=busy), threading.Thread(target=idle)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pct = meter.window()
+    assert pct["busy"] > 20.0 > pct["idle"]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+def test_pinning_applies_to_the_calling_thread_only() -> None:
+    allowed = sorted(os.sched_getaffinity(0))
+    seen = {}
+
+    def pinned() -> None:
+        seen["pinned"] = pin_current_thread([allowed[0]], "test")
+        seen["cpus"] = os.sched_getaffinity(0)
+
+    t = threading.Thread(target=pinned)
+    t.start()
+    t.join()
+    assert seen == {"pinned": True, "cpus": {allowed[0]}}
+    assert sorted(os.sched_getaffinity(0)) == allowed
+    assert not pin_current_thread([], "test")
+    assert not set_current_thread_nice(0, "test")
@@ -0,0 +1,23 @@
+from src.utils.timing import ScaleController
+
+
+def test_scale_controller_steps_down_when_over_budget() -> None:
+    c = ScaleController(budget_s=0.010, scale=1.0, min_scale=0.5, step=0.25, hold_frames=0)
+    assert c.update(0.020) == 0.75
+    assert c.update(0.020) == 0.5
+    assert c.update(0.020) == 0.5  # clamped at min_scale
+
+
+def test_scale_controller_recovers_with_headroom() -> None:
+    c = ScaleController(budget_s=0.010, scale=0.5, step=0.25, hold_frames=0, smoothing=0.0)
+    assert c.update(0.001) == 0.75
+    assert c.update(0.001) == 1.0
+    assert c.update(0.001) == 1.0
+
+
+def test_scale_controller_holds_after_change() -> None:
+    c = ScaleController(budget_s=0.010, scale=1.0, step=0.1, hold_frames=3, smoothing=0.0)
+    assert c.update(0.050) == 0.9
+    for _ in range(3):
+        assert c.update(0.050) == 0.9
+    assert c.update(0.050) < 0.9
@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+
+from src.config import ZoneConfig
+from src.vision.contours import ContourCache
+from src.vision.zones import classify_zone
+
+
+def _masks(h: int = 240, w: int = 320) -> dict[str, np.ndarray]:
+    blank = np.zeros((h, w), dtype=np.uint8)
+    blue = blank.copy()
+    cv2.circle(blue, (80, 120), 30, 255, -1)
+    cv2.circle(blue, (240, 60), 20, 255, -1)
+    cv2.rectangle(blue, (200, 180), (300, 190), 255, -1)  # large but not circular
+    rng = np.random.default_rng(0)
+    ys, xs = rng.integers(0, h, 400), rng.integers(0, w, 400)
+    blue[ys, xs] = 255  # speckle below the area floor
+    return {"red": blank, "green": blank, "blue": blue, "black": blank, "danger": blank}
+
+
+def test_classify_zone_reports_all_circular_targets_largest_first() -> None:
+    cfg = ZoneConfig()
+    masks = _masks()
+    cache = ContourCache(masks)
+    zone, dbg = classify_zone(masks, cfg, contours=cache)
+
+    assert zone == "TARGET"
+    assert [(round(t["cx"]), round(t["cy"])) for t in dbg["targets"]] == [(80, 120), (240, 60)]
+    assert dbg["target_best"] is dbg["targets"][0]
+    assert all(t["circularity"] >= cfg.target_min_circularity for t in dbg["targets"])
+    # Path traced, blue labelled, empty danger skipped.
+    assert cache.traces == 1 and cache.labelings == 1
+    assert dbg["skipped"] == ("danger_components",)
+
+
+def _random_masks(rng: np.random.Generator, h: int = 120, w: int = 160) -> dict[str, np.ndarray]:
+    masks = {}
+    for name in ("red", "green", "blue", "black", "danger"):
+        m = np.zeros((h, w), dtype=np.uint8)
+        for _ in range(int(rng.integers(0, 4))):
+            c = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            if rng.random() < 0.5:
+                cv2.circle(m, c, int(rng.integers(3, 40)), 255, -1)
+            else:
+                far = (c[0] + int(rng.integers(2, 80)), c[1] + int(rng.integers(2, 60)))
+                cv2.rectangle(m, c, far, 255, -1)
+        masks[name] = m
+    return masks
+
+
+def test_cascade_without_confidences_keeps_the_zone() -> None:
+    rng = np.random.default_rng(1)
+    skipped = set()
+    for mode in ("ratio", "area", "either"):
+        cfg = ZoneConfig(danger_mode=mode, danger_area_thresh=1500.0, path_area_thresh=800.0)
+        for _ in range(60):
+            masks = _random_masks(rng)
+            zone_full, dbg_full = classify_zone(masks, cfg)
+            zone_fast, dbg_fast = classify_zone(masks, cfg, need_confidences=False)
+            assert zone_fast == zone_full
+            assert dbg_fast["target_found"] == dbg_full["target_found"]
+            assert dbg_fast["zone_confidences"] == {}
+            skipped.update(dbg_fast["skipped"])
+    assert {"danger_mask", "path_stats", "path_contours", "green_mask"} <= skipped
+
+
+def test_cascade_skips_labelling_masks_below_the_area_floor() -> None:
+    masks = _random_masks(np.random.default_rng(2))
+    masks["blue"][:] = 0
+    masks["blue"][:5, :5] = 255  # 25 px < target_min_area
+    cache = ContourCache(masks)
+    _, dbg = classify_zone(masks, ZoneConfig(), contours=cache)
+    assert "blue_components" in dbg["skipped"]
+    assert dbg["targets"] == [] and dbg["target_best"]["area"] == 0.0
+
+
+def test_danger_area_counts_pixels_not_holes() -> None:
+    h, w = 240, 320
+    blank = np.zeros((h, w), dtype=np.uint8)
+    danger = blank.copy()
+    cv2.rectangle(danger, (20, 20), (119, 119), 255, -1)
+    cv2.rectangle(danger, (45, 45), (94, 94), 0, -1)  # 50x50 hole
+    masks = {"red": blank, "green": blank, "blue": blank, "black": blank, "danger": danger}
+    cfg = ZoneConfig(danger_mode="area", danger_area_thresh=8000.0)
+    zone, dbg = classify_zone(masks, cfg)
+    # The outline encloses ~9800 px, but only the 7500 set pixels count.
+    assert dbg["danger_area_largest"] == 7500.0
+    assert zone != "DANGER"